@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+"""
+Общая точка входа в распознавание для всех скриптов.
+
+Буфер numpy float32 mono 16 kHz передаётся в mlx_whisper.transcribe
+напрямую. Раньше каждый transcribe() конвертировал float32 → int16,
+писал временный WAV, а mlx_whisper читал его обратно через ffmpeg
+(subprocess) и конвертировал int16 → float32.
+
+Движки (ASREngine), выбор — MLXW_ASR или auto:
+  mlx             — mlx-whisper, Apple Silicon (GPU/Metal)
+  faster-whisper  — CTranslate2 на CPU, int8 (Linux, Intel Mac)
+  whisper-cpp     — whisper.cpp через pywhispercpp, CPU
+  stub            — детерминированная заглушка для тестов
+auto берёт первый доступный в этом порядке (stub — только явно).
+Результаты повторяемых входов (cache=True) кэшируются на диске по хэшу аудио
+(transcript_cache.py).
+Имя модели для CPU-движков выводится из WHISPER_MODEL
+(mlx-community/whisper-large-v3-turbo → large-v3-turbo) или задаётся MLXW_CPU_MODEL.
+
+Замер экономии на длинной записи (без модели, нужен только ffmpeg):
+  python asr.py --handoff-bench 600
+Загрузка и прогрев моделей (MLXW_PRELOAD) с замером времени:
+  python asr.py --preload [mlx-community/whisper-small,...]
+Доступные движки и сравнение пропускной способности:
+  python asr.py --engines
+  python asr.py --compare faster-whisper,whisper-cpp,stub [a.wav ...]
+"""
+
+import argparse
+import importlib.util
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+
+import numpy as np
+
+import startup
+from transcript_cache import CACHE, cache_key
+
+MODEL_NAME = os.environ.get(
+    "WHISPER_MODEL",
+    "mlx-community/whisper-large-v3-turbo"
+)
+
+RATE = 16000
+
+BACKEND = os.environ.get("MLXW_ASR", "auto")
+CPU_MODEL = os.environ.get("MLXW_CPU_MODEL")
+CPU_COMPUTE_TYPE = os.environ.get("MLXW_CPU_COMPUTE_TYPE", "int8")
+CPU_THREADS = int(os.environ.get("MLXW_CPU_THREADS", str(os.cpu_count() or 4)))
+CPU_WORKERS = int(os.environ.get("MLXW_CPU_WORKERS", "1"))   # параллельных transcribe() на модель
+PRELOAD = [m for m in os.environ.get("MLXW_PRELOAD", MODEL_NAME).split(",") if m]
+WARMUP_SECONDS = 2.0
+
+
+# ──────────────────────────────────────────────
+# Движки
+# ──────────────────────────────────────────────
+class ASREngine:
+    """Распознавание float32 mono 16 kHz из памяти.
+
+    transcribe_result() возвращает словарь в формате mlx_whisper:
+    text, language, segments [{start, end, text, words: [{word, start, end}]}].
+    Опции, которых движок не понимает, игнорируются.
+    """
+
+    name = None
+    module = None        # что должно импортироваться, чтобы движок был доступен
+    parallel = 1         # сколько transcribe_result() можно звать из разных потоков одновременно
+
+    def __init__(self, model_name=MODEL_NAME):
+        self.model_name = model_name
+        self.load_seconds = None       # холодная загрузка весов
+        self.warmup_seconds = None     # первый прогон: компиляция ядер, выделение буферов
+        self._load_lock = threading.Lock()
+        self._load_requested = threading.Event()    # загрузку ведёт другой поток (BackgroundLoad)
+
+    @classmethod
+    def available(cls):
+        return cls.module is None or importlib.util.find_spec(cls.module) is not None
+
+    @property
+    def loaded(self):
+        return self.warmup_seconds is not None
+
+    def load_weights(self):
+        """Веса в память; движок дальше использует именно эту копию."""
+
+    def load(self):
+        """Загрузка весов и прогрев на синтетической речи (мимо кэша). Один раз на движок."""
+        with self._load_lock:
+            if not self.loaded:
+                t0 = time.perf_counter()
+                self.load_weights()
+                t1 = time.perf_counter()
+                self._transcribe_result(warmup_audio(), language="en")
+                self.load_seconds, self.warmup_seconds = t1 - t0, time.perf_counter() - t1
+                startup.mark("модель загружена")
+        return self
+
+    def request_load(self):
+        """load() позовёт другой поток: до его конца transcribe_result() ждёт, а не
+        идёт в незагруженный движок. Ставится до старта потока — иначе распознавание,
+        начатое раньше, чем поток возьмёт _load_lock, проскочило бы мимо."""
+        self._load_requested.set()
+
+    def transcribe_result(self, audio_array, language=None, cache=False, **options):
+        """Результат движка; cache=True — сначала из кэша распознаваний (transcript_cache.py).
+
+        Кэш — только для звука, который может прийти повторно (файлы rt_batch.py,
+        --retranscribe): живые фразы и перекрывающиеся окна стриминга не
+        повторяются и только вытесняли бы полезные записи."""
+        if not self.loaded and self._load_requested.is_set():
+            # Модель грузится в фоне (BackgroundLoad) — ждём её под тем же замком, а не грузим вторую копию
+            self.load()
+        if not cache:
+            result = self._transcribe_result(audio_array, language, **options)
+            startup.mark("первое распознавание")
+            return result
+        key = cache_key(audio_array, self.name, self.model_name, language, options)
+        result = CACHE.get(key)
+        if result is None:
+            result = self._transcribe_result(audio_array, language, **options)
+            CACHE.put(key, result)
+        startup.mark("первое распознавание")
+        return result
+
+    def _transcribe_result(self, audio_array, language=None, **options):
+        raise NotImplementedError
+
+    def detect_language(self, audio_array):
+        """{язык: вероятность} по первым 30 s или None, если движок так не умеет
+        (тогда язык определяет сам transcribe_result при language=None)."""
+        return None
+
+    def transcribe(self, audio_array, language=None, cache=False, **options):
+        """Возвращает (text, detected_language)."""
+        result = self.transcribe_result(audio_array, language, cache, **options)
+        return result.get("text", "").strip(), result.get("language", "?")
+
+    def describe(self):
+        return f"{self.name}: {self.model_name}"
+
+
+class MlxWhisperEngine(ASREngine):
+    """mlx-whisper; веса кэширует сам mlx_whisper между вызовами."""
+
+    name = "mlx"
+    module = "mlx_whisper"
+
+    @classmethod
+    def available(cls):
+        return (sys.platform == "darwin" and platform.machine() == "arm64"
+                and super().available())
+
+    def _transcribe_result(self, audio_array, language=None, **options):
+        import mlx_whisper
+
+        kwargs = dict(options, path_or_hf_repo=self.model_name)
+        if language:
+            kwargs["language"] = language
+        audio = np.ascontiguousarray(audio_array, dtype=np.float32)
+        return mlx_whisper.transcribe(audio, **kwargs)
+
+    def _resident_model(self):
+        # transcribe() берёт модель из того же ModelHolder (fp16 по умолчанию) —
+        # загруженная здесь копия и есть та, что распознаёт
+        import mlx.core as mx
+        from mlx_whisper.transcribe import ModelHolder
+
+        return ModelHolder.get_model(self.model_name, mx.float16)
+
+    def load_weights(self):
+        self._resident_model()
+
+    def detect_language(self, audio_array):
+        # Тот же проход, что делает transcribe() без language, — на той же модели
+        import mlx.core as mx
+        from mlx_whisper.audio import N_FRAMES, N_SAMPLES, log_mel_spectrogram, pad_or_trim
+
+        model = self._resident_model()
+        mel = log_mel_spectrogram(np.ascontiguousarray(audio_array, dtype=np.float32),
+                                  n_mels=model.dims.n_mels, padding=N_SAMPLES)
+        mel = pad_or_trim(mel[:N_FRAMES], N_FRAMES, axis=-2).astype(mx.float16)
+        _, probs = model.detect_language(mel)
+        return probs
+
+
+def cpu_model_name(model_name):
+    """mlx-community/whisper-large-v3-turbo → large-v3-turbo."""
+    if CPU_MODEL:
+        return CPU_MODEL
+    name = model_name.rsplit("/", 1)[-1]
+    name = re.sub(r"^(distil-)?whisper-", r"\1", name)
+    return re.sub(r"-(mlx|\d+bit)$", "", name)
+
+
+class FasterWhisperEngine(ASREngine):
+    """faster-whisper (CTranslate2) на CPU с int8-квантованием."""
+
+    name = "faster-whisper"
+    module = "faster_whisper"
+
+    parallel = CPU_WORKERS
+
+    def __init__(self, model_name=MODEL_NAME):
+        super().__init__(cpu_model_name(model_name))
+        self._model = None
+
+    def _load_model(self):
+        if self._model is None:
+            # Через load(): под _load_lock, так что параллельные вызовы не строят вторую копию
+            self.load()
+        return self._model
+
+    def load_weights(self):
+        from faster_whisper import WhisperModel
+
+        self._model = WhisperModel(self.model_name, device="cpu", compute_type=CPU_COMPUTE_TYPE,
+                                   cpu_threads=CPU_THREADS, num_workers=CPU_WORKERS)
+
+    def _transcribe_result(self, audio_array, language=None, **options):
+        kwargs = {k: options[k] for k in ("word_timestamps", "condition_on_previous_text",
+                                          "initial_prompt", "temperature") if k in options}
+        segments, info = self._load_model().transcribe(
+            np.ascontiguousarray(audio_array, dtype=np.float32), language=language, **kwargs)
+        result = []
+        for segment in segments:
+            words = [{"word": w.word, "start": w.start, "end": w.end, "probability": w.probability}
+                     for w in (segment.words or [])]
+            result.append({"start": segment.start, "end": segment.end, "text": segment.text, "words": words,
+                           "avg_logprob": segment.avg_logprob, "no_speech_prob": segment.no_speech_prob})
+        return {"text": "".join(s["text"] for s in result), "language": info.language, "segments": result}
+
+    def detect_language(self, audio_array):
+        _, _, probs = self._load_model().detect_language(np.ascontiguousarray(audio_array, dtype=np.float32))
+        return dict(probs)
+
+    def describe(self):
+        workers = f" × {CPU_WORKERS}" if CPU_WORKERS > 1 else ""
+        return f"{self.name}: {self.model_name} ({CPU_COMPUTE_TYPE}, {CPU_THREADS} потоков{workers})"
+
+
+class WhisperCppEngine(ASREngine):
+    """whisper.cpp через pywhispercpp. Таймкоды — только по сегментам."""
+
+    name = "whisper-cpp"
+    module = "pywhispercpp"
+
+    def __init__(self, model_name=MODEL_NAME):
+        super().__init__(cpu_model_name(model_name))
+        self._model = None
+
+    def _load_model(self):
+        if self._model is None:
+            # Через load(): под _load_lock, так что параллельные вызовы не строят вторую копию
+            self.load()
+        return self._model
+
+    def load_weights(self):
+        from pywhispercpp.model import Model
+
+        self._model = Model(self.model_name, n_threads=CPU_THREADS,
+                            print_progress=False, print_realtime=False)
+
+    def _transcribe_result(self, audio_array, language=None, **options):
+        kwargs = {"language": language or "auto"}
+        if options.get("initial_prompt"):
+            kwargs["initial_prompt"] = options["initial_prompt"]
+        segments = self._load_model().transcribe(
+            np.ascontiguousarray(audio_array, dtype=np.float32), **kwargs)
+        # t0/t1 у whisper.cpp — в сотых долях секунды
+        result = [{"start": s.t0 / 100, "end": s.t1 / 100, "text": s.text, "words": []} for s in segments]
+        return {"text": "".join(s["text"] for s in result), "language": language or "?", "segments": result}
+
+    def describe(self):
+        return f"{self.name}: {self.model_name} ({CPU_THREADS} потоков)"
+
+
+class StubEngine(ASREngine):
+    """Детерминированная заглушка: текст — длительность входа. Для тестов на Linux."""
+
+    name = "stub"
+    parallel = os.cpu_count() or 4
+
+    def detect_language(self, audio_array):
+        return {"en": 0.6, "ru": 0.4}
+
+    def _transcribe_result(self, audio_array, language=None, **options):
+        duration = len(audio_array) / RATE
+        words = [{"word": " stub", "start": 0.0, "end": duration / 2},
+                 {"word": f" {duration:.2f}s", "start": duration / 2, "end": duration}]
+        text = "".join(w["word"] for w in words)
+        return {"text": text, "language": language or "en",
+                "segments": [{"start": 0.0, "end": duration, "text": text, "words": words}]}
+
+    def describe(self):
+        return self.name
+
+
+ENGINES = {engine.name: engine for engine in
+           (MlxWhisperEngine, FasterWhisperEngine, WhisperCppEngine, StubEngine)}
+AUTO_ORDER = ("mlx", "faster-whisper", "whisper-cpp")
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def engine_class(backend=BACKEND):
+    if backend != "auto":
+        if backend not in ENGINES:
+            raise ValueError(f"неизвестный движок: {backend} (есть: {', '.join(ENGINES)})")
+        return ENGINES[backend]
+    for name in AUTO_ORDER:
+        if ENGINES[name].available():
+            return ENGINES[name]
+    raise RuntimeError("нет ни одного движка: pip install mlx-whisper (Apple Silicon) "
+                       "или faster-whisper / pywhispercpp (CPU)")
+
+
+def get_engine(backend=BACKEND, model_name=MODEL_NAME):
+    """Движок на процесс (по движку и модели): веса грузятся один раз,
+    все вызовы распознавания получают один и тот же резидентный экземпляр."""
+    cls = engine_class(backend)
+    key = (cls.name, model_name)
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = cls(model_name)
+        return _engines[key]
+
+
+def warmup_audio(seconds=WARMUP_SECONDS):
+    """Синтетическая «речь»: гармоники 140 Hz со слоговой огибающей ~3 Hz и немного шума.
+    На тишине декодер выходит после пары токенов и прогревает не всё."""
+    t = np.arange(int(seconds * RATE)) / RATE
+    voice = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 8))
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 3 * t))
+    noise = np.random.default_rng(0).standard_normal(len(t)) * 0.003
+    return (0.05 * voice * envelope + noise).astype(np.float32)
+
+
+def preload(model_names=None, backend=BACKEND):
+    """Загружает и прогревает модели (по умолчанию MLXW_PRELOAD, иначе WHISPER_MODEL),
+    печатает время холодной загрузки и прогрева. Возвращает движки."""
+    engines = []
+    for model_name in model_names or PRELOAD:
+        engine = get_engine(backend, model_name)
+        if not engine.loaded:
+            print(f"📦 Загрузка {engine.describe()}...", file=sys.stderr, flush=True)
+            engine.load()
+            print(f"✅ {engine.describe()}: загрузка {engine.load_seconds:.1f}s, "
+                  f"прогрев {engine.warmup_seconds:.1f}s", file=sys.stderr, flush=True)
+        engines.append(engine)
+    return engines
+
+
+class BackgroundLoad:
+    """Загрузка и прогрев модели в фоновом потоке, пока идёт запись.
+
+    Микрофон открывается первым, модель догружается параллельно —
+    к стопу она обычно уже в памяти. report() показывает, сколько
+    загрузки спряталось за записью и сколько пришлось ждать после стопа.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, backend=BACKEND):
+        self.engine = None
+        self.error = None
+        self.started = time.monotonic()
+        self.finished = None
+        try:
+            engine = get_engine(backend, model_name)
+            engine.request_load()
+        except Exception as e:
+            engine, self.error = None, e
+        self._thread = threading.Thread(target=self._run, args=(engine,), name="model-load", daemon=True)
+        self._thread.start()
+
+    def _run(self, engine):
+        try:
+            if engine is not None:
+                self.engine = engine.load()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = time.monotonic()
+
+    def wait(self):
+        """Резидентный движок или None, если загрузка упала (ошибка — в self.error)."""
+        self._thread.join()
+        return self.engine
+
+    def report(self, recording_started, recording_stopped):
+        """Пересечение загрузки с записью (время — time.monotonic()). Возвращает словарь секунд."""
+        self.wait()
+        load = self.finished - self.started
+        overlap = max(0.0, min(self.finished, recording_stopped) - max(self.started, recording_started))
+        waited = max(0.0, self.finished - recording_stopped)
+        if self.error is not None:
+            print(f"❌ Загрузка модели: {self.error}", file=sys.stderr, flush=True)
+        else:
+            print(f"🔥 Модель: {load:.1f}s, из них во время записи {overlap:.1f}s, "
+                  f"ожидание после стопа {waited:.1f}s", file=sys.stderr, flush=True)
+        return {"load": load, "overlap": overlap, "waited": waited}
+
+
+def resident():
+    """Загруженные движки с таймингами — для status демона."""
+    with _engines_lock:
+        engines = list(_engines.values())
+    return [{"model": engine.describe(), "load_seconds": round(engine.load_seconds, 2),
+             "warmup_seconds": round(engine.warmup_seconds, 2)}
+            for engine in engines if engine.loaded]
+
+
+def transcribe_result(audio_array, language=None, model_name=MODEL_NAME, **options):
+    """Распознавание буфера в памяти выбранным движком. Возвращает полный result
+    (text, language, segments)."""
+    return get_engine(model_name=model_name).transcribe_result(audio_array, language, **options)
+
+
+def transcribe(audio_array, language=None, model_name=MODEL_NAME, **options):
+    """Распознаёт float32 mono 16 kHz. Возвращает (text, detected_language)."""
+    return get_engine(model_name=model_name).transcribe(audio_array, language, **options)
+
+
+def word_error_rate(reference, hypothesis):
+    """WER по словам без учёта регистра и пунктуации."""
+    ref = re.findall(r"\w+", reference.lower())
+    hyp = re.findall(r"\w+", hypothesis.lower())
+    if not ref:
+        return float(bool(hyp))
+    # Расстояние Левенштейна по словам, одна строка DP
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (r != h))
+    return row[-1] / len(ref)
+
+
+# ──────────────────────────────────────────────
+# Замер: старый путь через временный WAV
+# ──────────────────────────────────────────────
+def wav_roundtrip(audio_array):
+    """Повторяет старый путь: float32 → int16 → WAV → ffmpeg → float32.
+    Возвращает (audio, {этап: ms})."""
+    timings = {}
+
+    t0 = time.perf_counter()
+    int_data = (audio_array * 32767).astype(np.int16)
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
+        tmp_path = tmp.name
+    with wave.open(tmp_path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(RATE)
+        wf.writeframes(int_data.tobytes())
+    timings["write_wav"] = (time.perf_counter() - t0) * 1000
+
+    try:
+        # То же, что mlx_whisper.audio.load_audio
+        t0 = time.perf_counter()
+        cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-i", tmp_path,
+               "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(RATE), "-"]
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+        decoded = np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+        timings["ffmpeg_decode"] = (time.perf_counter() - t0) * 1000
+    finally:
+        os.unlink(tmp_path)
+
+    return decoded, timings
+
+
+def handoff_bench(seconds):
+    audio_array = (np.random.default_rng(0).standard_normal(int(seconds * RATE)) * 0.1).astype(np.float32)
+
+    t0 = time.perf_counter()
+    np.ascontiguousarray(audio_array, dtype=np.float32)
+    in_memory_ms = (time.perf_counter() - t0) * 1000
+
+    try:
+        _, timings = wav_roundtrip(audio_array)
+    except FileNotFoundError:
+        print("❌ ffmpeg не найден (brew install ffmpeg)", file=sys.stderr)
+        sys.exit(1)
+
+    old_ms = sum(timings.values())
+    print(f"🎧 Аудио: {seconds:.0f}s")
+    for stage, ms in timings.items():
+        print(f"   {stage:<14} {ms:8.1f} ms")
+    print(f"   {'in-memory':<14} {in_memory_ms:8.1f} ms")
+    print(f"⚡ Экономия на вызов: {old_ms - in_memory_ms:.1f} ms")
+
+
+# ──────────────────────────────────────────────
+# Сравнение движков
+# ──────────────────────────────────────────────
+def list_engines():
+    try:
+        auto = engine_class("auto").name
+    except RuntimeError:
+        auto = None
+    for name, cls in ENGINES.items():
+        mark = "⭐" if name == auto else "  "
+        state = "доступен" if cls.available() else f"нет модуля {cls.module}"
+        print(f"{mark}{name:<16} {state}")
+    print(f"\nMLXW_ASR={BACKEND}")
+
+
+def compare_engines(names, paths, language=None):
+    """Пропускная способность движков на одних и тех же файлах (по умолчанию — 10 s шума)."""
+    if paths:
+        from recording import load_recording
+        clips = [load_recording(path) for path in paths]
+    else:
+        clips = [(np.random.default_rng(0).standard_normal(10 * RATE) * 0.05).astype(np.float32)]
+    audio_seconds = sum(len(clip) for clip in clips) / RATE
+    reference, reference_name = None, None
+
+    print(f"🎧 {len(clips)} файл(ов), {audio_seconds:.1f}s аудио")
+    for name in names:
+        if not ENGINES[name].available():
+            print(f"   {name:<16} пропуск: нет модуля {ENGINES[name].module}")
+            continue
+        engine = get_engine(name).load()
+        load_s = engine.load_seconds + engine.warmup_seconds
+
+        t0 = time.perf_counter()
+        texts = [engine.transcribe(clip, language)[0] for clip in clips]
+        elapsed = time.perf_counter() - t0
+        line = (f"   {engine.describe():<48} загрузка {load_s:5.1f}s, "
+                f"RTF {elapsed / audio_seconds:.3f} ({audio_seconds / elapsed:.1f}× реального времени)")
+        # Расхождение с первым отработавшим движком — грубая проверка качества без эталонов
+        if reference is None:
+            reference, reference_name = texts, name
+        else:
+            line += f", WER к {reference_name} {np.mean([word_error_rate(r, t) for r, t in zip(reference, texts)]):.1%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Общая точка входа распознавания")
+    parser.add_argument("--handoff-bench", type=float, metavar="SECONDS",
+                        help="Сравнить временный WAV + ffmpeg с передачей буфера в памяти")
+    parser.add_argument("--engines", action="store_true", help="Какие движки доступны")
+    parser.add_argument("--compare", metavar="ENGINES",
+                        help="Сравнить движки через запятую (mlx,faster-whisper,whisper-cpp,stub)")
+    parser.add_argument("--preload", nargs="?", const="", metavar="MODELS",
+                        help="Загрузить и прогреть модели через запятую (по умолчанию MLXW_PRELOAD), показать время")
+    parser.add_argument("--lang", default=None)
+    parser.add_argument("files", nargs="*", help="WAV-файлы для --compare")
+    args = parser.parse_args()
+
+    if args.handoff_bench:
+        handoff_bench(args.handoff_bench)
+    elif args.engines:
+        list_engines()
+    elif args.preload is not None:
+        preload([m for m in args.preload.split(",") if m])
+    elif args.compare:
+        names = args.compare.split(",")
+        unknown = [n for n in names if n not in ENGINES]
+        if unknown:
+            parser.error(f"неизвестные движки: {', '.join(unknown)}")
+        compare_engines(names, args.files, args.lang)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+"""
+Источники аудио: микрофон и loopback (PyAudio), файл WAV/FLAC, PCM из stdin,
+синтетический сигнал.
+
+Все источники отдают блоки int16 mono 16 kHz: приведение формата
+(resample.Resampler) сделано внутри источника, так что запись, VAD и
+распознавание не знают, откуда пришёл звук. Любой режим можно запустить
+без микрофона, а путь захвата — нагрузить без железа.
+
+AudioSource:
+  open() / close()   — начать / закончить запись (источник переиспользуется)
+  read()             — следующий блок (CHUNK кадров в родной частоте), блокирует
+  interrupt()        — будит ожидающий read(): стоп не ждёт следующего чанка
+  stop(), drain()    — остановить захват и забрать то, что осталось
+  device_name, native_rate, native_channels, dropped_frames
+
+Источник по строке (--source или MLXW_SOURCE), open_source():
+  mic[:ИМЯ]                  — микрофон по подстроке имени (WHISPER_MIC), иначе системный
+  blackhole                  — loopback BlackHole, стерео в родной частоте
+  file:PATH, PATH.wav/.flac  — файл в темпе реального времени (FLAC — через soundfile)
+  stdin[:RATE[:CHANNELS]]    — сырой s16le, например
+                               ffmpeg -i talk.mp3 -f s16le -ar 16000 -ac 1 - | ./rt_toggle.py --source stdin
+  tone[:HZ], noise[:DBFS], bursts[:ON:OFF] — синтетика
+
+input_devices() / find_device() — общий поиск устройств PyAudio
+для rt_toggle.py, rt_blackhole.py, rt_system.py и rt_auto.py; выбор лучшего
+устройства с кэшем и обновлением по подключению — devices.py.
+"""
+
+import os
+import sys
+import threading
+import time
+import wave
+
+import numpy as np
+
+import startup
+from capture import CaptureStream, RingBuffer
+from resample import Resampler
+
+RATE = 16000      # Whisper ожидает 16 kHz
+CHUNK = 1024
+
+SOURCE = os.environ.get("MLXW_SOURCE")                        # None — микрофон/BlackHole по режиму
+PREFERRED_MIC = os.environ.get("WHISPER_MIC", "MacBook Pro Microphone")
+STDIN_BUFFER_SECONDS = 30
+
+
+def to_int16(samples):
+    samples = np.asarray(samples)
+    if samples.dtype == np.int16:
+        return samples
+    return (np.clip(samples, -1.0, 32767 / 32768) * 32768).astype(np.int16)
+
+
+# ──────────────────────────────────────────────
+# Устройства PyAudio
+# ──────────────────────────────────────────────
+def _pyaudio(p):
+    return p if p is not None else MicSource.pyaudio_instance()
+
+
+def input_devices(p=None):
+    """Устройства ввода: [{index, name, channels, rate}]."""
+    p = _pyaudio(p)
+    devices = []
+    for i in range(p.get_device_count()):
+        try:
+            info = p.get_device_info_by_index(i)
+        except Exception:
+            continue
+        if info['maxInputChannels'] > 0:
+            devices.append({'index': i, 'name': info['name'], 'channels': int(info['maxInputChannels']),
+                            'rate': int(info.get('defaultSampleRate', RATE))})
+    return devices
+
+
+def find_device(name_contains, is_input=True, p=None):
+    """Первое устройство с подстрокой в имени: (index, info) или (None, None)."""
+    p = _pyaudio(p)
+    key = 'maxInputChannels' if is_input else 'maxOutputChannels'
+    for i in range(p.get_device_count()):
+        info = p.get_device_info_by_index(i)
+        if info[key] > 0 and name_contains.lower() in info['name'].lower():
+            return i, info
+    return None, None
+
+
+# ──────────────────────────────────────────────
+# Источники
+# ──────────────────────────────────────────────
+class AudioSource:
+    """Общая часть: родной формат → int16 mono 16 kHz."""
+
+    device_name = None
+    native_rate = RATE
+    native_channels = 1
+
+    def __init__(self, chunk=CHUNK):
+        self.chunk = chunk
+        self._resampler = None
+        self._sampled = False
+
+    def open(self):
+        self._open()
+        self._resampler = Resampler(self.native_rate, RATE, self.native_channels)
+        startup.mark("устройство открыто")
+        return self
+
+    def read(self):
+        block = self._convert(self._read())
+        if not self._sampled:
+            self._sampled = True
+            startup.mark("первый сэмпл")
+        return block
+
+    def drain(self):
+        """Накопленное после последнего read() плюс хвост ресэмплера."""
+        tail = self._convert(self._drain())
+        flushed = to_int16(self._resampler.flush()) if self._resampler is not None else tail[:0]
+        return np.concatenate([tail, flushed])
+
+    def _convert(self, block):
+        if self._resampler is None or (self._resampler.passthrough and self.native_channels == 1):
+            return to_int16(block)
+        return to_int16(self._resampler.process(block))
+
+    def _open(self):
+        pass
+
+    def _read(self):
+        raise NotImplementedError
+
+    def _drain(self):
+        return np.zeros(0, dtype=np.int16)
+
+    def interrupt(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+    @property
+    def dropped_frames(self):
+        return 0
+
+    def warn_if_lossy(self):
+        pass
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MicSource(AudioSource):
+    """Устройство ввода PyAudio. Поток открывается на каждую запись,
+    а сам PyAudio (и CoreAudio под ним) остаётся загруженным."""
+
+    _pyaudio = None   # один экземпляр на процесс
+    _streams = 0      # открытых потоков на нём — пока они есть, PortAudio не перезапускаем
+
+    def __init__(self, name_contains=None, channels=1, rate=None, chunk=CHUNK, device_index=None):
+        super().__init__(chunk)
+        self.name_contains = name_contains
+        self.native_channels = channels
+        self.native_rate = rate or RATE
+        self.device_index = device_index
+        self._requested_rate = rate
+        self._capture = None
+
+    @classmethod
+    def pyaudio_instance(cls):
+        if cls._pyaudio is None:
+            import pyaudio
+            cls._pyaudio = pyaudio.PyAudio()
+        return cls._pyaudio
+
+    def find_device(self):
+        """Заданный индекс, устройство по подстроке в имени или системное по умолчанию."""
+        p = self.pyaudio_instance()
+        if self.device_index is not None:
+            return self.device_index, p.get_device_info_by_index(self.device_index)
+        if self.name_contains:
+            index, info = find_device(self.name_contains, p=p)
+            if index is not None:
+                return index, info
+        return None, p.get_default_input_device_info()
+
+    def _open(self):
+        p = self.pyaudio_instance()
+        index, info = self.find_device()
+        self.device_name = info['name']
+        self.native_channels = min(self.native_channels, int(info['maxInputChannels']))
+        if self._requested_rate is None and self.native_channels > 1:
+            # Loopback-устройства пишем в их родной частоте
+            self.native_rate = int(info.get('defaultSampleRate', RATE))
+
+        self._capture = CaptureStream(index, self.native_channels, self.native_rate,
+                                      self.chunk, pyaudio_instance=p).start()
+        MicSource._streams += 1
+
+    def _read(self):
+        return self._capture.read(self.chunk)
+
+    def _drain(self):
+        return self._capture.drain()
+
+    def interrupt(self):
+        if self._capture is not None:
+            self._capture.interrupt()
+
+    def stop(self):
+        if self._capture is not None:
+            self._capture.stop()
+
+    def close(self):
+        if self._capture is not None:
+            self._capture.close()
+            self._capture = None
+            MicSource._streams -= 1
+
+    @property
+    def dropped_frames(self):
+        return self._capture.dropped_frames if self._capture is not None else 0
+
+    def warn_if_lossy(self):
+        if self._capture is not None:
+            self._capture.warn_if_lossy()
+
+    @classmethod
+    def terminate(cls):
+        if cls._pyaudio is not None:
+            cls._pyaudio.terminate()
+            cls._pyaudio = None
+
+    @classmethod
+    def reset(cls):
+        """Перезапустить PortAudio, чтобы он заново перечислил устройства
+        (список фиксируется при инициализации). Не трогает открытые потоки:
+        False — сброс отложен."""
+        if cls._streams:
+            return False
+        cls.terminate()
+        return True
+
+
+class _PacedSource(AudioSource):
+    """Источник без своего часового генератора: блоки отдаются в темпе
+    реального времени (realtime=True) или так быстро, как их читают."""
+
+    def __init__(self, realtime=True, chunk=CHUNK):
+        super().__init__(chunk)
+        self.realtime = realtime
+        self._next_deadline = None
+        self._wake = threading.Event()
+
+    def _open(self):
+        self._next_deadline = time.monotonic()
+        self._wake.clear()
+
+    def _pace(self):
+        if not self.realtime:
+            return
+        self._next_deadline += self.chunk / self.native_rate
+        delay = self._next_deadline - time.monotonic()
+        if delay > 0:
+            self._wake.wait(delay)
+
+    def interrupt(self):
+        self._wake.set()
+
+    def close(self):
+        self._next_deadline = None
+
+
+class FileSource(_PacedSource):
+    """WAV или FLAC, проигрываемый как живой микрофон.
+
+    После конца файла отдаётся тишина: для записи «до паузы» это
+    выглядит как замолчавший говорящий.
+    """
+
+    def __init__(self, path, realtime=True, chunk=CHUNK):
+        super().__init__(realtime, chunk)
+        self.path = path
+        self.device_name = f"file:{path}"
+        self._samples, self.native_rate, self.native_channels = read_audio_file(path)
+        self._pos = 0
+
+    def _open(self):
+        super()._open()
+        self._pos = 0
+
+    def _read(self):
+        n = self.chunk * self.native_channels
+        block = self._samples[self._pos:self._pos + n]
+        self._pos += n
+        if len(block) < n:
+            block = np.concatenate([block, np.zeros(n - len(block), dtype=np.int16)])
+        self._pace()
+        return block
+
+    @property
+    def exhausted(self):
+        return self._pos >= len(self._samples)
+
+    @property
+    def duration(self):
+        return len(self._samples) / self.native_channels / self.native_rate
+
+
+def read_audio_file(path):
+    """(int16 interleaved, rate, channels) из WAV; другие форматы — через soundfile."""
+    if path.lower().endswith(".wav"):
+        with wave.open(path, 'rb') as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError(f"{path}: ожидается 16-bit PCM")
+            data = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+            return data, wf.getframerate(), wf.getnchannels()
+    try:
+        import soundfile
+    except ImportError:
+        raise RuntimeError(f"{path}: для FLAC и других форматов нужен soundfile (pip install soundfile)")
+    data, rate = soundfile.read(path, dtype='int16', always_2d=True)
+    return data.reshape(-1), rate, data.shape[1]
+
+
+class StdinSource(_PacedSource):
+    """Сырой PCM s16le из stdin. Читает фоновый поток, поэтому read()
+    прерывается стопом, даже если данных нет. После EOF — тишина
+    в реальном времени, как у замолчавшего микрофона."""
+
+    def __init__(self, rate=RATE, channels=1, chunk=CHUNK, stream=None):
+        super().__init__(realtime=True, chunk=chunk)
+        self.native_rate = rate
+        self.native_channels = channels
+        self.device_name = f"stdin:{rate}:{channels}"
+        self._stream = stream or sys.stdin.buffer
+        self._ring = RingBuffer(STDIN_BUFFER_SECONDS * rate, channels)
+        self._thread = None
+        self.eof = False
+
+    def _open(self):
+        super()._open()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._pump, daemon=True)
+            self._thread.start()
+
+    def _pump(self):
+        frame_bytes = 2 * self.native_channels
+        pending = b""
+        while True:
+            data = self._stream.read1(self.chunk * frame_bytes) if hasattr(self._stream, "read1") \
+                else self._stream.read(self.chunk * frame_bytes)
+            if not data:
+                break
+            pending += data
+            usable = len(pending) - len(pending) % frame_bytes
+            self._ring.write(np.frombuffer(pending[:usable], dtype=np.int16))
+            pending = pending[usable:]
+        self.eof = True
+        self._ring.close()
+
+    def _read(self):
+        if not self.eof or self._ring.available:
+            block = self._ring.read(self.chunk)
+            if len(block) or not self.eof:
+                self._next_deadline = time.monotonic()
+                return block
+        self._pace()
+        return np.zeros(self.chunk * self.native_channels, dtype=np.int16)
+
+    def _drain(self):
+        return self._ring.drain()
+
+    def interrupt(self):
+        super().interrupt()
+        self._ring.interrupt()
+
+    @property
+    def dropped_frames(self):
+        return self._ring.overrun_frames
+
+    @property
+    def exhausted(self):
+        return self.eof and not self._ring.available
+
+
+class SyntheticSource(_PacedSource):
+    """Тон, шум или «фразы» (тон вспышками on/off секунд) с заданным уровнем.
+    realtime=False — для нагрузочных прогонов быстрее реального времени."""
+
+    def __init__(self, kind="tone", freq=440.0, level_db=-20.0, on=1.5, off=1.0,
+                 realtime=True, chunk=CHUNK, seed=0):
+        super().__init__(realtime, chunk)
+        if kind not in ("tone", "noise", "bursts"):
+            raise ValueError(f"неизвестный сигнал: {kind}")
+        self.kind = kind
+        self.freq = freq
+        self.amplitude = 10 ** (level_db / 20)
+        self.on, self.off = on, off
+        self.device_name = f"synthetic:{kind}"
+        self._rng = np.random.default_rng(seed)
+        self._pos = 0
+
+    def _open(self):
+        super()._open()
+        self._pos = 0
+
+    def _read(self):
+        t = (self._pos + np.arange(self.chunk)) / self.native_rate
+        self._pos += self.chunk
+        if self.kind == "noise":
+            signal = self._rng.standard_normal(self.chunk) * self.amplitude / 3
+        else:
+            signal = np.sin(2 * np.pi * self.freq * t) * self.amplitude
+            if self.kind == "bursts":
+                signal *= (t % (self.on + self.off)) < self.on
+        self._pace()
+        return to_int16(signal)
+
+
+def open_source(spec, audio_file=None):
+    """Источник по строке (см. описание модуля). audio_file подменяет любой
+    режим файлом — так демон и тесты работают без устройств."""
+    if audio_file:
+        return FileSource(audio_file)
+    kind, _, arg = spec.partition(":")
+    args = arg.split(":") if arg else []
+    if kind == "mic":
+        return MicSource(name_contains=arg or PREFERRED_MIC)
+    if kind == "blackhole":
+        return MicSource(name_contains="blackhole", channels=2)
+    if kind == "file":
+        return FileSource(arg)
+    if spec.lower().endswith((".wav", ".flac")):
+        return FileSource(spec)
+    if kind == "stdin":
+        rate = int(args[0]) if args else RATE
+        return StdinSource(rate, int(args[1]) if len(args) > 1 else 1)
+    if kind == "tone":
+        return SyntheticSource("tone", freq=float(arg or 440))
+    if kind == "noise":
+        return SyntheticSource("noise", level_db=float(arg or -40))
+    if kind == "bursts":
+        return SyntheticSource("bursts", on=float(args[0]) if args else 1.5,
+                               off=float(args[1]) if len(args) > 1 else 1.0)
+    raise ValueError(f"Неизвестный источник: {spec}")
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Сквозной замер задержки на записанных фразах вместо микрофона.
+
+Каждый WAV корпуса проигрывается в реальном времени через FileSource
+по тому же пути, что идёт живая запись в демоне (rt_daemon.py):
+источник → Resampler → VAD / буфер записи → сжатие пауз → движок → текст.
+
+Замеряется режим демона — то, что получает горячая клавиша через
+rt_client.py при запущенном демоне, — а не сами rt*.py: все три
+«скрипта» ниже — команды TranscriptionDaemon с их способом записи.
+Что есть только в самих скриптах, сюда не попадает: --stream (дорасшифровка
+хвоста в streaming.py) и загрузка модели во время записи (BackgroundLoad) —
+модель в демоне уже резидентна, её загрузка и прогрев идут отдельными
+столбцами. Длинные записи демон режет так же (chunking.py).
+
+  rt            — запись до паузы (как rt.py --single, команда listen):
+                  задержка от конца речи, включая hangover VAD
+  rt_toggle     — запись до стопа (как rt_toggle.py, start/stop): стоп через
+                  --stop-delay после конца речи, задержка от стопа
+  rt_blackhole  — то же, но источник — 48 kHz стерео (как rt_blackhole.py)
+
+Корпус: DIR/**/*.wav (16-bit PCM), эталон — одноимённый .txt.
+Язык — из имени папки (DIR/ru/*.wav, DIR/en/*.wav), иначе автодетект.
+Конец речи — по VAD на файле целиком (для rt — конец первой фразы,
+для toggle — последней).
+
+Каждая пара (скрипт, модель) идёт в отдельном процессе — пик RSS
+и время загрузки у каждой свои. Отчёт: p50/p95 задержки, RTF, пик RSS,
+WER; --json сохраняет всё для сравнения прогонов.
+
+  python bench.py corpus/ --json runs/m5-turbo.json
+  python bench.py corpus/ --engine stub --scripts rt,rt_toggle
+  python bench.py --diff runs/old.json runs/new.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+import asr
+from recording import load_recording
+
+RATE = 16000
+SCRIPTS = ("rt", "rt_toggle", "rt_blackhole")
+BLACKHOLE_RATE = 48000
+STOP_DELAY_SECONDS = 0.3     # реакция человека: конец речи → горячая клавиша
+
+
+# ──────────────────────────────────────────────
+# Корпус
+# ──────────────────────────────────────────────
+def load_corpus(directory):
+    """[{name, path, lang, reference, audio_seconds, first_end, last_end}] по DIR/**/*.wav."""
+    from vad import HANGOVER_SECONDS, detect_segments
+
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(directory, "**", "*.wav"), recursive=True)):
+        folder = os.path.basename(os.path.dirname(path))
+        ref_path = os.path.splitext(path)[0] + ".txt"
+        reference = None
+        if os.path.exists(ref_path):
+            with open(ref_path, encoding='utf-8') as f:
+                reference = f.read().strip()
+        audio = load_recording(path)
+        segments = detect_segments(audio, RATE)
+        # Конец закрытой фразы у VAD включает hangover — сама речь кончилась раньше
+        ends = [min(end, len(audio)) / RATE - (HANGOVER_SECONDS if end < len(audio) else 0.0)
+                for _, end in segments] or [len(audio) / RATE]
+        fixtures.append({
+            "name": os.path.relpath(path, directory),
+            "path": path,
+            "lang": folder if len(folder) == 2 and folder.isalpha() else None,
+            "reference": reference,
+            "audio_seconds": round(len(audio) / RATE, 2),
+            "first_end": round(ends[0], 3),
+            "last_end": round(ends[-1], 3),
+        })
+    return fixtures
+
+
+def write_blackhole_copy(path, directory):
+    """Копия фразы в формате BlackHole: 48 kHz стерео — чтобы работал путь с Resampler."""
+    from resample import resample
+
+    audio = resample(load_recording(path), RATE, BLACKHOLE_RATE)
+    stereo = np.repeat(np.clip(audio * 32768, -32768, 32767).astype(np.int16), 2)
+    out = os.path.join(directory, os.path.basename(path))
+    with wave.open(out, 'wb') as wf:
+        wf.setnchannels(2)
+        wf.setsampwidth(2)
+        wf.setframerate(BLACKHOLE_RATE)
+        wf.writeframes(stereo.tobytes())
+    return out
+
+
+# ──────────────────────────────────────────────
+# Один прогон (в отдельном процессе)
+# ──────────────────────────────────────────────
+def _peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux — килобайты, macOS — байты
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def run_fixture(daemon, script, fixture, stop_delay):
+    """Проигрывает фразу и возвращает замеры; время — от открытия источника."""
+    source = "blackhole" if script == "rt_blackhole" else "mic"
+    if script == "rt":
+        t_open = time.monotonic()
+        response = daemon.cmd_listen(source=source, lang=fixture["lang"])
+        t_done = time.monotonic()
+        t_from = t_open + fixture["first_end"]
+    else:
+        t_open = time.monotonic()
+        daemon.cmd_start(source=source, lang=fixture["lang"])
+        t_from = t_open + fixture["last_end"] + stop_delay
+        time.sleep(max(0.0, t_from - time.monotonic()))
+        response = daemon.cmd_stop()
+        t_done = time.monotonic()
+
+    result = {"name": fixture["name"], "lang": fixture["lang"], "ok": response.get("ok", False)}
+    if not result["ok"]:
+        result["error"] = response.get("error")
+        return result
+    result.update({
+        "text": response["text"],
+        "detected_language": response["language"],
+        "latency_ms": round((t_done - t_from) * 1000),
+        "inference_ms": response["inference_ms"],
+        "rtf": round(response["inference_ms"] / 1000 / max(response["audio_seconds"], 1e-3), 3),
+    })
+    if fixture["reference"] is not None:
+        result["wer"] = round(asr.word_error_rate(fixture["reference"], response["text"]), 4)
+    return result
+
+
+def worker(script, engine_name, model_name, fixtures, stop_delay):
+    """Прогон одного скрипта на одной модели; результат — JSON в stdout."""
+    from rt_daemon import TranscriptionDaemon
+
+    engine = asr.get_engine(engine_name, model_name).load()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fixture in fixtures:
+            path = write_blackhole_copy(fixture["path"], tmp) if script == "rt_blackhole" else fixture["path"]
+            daemon = TranscriptionDaemon(engine, audio_file=path)
+            try:
+                result = run_fixture(daemon, script, fixture, stop_delay)
+            finally:
+                daemon.close()
+            print(f"   {script:<12} {fixture['name']:<32} "
+                  f"{result.get('latency_ms', '—'):>6} ms  {result.get('text', result.get('error'))}",
+                  file=sys.stderr, flush=True)
+            results.append(result)
+
+    json.dump({"script": script, "mode": "daemon", "engine": engine.name, "model": engine.model_name,
+               "load_seconds": round(engine.load_seconds, 2),
+               "warmup_seconds": round(engine.warmup_seconds, 2), "peak_rss_mb": round(_peak_rss_mb(), 1),
+               "fixtures": results}, sys.stdout, ensure_ascii=False)
+
+
+# ──────────────────────────────────────────────
+# Сводка
+# ──────────────────────────────────────────────
+def summarize(run):
+    ok = [f for f in run["fixtures"] if f["ok"]]
+    latencies = [f["latency_ms"] for f in ok]
+    wers = [f["wer"] for f in ok if "wer" in f]
+    run["summary"] = {
+        "fixtures": len(run["fixtures"]),
+        "failed": len(run["fixtures"]) - len(ok),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50))) if latencies else None,
+        "latency_ms_p95": round(float(np.percentile(latencies, 95))) if latencies else None,
+        "rtf": round(float(np.mean([f["rtf"] for f in ok])), 3) if ok else None,
+        "wer": round(float(np.mean(wers)), 4) if wers else None,
+        "peak_rss_mb": run["peak_rss_mb"],
+        "load_seconds": run["load_seconds"],
+        "warmup_seconds": run.get("warmup_seconds"),
+    }
+    return run
+
+
+def print_table(runs):
+    print("\nРежим демона (rt_daemon.py): без --stream и без загрузки модели во время записи")
+    print(f"{'скрипт':<13} {'модель':<42} {'p50 ms':>7} {'p95 ms':>7} {'RTF':>6} "
+          f"{'WER':>6} {'RSS MB':>7} {'загрузка':>8} {'прогрев':>8}")
+    for run in runs:
+        s = run["summary"]
+        fmt = lambda v, spec: format(v, spec) if v is not None else "—"
+        print(f"{run['script']:<13} {run['engine'] + ':' + run['model']:<42.42} "
+              f"{fmt(s['latency_ms_p50'], '>7')} {fmt(s['latency_ms_p95'], '>7')} {fmt(s['rtf'], '>6.3f')} "
+              f"{fmt(s['wer'], '>6.1%')} {s['peak_rss_mb']:>7.0f} {s['load_seconds']:>7.1f}s "
+              f"{fmt(s.get('warmup_seconds'), '>7.1f')}s"
+              + (f"  (ошибок: {s['failed']})" if s['failed'] else ""))
+
+
+def diff(old_path, new_path):
+    """Сравнение двух JSON-прогонов по совпадающим (скрипт, модель)."""
+    with open(old_path) as f:
+        old = {(r["script"], r["engine"], r["model"]): r["summary"] for r in json.load(f)["runs"]}
+    with open(new_path) as f:
+        new = json.load(f)["runs"]
+    print(f"{'скрипт':<13} {'модель':<42} {'p50 ms':>15} {'p95 ms':>15} {'WER':>15}")
+    for run in new:
+        before = old.get((run["script"], run["engine"], run["model"]))
+        if before is None:
+            continue
+        after = run["summary"]
+        cells = []
+        for key, spec in (("latency_ms_p50", ".0f"), ("latency_ms_p95", ".0f"), ("wer", ".1%")):
+            a, b = before[key], after[key]
+            cells.append(f"{format(a, spec)} → {format(b, spec)}" if a is not None and b is not None else "—")
+        print(f"{run['script']:<13} {run['engine'] + ':' + run['model']:<42.42} "
+              + " ".join(f"{c:>15}" for c in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сквозной замер задержки на записанных фразах")
+    parser.add_argument("corpus", nargs="?", help="Папка с WAV (+ .txt эталоны, ru/ en/ подпапки)")
+    parser.add_argument("--scripts", default=",".join(SCRIPTS), help="Через запятую: rt,rt_toggle,rt_blackhole")
+    parser.add_argument("--models", default=asr.MODEL_NAME, help="Модели через запятую")
+    parser.add_argument("--engine", default=asr.BACKEND, choices=["auto", *asr.ENGINES])
+    parser.add_argument("--stop-delay", type=float, default=STOP_DELAY_SECONDS,
+                        help="Конец речи → стоп для toggle-скриптов, s")
+    parser.add_argument("--json", metavar="PATH", help="Сохранить результаты")
+    parser.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"), help="Сравнить два JSON-прогона")
+    parser.add_argument("--worker", nargs=3, metavar=("SCRIPT", "ENGINE", "MODEL"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.diff:
+        diff(*args.diff)
+        return
+    if not args.corpus:
+        parser.print_help()
+        return
+
+    scripts = args.scripts.split(",")
+    unknown = [s for s in scripts if s not in SCRIPTS]
+    if unknown:
+        parser.error(f"неизвестные скрипты: {', '.join(unknown)}")
+    fixtures = load_corpus(args.corpus)
+    if not fixtures:
+        print(f"❌ Нет WAV в {args.corpus}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.worker:
+        script, engine, model = args.worker
+        worker(script, engine, model, fixtures, args.stop_delay)
+        return
+
+    total = sum(f["audio_seconds"] for f in fixtures)
+    print(f"🎧 {len(fixtures)} фраз, {total:.0f}s аудио; проигрывание в реальном времени", file=sys.stderr)
+    runs = []
+    # Профили шума фраз не должны попадать в настоящий кэш; каждый прогон калибруется заново
+    cache = tempfile.mkdtemp(prefix="mlxw-bench-")
+    env = dict(os.environ, MLXW_CACHE_DIR=cache)
+    for model in args.models.split(","):
+        for script in scripts:
+            cmd = [sys.executable, __file__, args.corpus, "--stop-delay", str(args.stop_delay),
+                   "--worker", script, args.engine, model]
+            out = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, env=env)
+            if out.returncode != 0:
+                print(f"❌ {script} / {model}: прогон упал", file=sys.stderr)
+                continue
+            runs.append(summarize(json.loads(out.stdout)))
+    shutil.rmtree(cache, ignore_errors=True)
+
+    print_table(runs)
+    if args.json:
+        report = {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "host": {"platform": platform.platform(), "machine": platform.machine(),
+                     "python": platform.python_version()},
+            "corpus": os.path.abspath(args.corpus),
+            "stop_delay": args.stop_delay,
+            "runs": runs,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 {args.json}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Захват в режиме callback PortAudio с предвыделенным кольцевым буфером.
+
+Раньше каждый цикл записи вызывал stream.read() в блокирующем Python-цикле:
+любая пауза потребителя (GC, проверка стоп-файла, импорт модели) приводила
+к переполнению буфера PortAudio, и кадры молча терялись
+(exception_on_overflow=False).
+
+Теперь PortAudio сам вызывает _callback из своего потока, и тот только
+копирует int16 в RingBuffer. Потребитель забирает данные через явный API:
+
+    with CaptureStream(rate=16000, channels=1) as capture:
+        block = capture.read(1024)          # int16, ждёт пока наберётся
+        ...
+        rest = capture.drain()              # всё, что накопилось
+
+Буфер рассчитан на BUFFER_SECONDS: потребитель может «отстать» на это
+время без потерь. Если отстал сильнее — самые старые отсчёты
+перезаписываются и учитываются в capture.ring.overrun_frames.
+"""
+
+import os
+import sys
+import threading
+
+import numpy as np
+
+RATE = 16000
+CHUNK = 1024
+BUFFER_SECONDS = float(os.environ.get("MLXW_CAPTURE_BUFFER", "30"))
+
+
+class RingBuffer:
+    """Кольцевой буфер int16 с одним писателем и одним читателем.
+    Позиции — монотонные счётчики отсчётов, индекс в массиве — по модулю."""
+
+    def __init__(self, capacity_frames, channels=1):
+        self.channels = channels
+        self.capacity = capacity_frames * channels
+        self._buf = np.zeros(self.capacity, dtype=np.int16)
+        self._write_pos = 0
+        self._read_pos = 0
+        self._closed = False
+        self._interrupted = False
+        self._cond = threading.Condition()
+        self.overrun_frames = 0
+
+    @property
+    def available(self):
+        """Сколько кадров можно прочитать прямо сейчас."""
+        return (self._write_pos - self._read_pos) // self.channels
+
+    def write(self, samples):
+        n = len(samples)
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+            n = self.capacity
+        with self._cond:
+            start = self._write_pos % self.capacity
+            first = min(n, self.capacity - start)
+            self._buf[start:start + first] = samples[:first]
+            self._buf[:n - first] = samples[first:]
+            self._write_pos += n
+
+            lag = self._write_pos - self._read_pos
+            if lag > self.capacity:
+                self.overrun_frames += (lag - self.capacity) // self.channels
+                self._read_pos = self._write_pos - self.capacity
+            self._cond.notify_all()
+
+    def read(self, frames, timeout=None):
+        """Ждёт frames кадров (или закрытия/таймаута/interrupt) и возвращает копию.
+        После закрытия отдаёт остаток; пустой массив — данных больше не будет."""
+        need = frames * self.channels
+        with self._cond:
+            self._cond.wait_for(lambda: (self._write_pos - self._read_pos >= need
+                                         or self._closed or self._interrupted), timeout)
+            self._interrupted = False
+            return self._take(min(need, self._write_pos - self._read_pos))
+
+    def interrupt(self):
+        """Будит ожидающий read(): он сразу вернёт то, что уже есть."""
+        with self._cond:
+            self._interrupted = True
+            self._cond.notify_all()
+
+    def drain(self):
+        """Всё накопленное, без ожидания."""
+        with self._cond:
+            return self._take(self._write_pos - self._read_pos)
+
+    def _take(self, n):
+        n -= n % self.channels
+        start = self._read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        out = np.empty(n, dtype=np.int16)
+        out[:first] = self._buf[start:start + first]
+        out[first:] = self._buf[:n - first]
+        self._read_pos += n
+        return out
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class CaptureStream:
+    """Входной поток PyAudio в callback-режиме, пишущий в RingBuffer.
+
+    Единый интерфейс захвата для rt.py, rt_toggle.py, rt_blackhole.py,
+    rt_system.py, rt_auto.py и демона. Если pyaudio_instance не передан,
+    поток создаёт свой PyAudio и завершает его в close().
+    """
+
+    def __init__(self, device_index=None, channels=1, rate=RATE, chunk=CHUNK,
+                 buffer_seconds=BUFFER_SECONDS, pyaudio_instance=None):
+        self.device_index = device_index
+        self.channels = channels
+        self.rate = rate
+        self.chunk = chunk
+        self.ring = RingBuffer(int(buffer_seconds * rate), channels)
+        self.input_overflows = 0
+        self.device_name = None
+        self._p = pyaudio_instance
+        self._owns_pyaudio = pyaudio_instance is None
+        self._stream = None
+        self._pa_continue = None
+        self._pa_overflow = 0
+
+    def start(self):
+        import pyaudio
+
+        if self._p is None:
+            self._p = pyaudio.PyAudio()
+        self._pa_continue = pyaudio.paContinue
+        self._pa_overflow = pyaudio.paInputOverflow
+
+        stream_kwargs = dict(
+            format=pyaudio.paInt16, channels=self.channels, rate=self.rate,
+            input=True, frames_per_buffer=self.chunk, stream_callback=self._callback
+        )
+        if self.device_index is not None:
+            stream_kwargs['input_device_index'] = self.device_index
+        try:
+            info = (self._p.get_device_info_by_index(self.device_index) if self.device_index is not None
+                    else self._p.get_default_input_device_info())
+            self.device_name = info['name']
+            self._stream = self._p.open(**stream_kwargs)
+        except Exception:
+            self._terminate()
+            raise
+        return self
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        # Поток PortAudio: только копирование, никакой логики
+        self.ring.write(np.frombuffer(in_data, dtype=np.int16))
+        if status & self._pa_overflow:
+            self.input_overflows += 1
+        return None, self._pa_continue
+
+    # ── API потребителя ──
+    def read(self, frames=None, timeout=None):
+        """Следующие frames кадров int16 (interleaved). Блокирует до готовности."""
+        return self.ring.read(frames or self.chunk, timeout)
+
+    def drain(self):
+        return self.ring.drain()
+
+    def interrupt(self):
+        """Прерывает ожидание в read() — для мгновенного стопа (control.py)."""
+        self.ring.interrupt()
+
+    @property
+    def dropped_frames(self):
+        return self.ring.overrun_frames
+
+    def warn_if_lossy(self):
+        if self.dropped_frames or self.input_overflows:
+            print(f"⚠️  Потеряно кадров: {self.dropped_frames}, "
+                  f"переполнений PortAudio: {self.input_overflows}", file=sys.stderr, flush=True)
+
+    # ── жизненный цикл ──
+    def stop(self):
+        """Останавливает устройство; накопленное остаётся доступным для drain()."""
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        self.ring.close()
+
+    def close(self):
+        self.stop()
+        self._terminate()
+
+    def _terminate(self):
+        if self._owns_pyaudio and self._p is not None:
+            self._p.terminate()
+            self._p = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
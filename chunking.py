@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Распознавание длинных записей независимыми кусками.
+
+mlx_whisper.transcribe() идёт по длинной записи 30-секундными окнами
+строго по очереди: каждое окно ждёт текст предыдущего (condition_on_previous_text).
+Здесь запись режется на куски до CHUNK_SECONDS по паузам (vad.detect_segments) —
+каждый кусок помещается в одно окно энкодера и не зависит от соседей,
+поэтому куски декодируются параллельно, если движок это умеет
+(ASREngine.parallel: faster-whisper с MLXW_CPU_WORKERS > 1, заглушка).
+mlx — по одному: Metal-очередь одна, но и так без ожидания текста соседей.
+
+Если паузы не нашлось (сплошная речь дольше CHUNK_SECONDS), кусок режется
+жёстко с перекрытием OVERLAP_SECONDS в обе стороны. Слова сшиваются по
+таймкодам: каждый кусок отвечает за свой интервал до середины перекрытия,
+слово достаётся куску, в чей интервал попала его середина; повтор
+последнего слова на стыке выкидывается.
+
+Язык без --lang определяется по первому куску с речью и фиксируется
+для остальных — иначе язык мог бы меняться посреди записи.
+Куски без речи не распознаются (Whisper на тишине галлюцинирует).
+
+  python chunking.py --plan long.wav
+  python chunking.py --bench long.wav --workers 1,2,4 [--backend faster-whisper] [--lang ru]
+"""
+
+import argparse
+import bisect
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+RATE = 16000
+LONG_SECONDS = float(os.environ.get("MLXW_LONG_SECONDS", "60"))     # длиннее — режем на куски
+CHUNK_SECONDS = float(os.environ.get("MLXW_CHUNK_SECONDS", "28"))   # + 2 перекрытия ≤ 30 s окна
+CHUNK_WORKERS = int(os.environ.get("MLXW_CHUNK_WORKERS", "0"))      # 0 — сколько позволяет движок
+MIN_CHUNK_SECONDS = 8.0        # паузу ближе к началу куска не берём — слишком мелко
+OVERLAP_SECONDS = 1.0
+PAUSE_HANGOVER_SECONDS = 0.6   # пауза короче — не граница
+
+
+class Chunk:
+    """Кусок записи: [start, end) декодируется, [keep_start, keep_end) — его часть текста.
+    Всё в отсчётах."""
+
+    def __init__(self, start, end, keep_start, keep_end, has_speech=True):
+        self.start = start
+        self.end = end
+        self.keep_start = keep_start
+        self.keep_end = keep_end
+        self.has_speech = has_speech
+
+    @property
+    def duration(self):
+        return (self.end - self.start) / RATE
+
+    def __repr__(self):
+        return (f"Chunk({self.start / RATE:.1f}-{self.end / RATE:.1f}s, "
+                f"keep {self.keep_start / RATE:.1f}-{self.keep_end / RATE:.1f}s)")
+
+
+def plan_chunks(audio, max_seconds=CHUNK_SECONDS, overlap=OVERLAP_SECONDS, segments=None):
+    """Делит запись на куски по паузам; без паузы — жёстко с перекрытием."""
+    total = len(audio)
+    if segments is None:
+        from vad import detect_segments
+        segments = detect_segments(audio, RATE, hangover=PAUSE_HANGOVER_SECONDS)
+    # Кандидаты на разрез — середины пауз между фразами
+    cuts = [(a_end + b_start) // 2 for (_, a_end), (b_start, _) in zip(segments, segments[1:])]
+    max_len = int(max_seconds * RATE)
+    min_len = int(min(MIN_CHUNK_SECONDS, max_seconds / 2) * RATE)
+    pad = int(overlap * RATE)
+
+    bounds = []          # (позиция разреза, жёсткий ли)
+    pos = 0
+    while total - pos > max_len:
+        i = bisect.bisect_right(cuts, pos + max_len) - 1
+        if i >= 0 and cuts[i] > pos + min_len:
+            bounds.append((cuts[i], False))
+            pos = cuts[i]
+        else:
+            pos += max_len
+            bounds.append((pos, True))
+
+    chunks = []
+    keep_start, start = 0, 0
+    for cut, hard in bounds + [(total, False)]:
+        end = min(total, cut + pad) if hard else cut
+        chunks.append(Chunk(start, end, keep_start, cut))
+        keep_start, start = cut, (cut - pad if hard else cut)
+
+    for chunk in chunks:
+        chunk.has_speech = any(s < chunk.end and e > chunk.start for s, e in segments)
+    return chunks
+
+
+def _normalize(word):
+    return re.sub(r"[^\w]", "", word.lower())
+
+
+def stitch(chunks, results):
+    """Склеивает result кусков в один result формата mlx_whisper (таймкоды — от начала записи)."""
+    segments, last_word = [], None
+    for chunk, result in zip(chunks, results):
+        if result is None:
+            continue
+        offset = chunk.start / RATE
+        keep_start, keep_end = chunk.keep_start / RATE, chunk.keep_end / RATE
+        for segment in result.get("segments", []):
+            start, end = segment["start"] + offset, segment["end"] + offset
+            words = segment.get("words") or []
+            if not words:
+                # Движок без пословных таймкодов: решаем по середине сегмента
+                if keep_start <= (start + end) / 2 < keep_end:
+                    segments.append(dict(segment, start=start, end=end, words=[]))
+                continue
+            kept = []
+            for word in words:
+                w_start, w_end = word["start"] + offset, word["end"] + offset
+                if not keep_start <= (w_start + w_end) / 2 < keep_end:
+                    continue
+                # Слово на стыке, попавшее в оба куска с чуть разными таймкодами
+                if (last_word is not None and not kept and _normalize(word["word"])
+                        and _normalize(word["word"]) == _normalize(last_word["word"])
+                        and w_start < last_word["end"]):
+                    continue
+                kept.append(dict(word, start=w_start, end=w_end))
+            if kept:
+                last_word = kept[-1]
+                segments.append(dict(segment, start=kept[0]["start"], end=kept[-1]["end"],
+                                     text="".join(w["word"] for w in kept), words=kept))
+    language = next((r.get("language") for r in results if r is not None), "?")
+    return {"text": "".join(s["text"] for s in segments), "language": language, "segments": segments}
+
+
+def transcribe_long(audio, language=None, engine=None, model_name=None, workers=None, chunks=None,
+                    cache=False):
+    """Распознаёт длинную запись кусками. Возвращает result формата mlx_whisper
+    и пишет в stderr, сколько кусков и в сколько потоков."""
+    import asr
+
+    engine = engine or asr.get_engine(model_name=model_name or asr.MODEL_NAME)
+    chunks = chunks if chunks is not None else plan_chunks(audio)
+    workers = max(1, min(workers or CHUNK_WORKERS or engine.parallel, len(chunks)))
+
+    def decode(chunk, lang):
+        if not chunk.has_speech:
+            return None
+        return engine.transcribe_result(audio[chunk.start:chunk.end], lang, cache,
+                                        word_timestamps=True, condition_on_previous_text=False)
+
+    started = time.perf_counter()
+    results = [None] * len(chunks)
+    todo = list(range(len(chunks)))
+    if language is None:
+        # Язык — по первому куску с речью, дальше фиксирован
+        while todo and language is None:
+            i = todo.pop(0)
+            results[i] = decode(chunks[i], None)
+            if results[i] is not None:
+                language = results[i].get("language")
+
+    with ThreadPoolExecutor(workers) as pool:
+        for i, result in zip(todo, pool.map(lambda i: decode(chunks[i], language), todo)):
+            results[i] = result
+
+    result = stitch(chunks, results)
+    skipped = sum(not c.has_speech for c in chunks)
+    print(f"✂️  {len(audio) / RATE:.0f}s → {len(chunks)} кусков"
+          + (f" ({skipped} без речи)" if skipped else "")
+          + f", потоков: {workers}, {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return result
+
+
+def transcribe(audio, language=None, engine=None, model_name=None, cache=False):
+    """(text, lang): длинная запись — кусками, короткая — как обычно.
+    cache=True — через кэш распознаваний (повторяемый вход)."""
+    import asr
+
+    engine = engine or asr.get_engine(model_name=model_name or asr.MODEL_NAME)
+    if len(audio) <= LONG_SECONDS * RATE:
+        return engine.transcribe(audio, language, cache)
+    result = transcribe_long(audio, language, engine, cache=cache)
+    return result["text"].strip(), result.get("language", "?")
+
+
+# ──────────────────────────────────────────────
+# План и замер
+# ──────────────────────────────────────────────
+def print_plan(chunks):
+    hard = 0
+    for i, chunk in enumerate(chunks):
+        kind = "жёстко" if chunk.end > chunk.keep_end else "пауза"
+        hard += kind == "жёстко"
+        print(f"  {i:3d}  {chunk.start / RATE:8.1f} – {chunk.end / RATE:8.1f}s  "
+              f"{chunk.duration:5.1f}s  {kind}{'' if chunk.has_speech else '  (тишина)'}")
+    print(f"Кусков: {len(chunks)}, жёстких разрезов: {hard}")
+
+
+def bench(path, worker_counts, language=None, backend=None):
+    """Целиком (последовательные окна) против кусков на разном числе потоков."""
+    import asr
+    from recording import load_recording
+
+    audio = load_recording(path)
+    engine = asr.get_engine(backend or asr.BACKEND)
+    print(f"{path}: {len(audio) / RATE:.0f}s, {engine.describe()}, параллельно до {engine.parallel}")
+    engine.load()
+    chunks = plan_chunks(audio)
+
+    t0 = time.perf_counter()
+    reference = engine.transcribe_result(audio, language).get("text", "").strip()
+    whole = time.perf_counter() - t0
+    print(f"  целиком        {whole:7.1f}s")
+
+    for workers in worker_counts:
+        t0 = time.perf_counter()
+        text = transcribe_long(audio, language, engine, workers=workers, chunks=chunks)["text"]
+        elapsed = time.perf_counter() - t0
+        wer = asr.word_error_rate(reference, text)
+        print(f"  куски × {workers:<2}     {elapsed:7.1f}s  ×{whole / elapsed:.1f}  "
+              f"расхождение с целым: {wer:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Распознавание длинных записей кусками")
+    parser.add_argument("--plan", metavar="FILE", help="Показать разрезы (без модели)")
+    parser.add_argument("--bench", metavar="FILE", help="Целиком vs кусками")
+    parser.add_argument("--workers", default="1,2,4", help="Число потоков для --bench через запятую")
+    parser.add_argument("--backend", default=None, help="Движок (MLXW_ASR)")
+    parser.add_argument("--lang", default=None)
+    args = parser.parse_args()
+
+    if args.plan:
+        from recording import load_recording
+        print_plan(plan_chunks(load_recording(args.plan)))
+    elif args.bench:
+        bench(args.bench, [int(n) for n in args.workers.split(",")], args.lang, args.backend)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Канал управления записью через сигналы вместо стоп-файла.
+
+Раньше цикл записи после каждого чанка (~64 ms) проверял /tmp/mlxw-stop:
+стоп запаздывал на чанк, а забытый файл ломал следующую сессию.
+
+Теперь записывающий процесс слушает сигналы:
+  SIGINT, SIGUSR1 — стоп (распознать записанное); Ctrl+C в терминале тоже
+  SIGTERM         — отмена (Hammerspoon шлёт его при перезагрузке конфига)
+  SIGUSR2         — статус в STATUS_FILE (JSON)
+
+C-обработчик сигнала пишет номер в pipe (signal.set_wakeup_fd), его читает
+поток-наблюдатель — он будит цикл записи сразу (capture.interrupt()),
+даже если главный поток висит в ожидании аудио.
+
+Hammerspoon шлёт сигнал прямо процессу задачи (task:interrupt()),
+поэтому файлов, которые могут «протухнуть», нет. Для ручного управления:
+  python control.py stop | cancel | status     — по PID из /tmp/mlxw-pid
+
+Метрика: время от сигнала стопа до начала первого шага инференса
+(mark_inference()) печатается в stderr.
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+PID_FILE = "/tmp/mlxw-pid"
+STATUS_FILE = "/tmp/mlxw-status"
+
+STOP_SIGNALS = (signal.SIGINT, signal.SIGUSR1)
+CANCEL_SIGNALS = (signal.SIGTERM,)
+STATUS_SIGNALS = (signal.SIGUSR2,)
+
+
+class ControlChannel:
+    """Стоп/отмена/статус для одного записывающего процесса.
+
+    Вызывать install() из главного потока; add_waker(fn) регистрирует
+    функцию, которая прерывает блокирующее чтение аудио.
+    """
+
+    def __init__(self, pid_file=PID_FILE, status_file=STATUS_FILE):
+        self.pid_file = pid_file
+        self.status_file = status_file
+        self.state = "recording"
+        self.started_at = time.perf_counter()
+        self.stop_requested_at = None
+        self.stop_to_inference_ms = None
+        self._event = threading.Event()
+        self._wakers = []
+        self._previous = {}
+        self._previous_wakeup_fd = -1
+        self._pipe = None
+        self._thread = None
+
+    # ── состояние ──
+    @property
+    def stopped(self):
+        """Запись нужно прекратить (стоп или отмена)."""
+        return self._event.is_set()
+
+    @property
+    def cancelled(self):
+        return self.state == "cancelled"
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+    def add_waker(self, fn):
+        self._wakers.append(fn)
+        if self.stopped:
+            fn()
+
+    def request_stop(self):
+        self._finish("stopping")
+
+    def cancel(self):
+        self._finish("cancelled")
+
+    def _finish(self, state):
+        if self._event.is_set():
+            return
+        self.stop_requested_at = time.perf_counter()
+        self.state = state
+        self._event.set()
+        for fn in self._wakers:
+            fn()
+
+    def status(self):
+        return {
+            "pid": os.getpid(),
+            "state": self.state,
+            "elapsed": round(time.perf_counter() - self.started_at, 2),
+        }
+
+    def write_status(self):
+        tmp = f"{self.status_file}.{os.getpid()}"
+        with open(tmp, 'w') as f:
+            json.dump(self.status(), f)
+        os.replace(tmp, self.status_file)
+
+    # ── метрика ──
+    def mark_inference(self):
+        """Вызывается прямо перед первым шагом инференса после стопа."""
+        self.state = "transcribing"
+        if self.stop_requested_at is None or self.stop_to_inference_ms is not None:
+            return self.stop_to_inference_ms
+        self.stop_to_inference_ms = (time.perf_counter() - self.stop_requested_at) * 1000
+        print(f"⏱  Стоп → инференс: {self.stop_to_inference_ms:.0f} ms", file=sys.stderr, flush=True)
+        return self.stop_to_inference_ms
+
+    # ── сигналы ──
+    def install(self):
+        read_fd, write_fd = os.pipe()
+        os.set_blocking(write_fd, False)
+        self._pipe = (read_fd, write_fd)
+        self._previous_wakeup_fd = signal.set_wakeup_fd(write_fd)
+        for sig in STOP_SIGNALS + CANCEL_SIGNALS + STATUS_SIGNALS:
+            # Python-обработчик пустой: вся работа — в потоке-наблюдателе
+            self._previous[sig] = signal.signal(sig, lambda *_: None)
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+        with open(self.pid_file, 'w') as f:
+            f.write(str(os.getpid()))
+        return self
+
+    def _watch(self):
+        read_fd = self._pipe[0]
+        while True:
+            data = os.read(read_fd, 64)
+            for signum in data:
+                if signum == 0:
+                    return
+                if signum in STOP_SIGNALS:
+                    self.request_stop()
+                elif signum in CANCEL_SIGNALS:
+                    self.cancel()
+                elif signum in STATUS_SIGNALS:
+                    self.write_status()
+
+    def close(self):
+        """Возвращает прежние обработчики и убирает PID-файл (только свой)."""
+        if self._pipe is None:
+            return
+        signal.set_wakeup_fd(self._previous_wakeup_fd)
+        for sig, handler in self._previous.items():
+            signal.signal(sig, handler)
+        os.write(self._pipe[1], b"\0")
+        self._thread.join()
+        for fd in self._pipe:
+            os.close(fd)
+        self._pipe = None
+
+        for path in (self.pid_file, self.status_file):
+            try:
+                with open(path) as f:
+                    mine = str(os.getpid()) in f.read()
+                if mine:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ──────────────────────────────────────────────
+# Отправка команд из другого процесса
+# ──────────────────────────────────────────────
+COMMAND_SIGNALS = {"stop": signal.SIGUSR1, "cancel": signal.SIGTERM, "status": signal.SIGUSR2}
+
+
+def recording_pid(pid_file=PID_FILE):
+    """PID записывающего процесса или None, если файла нет или процесс мёртв."""
+    try:
+        with open(pid_file) as f:
+            pid = int(f.read().strip())
+        os.kill(pid, 0)
+    except (OSError, ValueError):
+        return None
+    return pid
+
+
+def send(command, pid_file=PID_FILE, status_file=STATUS_FILE, timeout=1.0):
+    pid = recording_pid(pid_file)
+    if pid is None:
+        return {"ok": False, "error": "запись не идёт"}
+
+    before = os.path.getmtime(status_file) if os.path.exists(status_file) else 0
+    os.kill(pid, COMMAND_SIGNALS[command])
+    if command != "status":
+        return {"ok": True, "pid": pid}
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if os.path.exists(status_file) and os.path.getmtime(status_file) > before:
+            with open(status_file) as f:
+                return {"ok": True, **json.load(f)}
+        time.sleep(0.01)
+    return {"ok": False, "error": "нет ответа на запрос статуса"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Управление идущей записью")
+    parser.add_argument("command", choices=sorted(COMMAND_SIGNALS))
+    args = parser.parse_args()
+
+    response = send(args.command)
+    print(json.dumps(response, ensure_ascii=False))
+    sys.exit(0 if response["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
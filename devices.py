@@ -0,0 +1,220 @@
+"""
+Реестр устройств ввода: перечисляются один раз, дальше — из кэша.
+
+Раньше rt_auto.py на каждой фразе заново перечислял устройства и прогонял
+эвристики по именам, а rt_system.py звал system_profiler (~1 s) ради имени
+устройства вывода. Теперь список устройств вместе с оценками лежит в
+REGISTRY и пересобирается только когда устройства могли измениться:
+
+  - Hammerspoon (hs.audiodevice.watcher) трогает STAMP_FILE при подключении,
+    отключении или смене устройства по умолчанию; проверка — один stat();
+  - без наблюдателя (файла нет) — не чаще раза в MLXW_DEVICE_POLL секунд
+    (30; 0 — только по событиям и явному refresh());
+  - refresh() — явно, например если выбранное устройство не открылось.
+
+PortAudio фиксирует список устройств при инициализации, поэтому пересборка
+перезапускает общий экземпляр PyAudio (MicSource.reset) — но только когда
+ни один поток не открыт, иначе откладывается до следующей проверки.
+
+Оценки: "mic" — лучший микрофон (USB > AirPods > встроенный, rt_auto.py),
+"system" — лучший источник системного звука (BlackHole > Multi-Output > ...,
+rt_system.py).
+"""
+
+import os
+import sys
+import threading
+import time
+
+from audio_sources import MicSource, input_devices
+
+STAMP_FILE = "/tmp/mlxw-devices"
+POLL_SECONDS = float(os.environ.get("MLXW_DEVICE_POLL", "30"))
+
+# Приоритет микрофона по типу (больше — лучше)
+MIC_PRIORITIES = {
+    # Внешние
+    'usb': 100,           # USB микрофоны
+    'thunderbolt': 95,    # Thunderbolt аудио интерфейсы
+
+    # Беспроводные
+    'airpods': 80,        # AirPods (хорошее качество)
+    'bluetooth': 70,      # Другие Bluetooth устройства
+
+    # Виртуальные
+    'blackhole': 60,      # BlackHole для записи системного звука
+    'multi-output': 55,   # Multi-Output Device
+    'aggregate': 50,      # Aggregate Device
+
+    # Встроенные (низший приоритет)
+    'macbook': 30,        # Встроенный микрофон MacBook
+    'built-in': 25,       # Другие встроенные
+    'default': 20         # Системный по умолчанию
+}
+
+
+def device_type(name):
+    """Тип устройства по имени (ключ MIC_PRIORITIES)."""
+    name_lower = name.lower()
+
+    if 'usb' in name_lower or 'yeti' in name_lower or 'blue' in name_lower:
+        return 'usb'
+    if 'thunderbolt' in name_lower or 'apollo' in name_lower:
+        return 'thunderbolt'
+    if 'airpods' in name_lower:
+        return 'airpods'
+    if 'bluetooth' in name_lower or 'bt' in name_lower:
+        return 'bluetooth'
+    if 'blackhole' in name_lower:
+        return 'blackhole'
+    if 'multi-output' in name_lower:
+        return 'multi-output'
+    if 'aggregate' in name_lower:
+        return 'aggregate'
+    if 'macbook' in name_lower or 'internal' in name_lower:
+        return 'macbook'
+    if 'built-in' in name_lower:
+        return 'built-in'
+    return 'default'
+
+
+def system_priority(name):
+    """Пригодность устройства для захвата системного звука."""
+    name_lower = name.lower()
+    if 'blackhole' in name_lower:
+        return 100
+    if 'multi' in name_lower or 'aggregate' in name_lower:
+        return 90
+    if 'soundflower' in name_lower or 'loopback' in name_lower:
+        return 80
+    if 'usb' in name_lower or 'external' in name_lower:
+        return 50
+    if 'airpods' in name_lower or 'headphones' in name_lower:
+        return 40
+    if 'built-in' in name_lower or 'internal' in name_lower:
+        return 10
+    return 0
+
+
+def scan_pyaudio():
+    """(устройства ввода, имя устройства вывода по умолчанию) от PortAudio."""
+    p = MicSource.pyaudio_instance()
+    try:
+        output = p.get_default_output_device_info()['name']
+    except Exception:
+        output = None
+    return input_devices(p), output
+
+
+class DeviceRegistry:
+    """Кэш устройств ввода с оценками. scan — функция перечисления
+    (по умолчанию PortAudio; подменяется для проверки без железа)."""
+
+    def __init__(self, stamp_file=STAMP_FILE, poll_seconds=POLL_SECONDS, scan=scan_pyaudio):
+        self.stamp_file = stamp_file
+        self.poll_seconds = poll_seconds
+        self._scan = scan
+        self._devices = None
+        self.default_output = None
+        self.scans = 0
+        self.scan_ms = 0.0          # последнего перечисления
+        self._scanned_at = None
+        self._stamp = None
+        self._callbacks = []
+        self._lock = threading.RLock()
+
+    # ── обновление ──
+    def _read_stamp(self):
+        try:
+            return os.stat(self.stamp_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def changed(self, poll=True):
+        """Могли ли устройства измениться с последнего перечисления (дёшево).
+        poll=False — только по событию наблюдателя, без опроса по таймеру."""
+        if self._devices is None:
+            return True
+        stamp = self._read_stamp()
+        if stamp is not None or self._stamp is not None:
+            # Есть наблюдатель Hammerspoon — верим ему
+            return stamp != self._stamp
+        return (poll and bool(self.poll_seconds)
+                and time.monotonic() - self._scanned_at >= self.poll_seconds)
+
+    def refresh(self):
+        """Перечислить устройства заново. False — отложено (открыт поток)."""
+        with self._lock:
+            if self._devices is not None and not MicSource.reset():
+                return False
+            stamp = self._read_stamp()
+            started = time.perf_counter()
+            devices, output = self._scan()
+            self.scan_ms = (time.perf_counter() - started) * 1000
+            self.scans += 1
+            self._scanned_at = time.monotonic()
+            self._stamp = stamp
+
+            for device in devices:
+                device['type'] = device_type(device['name'])
+                device['priority'] = MIC_PRIORITIES.get(device['type'], 0)
+                device['system_priority'] = system_priority(device['name'])
+
+            previous, self._devices = self._devices, devices
+            self.default_output = output
+            if previous is not None:
+                self._notify(previous, devices)
+            return True
+
+    def _notify(self, previous, devices):
+        before = {d['name'] for d in previous}
+        after = {d['name'] for d in devices}
+        added, removed = sorted(after - before), sorted(before - after)
+        if not added and not removed:
+            return
+        print("🔌 Устройства: " + ", ".join([f"+{n}" for n in added] + [f"−{n}" for n in removed])
+              + f" ({self.scan_ms:.0f} ms)", file=sys.stderr)
+        for callback in self._callbacks:
+            callback(added, removed)
+
+    def poll(self):
+        """Пересобрать список, если устройства могли измениться. True — пересобран."""
+        with self._lock:
+            return self.changed() and self.refresh()
+
+    def subscribe(self, callback):
+        """callback(added, removed) — имена подключённых и отключённых устройств."""
+        self._callbacks.append(callback)
+
+    # ── выбор ──
+    @property
+    def devices(self):
+        self.poll()
+        return list(self._devices)
+
+    def ranked(self, kind="mic"):
+        """Устройства от лучшего к худшему: "mic" или "system"."""
+        if kind == "system":
+            key = lambda d: d['system_priority']
+        else:
+            key = lambda d: (d['priority'], d['channels'])
+        return sorted(self.devices, key=key, reverse=True)
+
+    def best(self, kind="mic"):
+        ranked = self.ranked(kind)
+        return ranked[0] if ranked else None
+
+    def find(self, name_contains):
+        """Первое устройство с подстрокой в имени или None."""
+        for device in self.devices:
+            if name_contains.lower() in device['name'].lower():
+                return device
+        return None
+
+    @property
+    def stats(self):
+        return {"devices": len(self._devices or []), "scans": self.scans,
+                "scan_ms": round(self.scan_ms, 1)}
+
+
+REGISTRY = DeviceRegistry()
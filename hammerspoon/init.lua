@@ -46,12 +46,18 @@ local HOTKEYS = {
 local MLXW_PATH = os.getenv("HOME") .. "/mlxwhisper"
 local MLXW = MLXW_PATH .. "/mlxw"
 local MLXW_TOGGLE = MLXW_PATH .. "/mlxw-toggle"
+local MLXW_DAEMON = MLXW_PATH .. "/mlxw-daemon"
+
+-- Демон держит модель загруженной: после стопа остаётся только инференс.
+-- false — каждый хоткей запускает отдельный Python-процесс, как раньше
+local USE_DAEMON = true
 
 -- ===== ВНУТРЕННИЕ ПЕРЕМЕННЫЕ =====
 local mlxwTask = nil       -- ссылка на запущенный процесс
 local isRecording = false  -- текущее состояние toggle-режима
-local STOP_FILE = "/tmp/mlxw-stop"
-local PID_FILE = "/tmp/mlxw-pid"
+-- Управление записью — сигналами процессу задачи (control.py):
+-- task:interrupt() (SIGINT) — стоп, task:terminate() (SIGTERM) — отмена
+local daemonTask = nil     -- процесс rt_daemon.py
 
 -- ═══════════════════════════════════════════════════════
 -- 1. БЫСТРАЯ ДИКТОВКА (одна фраза)
@@ -83,9 +89,6 @@ hs.hotkey.bind(HOTKEYS.toggleMain.modifiers, HOTKEYS.toggleMain.key, function()
 
     if not isRecording then
         -- ══ СТАРТ ЗАПИСИ ══
-        -- Очистка стоп-файла перед началом
-        os.remove(STOP_FILE)
-
         isRecording = true
         hs.alert.show("🔴 REC BlackHole (системный звук)...", 1.5)
 
@@ -106,10 +109,6 @@ hs.hotkey.bind(HOTKEYS.toggleMain.modifiers, HOTKEYS.toggleMain.key, function()
             else
                 hs.alert.show("❌ Не распознано", 2)
             end
-
-            -- Очистка файлов после завершения
-            os.remove(STOP_FILE)
-            os.remove(PID_FILE)
         end, {"-c", MLXW_TOGGLE .. " " .. langArg})
 
         mlxwTask:start()
@@ -126,14 +125,13 @@ hs.hotkey.bind(HOTKEYS.toggleMain.modifiers, HOTKEYS.toggleMain.key, function()
         print("Stopping recording...")
         hs.alert.show("⏹ Стоп. Распознаю...", 2)
 
-        -- Создать стоп-файл — скрипт увидит его и остановится
-        local f = io.open(STOP_FILE, "w")
-        if f then
-            f:write("stop")
-            f:close()
-            print("Stop file created")
+        -- SIGINT — скрипт сразу прекращает запись и распознаёт её
+        if mlxwTask and mlxwTask:isRunning() then
+            mlxwTask:interrupt()
+            print("Stop signal sent")
         else
-            print("Failed to create stop file!")
+            print("No recording task to stop!")
+            isRecording = false
         end
     end
 end)
@@ -171,10 +169,10 @@ hs.hotkey.bind(HOTKEYS.toggleMicrophone.modifiers, HOTKEYS.toggleMicrophone.key,
     else
         -- ══ СТОП ЗАПИСИ ══
         hs.alert.show("⏹ Стоп микрофона. Распознаю...", 2)
-        local f = io.open(STOP_FILE, "w")
-        if f then
-            f:write("stop")
-            f:close()
+        if micTask and micTask:isRunning() then
+            micTask:interrupt()
+        else
+            isMicRecording = false
         end
     end
 end)
@@ -207,9 +205,15 @@ hs.hotkey.bind(HOTKEYS.reload.modifiers, HOTKEYS.reload.key, function()
         mlxwTask:terminate()
         mlxwTask = nil
     end
+    if daemonTask then
+        daemonTask:terminate()
+        daemonTask = nil
+    end
+    if micTask then
+        micTask:terminate()
+        micTask = nil
+    end
     isRecording = false
-    os.remove(STOP_FILE)
-    os.remove(PID_FILE)
     hs.alert.show("♻️ Перезагрузка конфига...", 1)
     hs.reload()
 end)
@@ -218,9 +222,34 @@ end)
 -- ИНИЦИАЛИЗАЦИЯ
 -- ═══════════════════════════════════════════════════════
 
--- Cleanup при старте
-os.remove(STOP_FILE)
-os.remove(PID_FILE)
+-- Запуск демона с тёплой моделью (повторный запуск сам завершится,
+-- если демон уже слушает сокет)
+if USE_DAEMON then
+    daemonTask = hs.task.new("/bin/bash", function(exitCode, stdOut, stdErr)
+        print("Daemon exited. Exit code:", exitCode)
+        daemonTask = nil
+    end, {"-c", MLXW_DAEMON})
+    daemonTask:start()
+end
+
+-- Подключение/отключение аудиоустройств и смена устройства по умолчанию:
+-- трогаем штамп, по нему devices.py пересобирает кэш устройств
+-- (вместо перечисления на каждой фразе)
+local DEVICES_STAMP = "/tmp/mlxw-devices"
+local function touchDevicesStamp()
+    local f = io.open(DEVICES_STAMP, "w")
+    if f then
+        f:write(tostring(hs.timer.secondsSinceEpoch()))
+        f:close()
+    end
+end
+hs.audiodevice.watcher.setCallback(function(event)
+    if event == "dev#" or event == "dIn " or event == "dOut" then
+        touchDevicesStamp()
+    end
+end)
+hs.audiodevice.watcher.start()
+touchDevicesStamp()
 
 -- Показать активные горячие клавиши при загрузке
 local function formatHotkey(hotkey)
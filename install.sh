@@ -128,7 +128,7 @@ print_success "Модель Whisper готова"
 
 # Делаем скрипты исполняемыми
 print_step "Настройка скриптов..."
-chmod +x mlxw mlxw-toggle mlxw-system rt_blackhole.py 2>/dev/null || true
+chmod +x mlxw mlxw-toggle mlxw-system mlxw-daemon rt_blackhole.py 2>/dev/null || true
 print_success "Скрипты готовы к использованию"
 
 # Установка SoX для звуковых сигналов
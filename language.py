@@ -0,0 +1,165 @@
+"""
+Язык сессии: определяется один раз и дальше не гоняется на каждой фразе.
+
+Без --lang Whisper на каждой фразе делает отдельный проход language ID
+(энкодер по первым 30 s + шаг декодера) и только потом распознаёт.
+LanguageTracker определяет язык на первой уверенной фразе (не короче
+LOCK_SECONDS, средний logprob не ниже MIN_LOGPROB) и закрепляет его:
+следующие фразы идут сразу с language=... Если уверенность распознавания
+с закреплённым языком падает ниже MIN_LOGPROB, язык этой фразы
+определяется заново; другой — перераспознаём и закрепляем его.
+
+Определение — явным проходом ASREngine.detect_language (mlx, faster-whisper),
+у остальных движков — внутри transcribe с language=None.
+MLXW_LANGUAGES=ru,en (или --langs) — определять только среди этих языков:
+при явном проходе выбирается самый вероятный из разрешённых, иначе
+результат вне списка перераспознаётся с закреплённым (или первым
+разрешённым) языком.
+MLXW_LANG_STICKY=0 — определять на каждой фразе, как раньше.
+
+Экономия печатается после каждой фразы: сколько проходов определения
+пропущено и сколько это времени (по замерам явных проходов detect_language).
+"""
+
+import os
+import sys
+import time
+
+STICKY = os.environ.get("MLXW_LANG_STICKY", "1") != "0"
+LANGUAGES = os.environ.get("MLXW_LANGUAGES", "")          # "ru,en" — определять только среди них
+MIN_LOGPROB = float(os.environ.get("MLXW_LANG_MIN_LOGPROB", "-0.8"))
+LOCK_SECONDS = 1.0           # по фразе короче язык не закрепляем — «ок» и «угу» ненадёжны
+RATE = 16000
+
+
+def parse_languages(value):
+    """"ru, en" → ["ru", "en"]."""
+    return [l for l in (value or "").replace(" ", "").split(",") if l]
+
+
+def confidence(result):
+    """Средний logprob токенов по сегментам (взвешенно по длительности) или None."""
+    total, weight = 0.0, 0.0
+    for segment in result.get("segments", []):
+        if segment.get("avg_logprob") is None:
+            continue
+        duration = max(segment["end"] - segment["start"], 0.01)
+        total += segment["avg_logprob"] * duration
+        weight += duration
+    return total / weight if weight else None
+
+
+class LanguageTracker:
+    """Обёртка над ASREngine: подставляет язык сессии и ведёт счёт сэкономленных проходов."""
+
+    def __init__(self, engine, forced=None, allowed=None, sticky=STICKY, min_logprob=MIN_LOGPROB):
+        self.engine = engine
+        self.forced = forced
+        self.allowed = parse_languages(LANGUAGES) if allowed is None else list(allowed)
+        self.sticky = sticky
+        self.min_logprob = min_logprob
+        self.language = forced
+        self.utterances = 0
+        self.detections = 0       # проходов language ID (явных и внутри transcribe)
+        self.skipped = 0          # фраз, распознанных сразу с закреплённым языком
+        self.redetections = 0
+        self._detect_seconds = 0.0
+        self._detect_timed = 0
+        self.last = ""
+
+    # ── определение ──
+    def _detect(self, audio):
+        """Язык фразы (среди разрешённых) или None — пусть определит transcribe."""
+        started = time.perf_counter()
+        probs = self.engine.detect_language(audio)
+        if probs is None:
+            return None
+        self.detections += 1
+        self._detect_seconds += time.perf_counter() - started
+        self._detect_timed += 1
+        candidates = {l: p for l, p in probs.items() if l in self.allowed} or probs
+        return max(candidates, key=candidates.get)
+
+    def _decode(self, audio, language, options):
+        if language is None:
+            # Проход определения внутри transcribe
+            self.detections += 1
+        result = self.engine.transcribe_result(audio, language, **options)
+        if language is None and self.allowed and result.get("language") not in self.allowed:
+            fallback = self.language or self.allowed[0]
+            result = self.engine.transcribe_result(audio, fallback, **options)
+            result["language"] = fallback
+        return result
+
+    @property
+    def detect_ms(self):
+        """Средняя цена прохода определения, если её удалось замерить."""
+        return self._detect_seconds / self._detect_timed * 1000 if self._detect_timed else None
+
+    # ── распознавание ──
+    def transcribe_result(self, audio, **options):
+        self.utterances += 1
+        if self.forced:
+            self.last = f"🌐  {self.forced} (--lang)"
+            return self.engine.transcribe_result(audio, self.forced, **options)
+
+        if self.language is not None:
+            self.skipped += 1
+            language = self.language
+            note = "закреплён"
+        else:
+            language = self._detect(audio)
+            note = "определён"
+        result = self._decode(audio, language, options)
+        score = confidence(result)
+
+        if note == "закреплён" and score is not None and score < self.min_logprob:
+            # С закреплённым языком вышло неуверенно — возможно, собеседник перешёл на другой
+            self.redetections += 1
+            self.skipped -= 1
+            detected = self._detect(audio)
+            if detected is None:
+                candidate = self._decode(audio, None, options)
+                detected = candidate.get("language")
+            else:
+                candidate = None
+            if detected and detected != language:
+                result = candidate or self._decode(audio, detected, options)
+                score = confidence(result)
+                self.language = None
+            note = "перепроверен"
+
+        detected = result.get("language")
+        confident = score is None or score >= self.min_logprob
+        if (self.sticky and self.language is None and detected and detected != "?"
+                and confident and len(audio) / RATE >= LOCK_SECONDS):
+            self.language = detected
+            note += ", закреплён"
+
+        self.last = self._describe(detected, note, score)
+        return result
+
+    def transcribe(self, audio, **options):
+        """(text, language) — как ASREngine.transcribe."""
+        result = self.transcribe_result(audio, **options)
+        return result.get("text", "").strip(), result.get("language", "?")
+
+    # ── отчёт ──
+    def _describe(self, language, note, score):
+        line = f"🌐  {language} ({note}"
+        if score is not None:
+            line += f", logprob {score:.2f}"
+        line += f") — пропущено определений: {self.skipped}/{self.utterances}"
+        if self.skipped and self.detect_ms is not None:
+            line += f", ~{self.skipped * self.detect_ms / 1000:.1f}s"
+        return line
+
+    def report(self):
+        if self.forced or not self.utterances:
+            return
+        saved = ""
+        if self.detect_ms is not None:
+            saved = f", сэкономлено ~{self.skipped * self.detect_ms / 1000:.1f}s ({self.detect_ms:.0f} ms на проход)"
+        print(f"🌐  Язык: {self.language or '—'}, фраз: {self.utterances}, проходов определения: "
+              f"{self.detections}, пропущено: {self.skipped}, перепроверок: {self.redetections}{saved}",
+              file=sys.stderr)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Адаптивный уровень шума для VAD с профилями по устройствам.
+
+Фиксированный порог (SILENCE_THRESHOLD=500 в rt.py, 1000 в rt_auto.py)
+подходит только тому микрофону, под который его подбирали: на шумном
+устройстве фраза никогда не заканчивается, а на тихом теряются начала.
+
+NoiseFloor:
+  - калибровка — по первым CALIBRATION_SECONDS записи (нижний перцентиль
+    уровня кадров, чтобы раннее начало речи не завысило оценку);
+  - слежение — minimum statistics: минимум уровня кадров за TRACK_SECONDS.
+    Паузы между словами есть и внутри фразы, поэтому оценка не «уплывает»
+    вверх от речи, но за несколько секунд догоняет включённый вентилятор;
+  - профиль — ~/.cache/mlxwhisper/noise/<устройство>.json; следующая
+    сессия начинает с сохранённого уровня и калибровку пропускает.
+
+Пороги VAD считаются от уровня шума: on = floor + ON_MARGIN_DB,
+off = floor + OFF_MARGIN_DB (не ниже MIN_ON_DB / MIN_OFF_DB).
+
+  python noise_floor.py --list            — сохранённые профили
+  python noise_floor.py --forget NAME     — откалибровать устройство заново
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from collections import deque
+
+import numpy as np
+
+CACHE_DIR = os.path.expanduser(os.environ.get("MLXW_CACHE_DIR", "~/.cache/mlxwhisper"))
+PROFILE_DIR = os.path.join(CACHE_DIR, "noise")
+
+FRAME_MS = 30
+CALIBRATION_SECONDS = 0.3
+CALIBRATION_PERCENTILE = 20
+TRACK_SECONDS = 3.0
+MIN_BIAS_DB = 3.0            # минимум за окно систематически ниже среднего шума
+
+ON_MARGIN_DB = 10.0
+OFF_MARGIN_DB = 6.0
+MIN_ON_DB = -55.0            # цифровая тишина не должна делать порог чувствительным к шипению
+MIN_OFF_DB = -60.0
+
+
+def profile_path(device, directory=PROFILE_DIR):
+    slug = re.sub(r'[^\w.-]+', '_', device or "default").strip('_').lower() or "default"
+    return os.path.join(directory, slug + ".json")
+
+
+class NoiseFloor:
+    """Оценка уровня шума (dBFS) по уровням кадров."""
+
+    def __init__(self, device=None, directory=PROFILE_DIR):
+        self.device = device
+        self.path = profile_path(device, directory) if device else None
+        self.floor_db = None
+        self.from_profile = False
+        self._calibration = []
+        self._window = deque(maxlen=int(TRACK_SECONDS * 1000 / FRAME_MS))
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.floor_db = float(json.load(f)["floor_db"])
+                self.from_profile = True
+            except (OSError, ValueError, KeyError):
+                pass
+
+    @property
+    def calibrated(self):
+        return self.floor_db is not None
+
+    def update(self, frame_db):
+        """Добавляет уровни кадров блока; возвращает текущую оценку или None."""
+        frame_db = np.asarray(frame_db, dtype=np.float32)
+        if not len(frame_db):
+            return self.floor_db
+        if not self.calibrated:
+            self._calibration.extend(frame_db.tolist())
+            if len(self._calibration) * FRAME_MS / 1000 >= CALIBRATION_SECONDS:
+                self.floor_db = float(np.percentile(self._calibration, CALIBRATION_PERCENTILE))
+                self._window.extend(self._calibration)
+            return self.floor_db
+
+        self._window.extend(frame_db.tolist())
+        if len(self._window) == self._window.maxlen:
+            self.floor_db = min(self._window) + MIN_BIAS_DB
+        else:
+            # Окно ещё не набралось — сдвигаемся от профиля только вниз
+            self.floor_db = min(self.floor_db, min(self._window) + MIN_BIAS_DB)
+        return self.floor_db
+
+    def thresholds(self):
+        """(on_db, off_db) для energy-VAD."""
+        return (max(self.floor_db + ON_MARGIN_DB, MIN_ON_DB),
+                max(self.floor_db + OFF_MARGIN_DB, MIN_OFF_DB))
+
+    def save(self):
+        if not self.path or not self.calibrated:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}"
+        with open(tmp, 'w') as f:
+            json.dump({"device": self.device, "floor_db": round(self.floor_db, 2),
+                       "updated": time.strftime("%Y-%m-%d %H:%M:%S")}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def describe(self):
+        if not self.calibrated:
+            return "шум: калибровка..."
+        source = "профиль" if self.from_profile else "калибровка"
+        return f"шум {self.floor_db:.1f} dBFS ({source})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Профили уровня шума устройств")
+    parser.add_argument("--list", action="store_true", help="Показать сохранённые профили")
+    parser.add_argument("--forget", metavar="DEVICE", help="Удалить профиль устройства")
+    args = parser.parse_args()
+
+    if args.forget:
+        path = profile_path(args.forget)
+        if os.path.exists(path):
+            os.unlink(path)
+            print(f"🗑  {path}")
+        else:
+            print(f"Профиля нет: {path}")
+    elif args.list:
+        if not os.path.isdir(PROFILE_DIR):
+            return
+        for name in sorted(os.listdir(PROFILE_DIR)):
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                profile = json.load(f)
+            print(f"{profile['floor_db']:7.1f} dBFS  {profile['device']}  ({profile['updated']})")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Упаковка коротких фраз в общее 30-секундное окно энкодера.
+
+Whisper дополняет любой вход до 30 s мел-спектрограммы: фраза на 3 s
+стоит энкодеру столько же, сколько 30 s. Когда в очереди конвейера
+(pipeline.py) скопилось несколько коротких фраз, их выгоднее склеить
+через PACK_GAP_SECONDS тишины в одно окно до PACK_MAX_SECONDS,
+распознать за один проход с word_timestamps и разрезать текст обратно
+по границам фраз (слово достаётся фразе, в чей интервал попала его середина).
+
+Ограничение: язык у фраз одного окна общий (определяется по окну);
+с --lang это не важно.
+
+  python packing.py --plan DIR            — сколько окон энкодера экономит упаковка (без модели)
+  python packing.py --bench DIR [--lang ru] [--queue 4]
+      последовательно vs упаковкой на корпусе коротких WAV (DIR/*.wav,
+      эталоны — DIR/*.txt рядом): аудио-секунд в секунду и WER
+"""
+
+import argparse
+import bisect
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+RATE = 16000
+WINDOW_SECONDS = 30.0
+PACK = os.environ.get("MLXW_PACK", "1") != "0"
+PACK_MAX_SECONDS = float(os.environ.get("MLXW_PACK_SECONDS", "28"))   # запас под сдвиг окна
+PACK_GAP_SECONDS = 1.0       # тишина между фразами: Whisper ставит там границу сегмента
+
+
+def plan_windows(durations, max_seconds=PACK_MAX_SECONDS, gap=PACK_GAP_SECONDS):
+    """Жадно по порядку делит фразы на окна. Возвращает списки индексов."""
+    windows, current, used = [], [], 0.0
+    for i, duration in enumerate(durations):
+        needed = duration + (gap if current else 0.0)
+        if current and used + needed > max_seconds:
+            windows.append(current)
+            current, used = [], 0.0
+            needed = duration
+        current.append(i)
+        used += needed
+    if current:
+        windows.append(current)
+    return windows
+
+
+def encoder_windows(duration):
+    """Сколько 30-секундных окон энкодера займёт вход."""
+    return max(1, int(np.ceil(duration / WINDOW_SECONDS)))
+
+
+def pack(audios, gap=PACK_GAP_SECONDS, rate=RATE):
+    """Склеивает float32-фразы через тишину. Возвращает (audio, [(start_s, end_s)])."""
+    silence = np.zeros(int(gap * rate), dtype=np.float32)
+    parts, spans, pos = [], [], 0
+    for i, audio in enumerate(audios):
+        if i:
+            parts.append(silence)
+            pos += len(silence)
+        parts.append(np.asarray(audio, dtype=np.float32))
+        spans.append((pos / rate, (pos + len(audio)) / rate))
+        pos += len(audio)
+    return np.concatenate(parts), spans
+
+
+def split_result(result, spans):
+    """Текст result по фразам: каждое слово — в фразу, куда попала его середина."""
+    # Граница между фразами — середина паузы между ними
+    bounds = [(spans[i][1] + spans[i + 1][0]) / 2 for i in range(len(spans) - 1)]
+    texts = [[] for _ in spans]
+    for segment in result.get("segments", []):
+        words = segment.get("words") or [
+            {"word": segment.get("text", ""), "start": segment["start"], "end": segment["end"]}]
+        for word in words:
+            middle = (word["start"] + word["end"]) / 2
+            texts[bisect.bisect_right(bounds, middle)].append(word["word"])
+    return ["".join(words).strip() for words in texts]
+
+
+def transcribe_packed(audios, language=None, model_name=None, transcribe_result=None):
+    """Распознаёт список фраз за один проход. Возвращает [(text, lang)]."""
+    import asr
+
+    transcribe_result = transcribe_result or asr.transcribe_result
+    kwargs = {"model_name": model_name} if model_name else {}
+    if len(audios) == 1:
+        result = transcribe_result(audios[0], language, **kwargs)
+        return [(result.get("text", "").strip(), result.get("language", "?"))]
+
+    audio, spans = pack(audios)
+    # Без условия на предыдущий текст: соседние фразы не связаны
+    result = transcribe_result(audio, language, word_timestamps=True,
+                               condition_on_previous_text=False, **kwargs)
+    lang = result.get("language", "?")
+    return [(text, lang) for text in split_result(result, spans)]
+
+
+# ──────────────────────────────────────────────
+# Замер на корпусе коротких фраз
+# ──────────────────────────────────────────────
+def load_corpus(directory):
+    """[(name, audio, reference|None)] из DIR/*.wav и одноимённых .txt."""
+    from recording import load_recording
+
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        ref_path = os.path.splitext(path)[0] + ".txt"
+        reference = None
+        if os.path.exists(ref_path):
+            with open(ref_path, encoding='utf-8') as f:
+                reference = f.read().strip()
+        corpus.append((os.path.basename(path), load_recording(path), reference))
+    return corpus
+
+
+def print_plan(corpus, queue):
+    """Окна энкодера: по одному на фразу vs упаковка батчами по queue фраз."""
+    durations = [len(audio) / RATE for _, audio, _ in corpus]
+    sequential = sum(encoder_windows(d) for d in durations)
+    packed = 0
+    for start in range(0, len(durations), queue):
+        packed += len(plan_windows(durations[start:start + queue]))
+    total = sum(durations)
+    print(f"🎧 {len(durations)} фраз, {total:.1f}s аудио, в среднем {total / max(1, len(durations)):.1f}s")
+    print(f"   окон энкодера: по одному на фразу {sequential}, с упаковкой (до {queue} в очереди) {packed}")
+    print(f"   заполнение окна: {total / (sequential * WINDOW_SECONDS):.0%} → {total / (packed * WINDOW_SECONDS):.0%}")
+
+
+def bench(corpus, language, queue):
+    import asr
+
+    audio_seconds = sum(len(audio) for _, audio, _ in corpus) / RATE
+    asr.transcribe(corpus[0][1][:RATE], language=language)     # прогрев: загрузка модели
+
+    t0 = time.perf_counter()
+    sequential = [asr.transcribe(audio, language=language)[0] for _, audio, _ in corpus]
+    sequential_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    packed = []
+    for start in range(0, len(corpus), queue):
+        batch = [audio for _, audio, _ in corpus[start:start + queue]]
+        durations = [len(a) / RATE for a in batch]
+        for window in plan_windows(durations):
+            packed.extend(text for text, _ in transcribe_packed([batch[i] for i in window], language))
+    packed_s = time.perf_counter() - t0
+
+    print_plan(corpus, queue)
+    for title, texts, seconds in (("по одной", sequential, sequential_s), ("упаковка", packed, packed_s)):
+        refs = [(ref, text) for (_, _, ref), text in zip(corpus, texts) if ref is not None]
+        wer = f", WER {np.mean([asr.word_error_rate(r, t) for r, t in refs]):.1%}" if refs else ""
+        print(f"   {title:<9} {seconds:6.1f}s, {audio_seconds / seconds:5.1f} аудио-с/с{wer}")
+    if not any(ref for _, _, ref in corpus):
+        diff = np.mean([asr.word_error_rate(s, p) for s, p in zip(sequential, packed)])
+        print(f"   расхождение упаковки с распознаванием по одной: {diff:.1%} слов")
+    print(f"⚡ Ускорение: ×{sequential_s / packed_s:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Упаковка коротких фраз в окно энкодера")
+    parser.add_argument("--plan", metavar="DIR", help="Подсчитать окна энкодера без модели")
+    parser.add_argument("--bench", metavar="DIR", help="Замер на корпусе WAV (+ .txt эталоны)")
+    parser.add_argument("--lang", default=None)
+    parser.add_argument("--queue", type=int, default=4, help="Сколько фраз доступно для упаковки сразу")
+    args = parser.parse_args()
+
+    directory = args.plan or args.bench
+    if not directory:
+        parser.print_help()
+        return
+    corpus = load_corpus(directory)
+    if not corpus:
+        print(f"❌ Нет WAV в {directory}", file=sys.stderr)
+        sys.exit(1)
+    if args.plan:
+        print_plan(corpus, args.queue)
+    else:
+        bench(corpus, args.lang, args.queue)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Конвейер непрерывного режима: запись следующей фразы идёт, пока
+распознаётся предыдущая.
+
+Раньше rt.py по очереди вызывал record_until_silence() и transcribe():
+пока модель декодировала, микрофон был закрыт, и сказанное в это время
+пропадало, а пропускная способность упиралась во время инференса.
+
+UtterancePipeline — один поток записи (производитель) и один поток
+инференса (потребитель), между ними ограниченная очередь фраз на
+QUEUE_SIZE. Если инференс не успевает, срабатывает политика (MLXW_PIPELINE_POLICY):
+  merge        — новая фраза склеивается с последней в очереди (по умолчанию):
+                 ничего не теряется, а модель получает один длинный кусок
+  drop-oldest  — самая старая фраза выбрасывается
+  block        — запись ждёт места (кадры копит кольцевой буфер захвата)
+
+Если передан transcribe_batch, поток инференса забирает из очереди
+сразу несколько коротких фраз (до PACK_MAX_SECONDS) и распознаёт их
+одним окном энкодера (packing.py), а результат выдаёт по фразам.
+
+Метрики: глубина очереди (текущая/максимальная), ожидание в очереди,
+задержка «конец фразы → текст», число выброшенных и склеенных фраз.
+
+  python pipeline.py --simulate               — синтетика без микрофона и модели
+  python pipeline.py --simulate --policy block --infer-seconds 3
+  python pipeline.py --simulate --pack        — с упаковкой фраз в окно
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from packing import PACK_GAP_SECONDS, PACK_MAX_SECONDS, encoder_windows, pack as pack_audio
+
+RATE = 16000
+QUEUE_SIZE = int(os.environ.get("MLXW_PIPELINE_QUEUE", "4"))
+POLICY = os.environ.get("MLXW_PIPELINE_POLICY", "merge")
+POLICIES = ("merge", "drop-oldest", "block")
+MERGE_GAP_SECONDS = 0.3          # тишина между склеенными фразами
+
+
+class Utterance:
+    """Фраза в очереди: float32 mono 16 kHz и время конца речи (monotonic)."""
+
+    def __init__(self, audio, ended_at=None, seq=0):
+        self.audio = audio
+        self.ended_at = ended_at if ended_at is not None else time.monotonic()
+        self.queued_at = time.monotonic()
+        self.seq = seq
+        self.parts = 1
+
+    @property
+    def duration(self):
+        return len(self.audio) / RATE
+
+    def merge(self, other):
+        gap = np.zeros(int(MERGE_GAP_SECONDS * RATE), dtype=np.float32)
+        self.audio = np.concatenate([self.audio, gap, other.audio])
+        self.ended_at = other.ended_at
+        self.parts += other.parts
+
+
+class UtteranceQueue:
+    """Ограниченная очередь фраз с политикой переполнения."""
+
+    def __init__(self, maxsize=QUEUE_SIZE, policy=POLICY):
+        if policy not in POLICIES:
+            raise ValueError(f"неизвестная политика: {policy} (есть: {', '.join(POLICIES)})")
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.max_depth = 0
+        self.dropped = 0
+        self.merged = 0
+
+    @property
+    def depth(self):
+        return len(self._items)
+
+    def put(self, utterance):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                if self.policy == "merge":
+                    self._items[-1].merge(utterance)
+                    self.merged += 1
+                    return
+                if self.policy == "drop-oldest":
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    self._cond.wait_for(lambda: len(self._items) < self.maxsize or self._closed)
+                    if self._closed:
+                        return
+            self._items.append(utterance)
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._cond.notify_all()
+
+    def get(self):
+        """Следующая фраза; None — очередь закрыта и пуста."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._closed)
+            if not self._items:
+                return None
+            utterance = self._items.popleft()
+            self._cond.notify_all()
+            return utterance
+
+    def get_batch(self, max_seconds=PACK_MAX_SECONDS, gap=PACK_GAP_SECONDS):
+        """Первая фраза и следующие за ней, пока вместе (с паузами) влезают в max_seconds."""
+        first = self.get()
+        if first is None:
+            return []
+        batch, used = [first], first.duration
+        with self._cond:
+            while self._items and used + gap + self._items[0].duration <= max_seconds:
+                utterance = self._items.popleft()
+                batch.append(utterance)
+                used += gap + utterance.duration
+            self._cond.notify_all()
+        return batch
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class UtterancePipeline:
+    """Поток записи кладёт фразы в очередь, поток инференса их распознаёт.
+
+    utterances — итератор float32-массивов (каждый — законченная фраза);
+    transcribe(audio) → (text, lang);
+    transcribe_batch([audio, ...]) → [(text, lang), ...] — если задан,
+    фразы из очереди распознаются пачками (упаковка в одно окно);
+    on_result(text, lang, utterance) → True, чтобы остановить конвейер
+    (например, на стоп-слове); вызывается из потока инференса.
+    interrupt — функция, прерывающая ожидание аудио в итераторе.
+    """
+
+    def __init__(self, utterances, transcribe, on_result, maxsize=QUEUE_SIZE,
+                 policy=POLICY, interrupt=None, transcribe_batch=None):
+        self.utterances = utterances
+        self.transcribe = transcribe
+        self.transcribe_batch = transcribe_batch
+        self.on_result = on_result
+        self.interrupt = interrupt
+        self.queue = UtteranceQueue(maxsize, policy)
+        self.stopping = threading.Event()
+        self.error = None
+        self._capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._inference_thread = threading.Thread(target=self._inference_loop, daemon=True)
+        self._waits = []
+        self._lags = []
+        self._infer_seconds = 0.0
+        self._audio_seconds = 0.0
+        self._captured = 0
+        self._packed = 0
+        self._packed_windows = 0
+        self._started_at = None
+
+    def run(self):
+        """Запускает оба потока и ждёт остановки (стоп-слово, конец источника, Ctrl+C).
+        Возвращается, когда оба потока завершились: источник после этого можно закрывать."""
+        self._started_at = time.monotonic()
+        self._capture_thread.start()
+        self._inference_thread.start()
+        try:
+            while self._inference_thread.is_alive():
+                self._inference_thread.join(0.2)
+        except KeyboardInterrupt:
+            self.stop()
+            self._inference_thread.join()
+        finally:
+            # Инференс закончился — поток записи ещё может ждать в read()
+            self.stop()
+        if self.error is not None:
+            raise self.error
+
+    def stop(self):
+        """Останавливает оба потока и дожидается потока записи (кроме вызова из него самого)."""
+        self.stopping.set()
+        if self.interrupt is not None:
+            self.interrupt()
+        self.queue.close()
+        capture = self._capture_thread
+        if capture.is_alive() and capture is not threading.current_thread():
+            capture.join()
+
+    def _capture_loop(self):
+        try:
+            for audio in self.utterances:
+                if self.stopping.is_set():
+                    break
+                self._captured += 1
+                self.queue.put(Utterance(audio, seq=self._captured))
+        except Exception as e:
+            self.error = e
+        finally:
+            self.queue.close()
+
+    def _next_batch(self):
+        if self.transcribe_batch is None:
+            utterance = self.queue.get()
+            return [utterance] if utterance is not None else []
+        return self.queue.get_batch()
+
+    def _inference_loop(self):
+        while True:
+            batch = self._next_batch()
+            if not batch or self.stopping.is_set():
+                break
+            t0 = time.monotonic()
+            self._waits.extend(t0 - u.queued_at for u in batch)
+            try:
+                if len(batch) > 1:
+                    results = self.transcribe_batch([u.audio for u in batch])
+                else:
+                    results = [self.transcribe(batch[0].audio)]
+            except Exception as e:
+                print(f"❌ Ошибка распознавания: {e}", file=sys.stderr, flush=True)
+                continue
+            done = time.monotonic()
+            self._infer_seconds += done - t0
+            if len(batch) > 1:
+                self._packed += len(batch)
+                self._packed_windows += 1
+            for utterance, (text, lang) in zip(batch, results):
+                self._audio_seconds += utterance.duration
+                self._lags.append(done - utterance.ended_at)
+                if self.on_result(text, lang, utterance):
+                    self.stop()
+                    return
+
+    @property
+    def stats(self):
+        ms = lambda values, fn: round(fn(values) * 1000) if values else 0
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            "captured": self._captured,
+            "transcribed": len(self._lags),
+            "queue_depth": self.queue.depth,
+            "max_queue_depth": self.queue.max_depth,
+            "dropped": self.queue.dropped,
+            "merged": self.queue.merged,
+            "packed": self._packed,
+            "packed_windows": self._packed_windows,
+            "queue_wait_ms_mean": ms(self._waits, np.mean),
+            "queue_wait_ms_max": ms(self._waits, max),
+            "lag_ms_mean": ms(self._lags, np.mean),
+            "lag_ms_max": ms(self._lags, max),
+            "inference_busy": round(self._infer_seconds / elapsed, 2) if elapsed else 0.0,
+            "rtf": round(self._infer_seconds / self._audio_seconds, 3) if self._audio_seconds else 0.0,
+        }
+
+    def status_line(self):
+        s = self.stats
+        return (f"📥 очередь {s['queue_depth']}/{self.queue.maxsize}, "
+                f"задержка {s['lag_ms_mean']} ms (макс {s['lag_ms_max']})")
+
+    def report(self):
+        s = self.stats
+        print(f"📊 Конвейер ({self.queue.policy}): фраз {s['captured']} → распознано {s['transcribed']}, "
+              f"склеено {s['merged']}, выброшено {s['dropped']}, упаковано {s['packed']} в "
+              f"{s['packed_windows']} окон, "
+              f"макс. очередь {s['max_queue_depth']}/{self.queue.maxsize}", file=sys.stderr, flush=True)
+        print(f"   ожидание в очереди {s['queue_wait_ms_mean']} ms (макс {s['queue_wait_ms_max']}), "
+              f"конец фразы → текст {s['lag_ms_mean']} ms (макс {s['lag_ms_max']}), "
+              f"инференс занят {s['inference_busy']:.0%}, RTF {s['rtf']}", file=sys.stderr, flush=True)
+
+
+# ──────────────────────────────────────────────
+# Симуляция
+# ──────────────────────────────────────────────
+def simulate(policy, maxsize, count, speak_seconds, pause_seconds, infer_seconds, pack=False):
+    """Фразы по speak_seconds с паузами; «модель» тратит infer_seconds на каждое
+    30-секундное окно (как Whisper: короткий вход дополняется до окна).
+    Для сравнения печатает, сколько речи потерял бы последовательный цикл."""
+
+    def utterances():
+        for _ in range(count):
+            time.sleep(speak_seconds + pause_seconds)
+            yield np.zeros(int(speak_seconds * RATE), dtype=np.float32)
+
+    def transcribe(audio):
+        time.sleep(infer_seconds * encoder_windows(len(audio) / RATE))
+        return f"{len(audio) / RATE:.1f}s", "en"
+
+    def transcribe_batch(audios):
+        packed, _ = pack_audio(audios)
+        time.sleep(infer_seconds * encoder_windows(len(packed) / RATE))
+        return [(f"{len(audio) / RATE:.1f}s", "en") for audio in audios]
+
+    def on_result(text, lang, utterance):
+        print(f"   #{utterance.seq:<3} {text:>6} из {utterance.parts} фраз(ы)", file=sys.stderr, flush=True)
+        return False
+
+    print(f"🧪 {count} фраз по {speak_seconds}s, пауза {pause_seconds}s, инференс {infer_seconds}s/окно, "
+          f"очередь {maxsize}, политика {policy}{', упаковка' if pack else ''}", file=sys.stderr)
+    pipeline = UtterancePipeline(utterances(), transcribe, on_result, maxsize, policy,
+                                 transcribe_batch=transcribe_batch if pack else None)
+    pipeline.run()
+    pipeline.report()
+
+    # Последовательный цикл: пока идёт инференс, микрофон закрыт
+    lost = max(0.0, infer_seconds - pause_seconds) * count
+    print(f"   последовательный цикл пропустил бы ~{lost:.1f}s речи", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Конвейер запись → распознавание")
+    parser.add_argument("--simulate", action="store_true", help="Прогон на синтетике")
+    parser.add_argument("--policy", default=POLICY, choices=POLICIES)
+    parser.add_argument("--queue", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--count", type=int, default=12)
+    parser.add_argument("--speak-seconds", type=float, default=0.5)
+    parser.add_argument("--pause-seconds", type=float, default=0.1)
+    parser.add_argument("--infer-seconds", type=float, default=1.0, help="Инференс одного окна")
+    parser.add_argument("--pack", action="store_true", help="Упаковывать фразы из очереди в одно окно")
+    args = parser.parse_args()
+
+    if not args.simulate:
+        parser.print_help()
+        return
+    simulate(args.policy, args.queue, args.count, args.speak_seconds,
+             args.pause_seconds, args.infer_seconds, args.pack)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Буфер записи: один непрерывный массив int16, растущий геометрически.
+
+Раньше запись копилась списком мелких float32-массивов (или bytes)
+с np.concatenate в конце: тысячи объектов на длинной записи,
+float32 вдвое тяжелее int16, а склейка на мгновение удваивает пик памяти.
+
+RecordingBuffer хранит отсчёты в одном int16-массиве и при нехватке места
+увеличивает его в GROWTH раз (амортизированно O(1) на append).
+view() отдаёт срез без копирования — для VAD, ресэмплинга и замеров;
+to_float32() — единственная конвертация перед распознаванием.
+
+SpillRecordingBuffer — тот же API, но запись идёт в WAV-файл под
+~/.cache/mlxwhisper/recordings: в памяти только STAGING_SECONDS аудио,
+чтение — через np.memmap. Заголовок WAV обновляется при каждом сбросе,
+так что файл валиден в любой момент: после падения распознавания
+(или самого процесса) запись можно распознать заново.
+
+Сравнение пикового RSS со старым способом на часовой записи:
+  python recording.py --bench-rss 3600
+Незавершённые записи на диске:
+  python recording.py --list
+"""
+
+import argparse
+import glob
+import os
+import struct
+import subprocess
+import sys
+import time
+import wave
+
+import numpy as np
+
+RATE = 16000
+INITIAL_SECONDS = 30
+GROWTH = 1.5
+
+CACHE_DIR = os.path.expanduser(os.environ.get("MLXW_CACHE_DIR", "~/.cache/mlxwhisper"))
+RECORDINGS_DIR = os.path.join(CACHE_DIR, "recordings")
+STAGING_SECONDS = 1.0
+
+
+class RecordingBuffer:
+    """Непрерывный int16-буфер записи (interleaved при channels > 1)."""
+
+    def __init__(self, rate=RATE, channels=1, initial_seconds=INITIAL_SECONDS):
+        self.rate = rate
+        self.channels = channels
+        self._data = np.empty(int(initial_seconds * rate) * channels, dtype=np.int16)
+        self._size = 0
+
+    def __len__(self):
+        """Количество кадров."""
+        return self._size // self.channels
+
+    @property
+    def duration(self):
+        return len(self) / self.rate
+
+    @property
+    def capacity(self):
+        return len(self._data) // self.channels
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= len(self._data):
+            return
+        new_len = max(needed, int(len(self._data) * GROWTH))
+        data = np.empty(new_len, dtype=np.int16)
+        data[:self._size] = self._data[:self._size]
+        self._data = data
+
+    def append(self, samples):
+        """Добавляет int16 (как есть) или float32 в [-1, 1] (квантуется в int16)."""
+        samples = np.asarray(samples)
+        n = len(samples)
+        self._reserve(n)
+        target = self._data[self._size:self._size + n]
+        if samples.dtype == np.int16:
+            target[:] = samples
+        else:
+            np.multiply(np.clip(samples, -1.0, 32767 / 32768), 32768, out=target, casting='unsafe')
+        self._size += n
+
+    def view(self, start=0, end=None):
+        """Кадры [start, end) без копирования. Действителен до следующего append."""
+        end = len(self) if end is None else min(end, len(self))
+        return self._data[start * self.channels:end * self.channels]
+
+    def to_float32(self, start=0, end=None):
+        """float32 в [-1, 1] для Whisper — одна конвертация без промежуточных копий."""
+        view = self.view(start, end)
+        out = np.empty(len(view), dtype=np.float32)
+        np.multiply(view, 1 / 32768, out=out)
+        return out
+
+    def clear(self):
+        self._size = 0
+
+
+class SpillRecordingBuffer:
+    """API RecordingBuffer поверх WAV-файла; в RAM — только буфер сброса."""
+
+    def __init__(self, rate=RATE, channels=1, directory=RECORDINGS_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.rate = rate
+        self.channels = channels
+        self.path = os.path.join(directory, time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}.wav")
+        self._file = open(self.path, 'wb')
+        self._wav = wave.open(self._file, 'wb')
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(rate)
+        self._data_offset = None
+        self._frames_on_disk = 0
+        self._staging = RecordingBuffer(rate, channels, initial_seconds=STAGING_SECONDS * 2)
+
+    def __len__(self):
+        return self._frames_on_disk + len(self._staging)
+
+    @property
+    def duration(self):
+        return len(self) / self.rate
+
+    def append(self, samples):
+        self._staging.append(samples)
+        if self._staging.duration >= STAGING_SECONDS:
+            self.flush()
+
+    def flush(self):
+        """Сбрасывает буфер на диск; заголовок WAV обновляется сразу."""
+        if self._wav is None or not len(self._staging):
+            return
+        data = self._staging.view().tobytes()
+        self._wav.writeframes(data)
+        if self._data_offset is None:
+            self._data_offset = self._file.tell() - len(data)
+        self._frames_on_disk += len(self._staging)
+        self._staging.clear()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def view(self, start=0, end=None):
+        """Кадры [start, end) через np.memmap — страницы читает ОС по требованию."""
+        self.flush()
+        if not self._frames_on_disk:
+            return np.zeros(0, dtype=np.int16)
+        end = len(self) if end is None else min(end, len(self))
+        mapped = np.memmap(self.path, dtype=np.int16, mode='r', offset=self._data_offset,
+                           shape=(self._frames_on_disk * self.channels,))
+        return mapped[start * self.channels:end * self.channels]
+
+    def to_float32(self, start=0, end=None):
+        view = self.view(start, end)
+        out = np.empty(len(view), dtype=np.float32)
+        np.multiply(view, 1 / 32768, out=out)
+        return out
+
+    def close(self):
+        """Дописывает остаток и закрывает файл; сам файл остаётся."""
+        self.flush()
+        if self._wav is not None:
+            self._wav.close()
+            self._file.close()
+            self._wav = None
+
+    def discard(self):
+        """Удаляет файл — запись распознана и больше не нужна."""
+        self.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def wav_layout(path):
+    """(смещение данных, число int16-отсчётов, каналы, частота) 16-bit PCM WAV.
+
+    Чанки RIFF обходятся по порядку: ffmpeg и редакторы пишут LIST, fact и др.
+    перед data, так что данные не обязательно начинаются с 44-го байта.
+    Размер data берётся из заголовка; если он нулевой или выходит за файл
+    (запись оборвалась до обновления заголовка) — по размеру файла."""
+    file_size = os.path.getsize(path)
+    channels = rate = None
+    with open(path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError(f"{path}: не WAV")
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{path}: нет чанка data")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = f.read(size)
+                _, channels, rate = struct.unpack('<HHI', fmt[:8])
+                bits = struct.unpack('<H', fmt[14:16])[0]
+                if bits != 16:
+                    raise ValueError(f"{path}: ожидается 16-bit PCM")
+                f.seek(size % 2, 1)
+            elif chunk_id == b'data':
+                offset = f.tell()
+                if channels is None:
+                    raise ValueError(f"{path}: data раньше fmt")
+                if size == 0 or offset + size > file_size:
+                    size = file_size - offset
+                return offset, size // 2, channels, rate
+            else:
+                f.seek(size + size % 2, 1)    # чанки выровнены по 2 байтам
+
+
+def load_recording(path):
+    """Читает записанный (в т.ч. после падения) WAV как float32 mono 16 kHz."""
+    offset, n_samples, channels, rate = wav_layout(path)
+    mapped = np.memmap(path, dtype=np.int16, mode='r', offset=offset, shape=(n_samples,))
+    audio = mapped.astype(np.float32) / 32768.0
+    if channels > 1:
+        audio = audio[:len(audio) - len(audio) % channels].reshape(-1, channels).mean(axis=1)
+    if rate != RATE:
+        from resample import resample
+        audio = resample(audio, rate, RATE)
+    return audio
+
+
+def pending_recordings(directory=RECORDINGS_DIR):
+    """Записи, которые не были удалены после успешного распознавания (новые первыми)."""
+    return sorted(glob.glob(os.path.join(directory, "*.wav")), reverse=True)
+
+
+# ──────────────────────────────────────────────
+# Замер пикового RSS
+# ──────────────────────────────────────────────
+CHUNK = 1024
+
+
+def _peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux — килобайты, macOS — байты
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def _simulate(variant, seconds):
+    block = (np.random.default_rng(0).standard_normal(CHUNK) * 3000).astype(np.int16)
+    n_chunks = int(seconds * RATE / CHUNK)
+
+    if variant == "list":
+        # Старый путь rt_toggle.py: список float32 + concatenate
+        frames = []
+        for _ in range(n_chunks):
+            frames.append(block.astype(np.float32) / 32768.0)
+        audio = np.concatenate(frames)
+    else:
+        recording = RecordingBuffer()
+        for _ in range(n_chunks):
+            recording.append(block)
+        audio = recording.to_float32()
+    return len(audio)
+
+
+def bench_rss(seconds):
+    baseline = subprocess.run([sys.executable, __file__, "--rss-variant", "none", "0"],
+                              capture_output=True, text=True, check=True)
+    base_mb = float(baseline.stdout)
+    print(f"🧪 {seconds / 3600:.2f} ч записи 16 kHz mono, чанки по {CHUNK}")
+    results = {}
+    for variant, title in (("list", "список float32 + concatenate"), ("buffer", "RecordingBuffer int16")):
+        out = subprocess.run([sys.executable, __file__, "--rss-variant", variant, str(seconds)],
+                             capture_output=True, text=True, check=True)
+        results[variant] = float(out.stdout) - base_mb
+        print(f"   {title:<30} пик RSS +{results[variant]:7.1f} MB")
+    print(f"📉 Снижение пика: {results['list'] - results['buffer']:.1f} MB "
+          f"({1 - results['buffer'] / results['list']:.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Непрерывный буфер записи")
+    parser.add_argument("--bench-rss", type=float, metavar="SECONDS",
+                        help="Сравнить пиковый RSS со списком чанков")
+    parser.add_argument("--rss-variant", nargs=2, metavar=("VARIANT", "SECONDS"),
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--list", action="store_true", help="Нераспознанные записи на диске")
+    args = parser.parse_args()
+
+    if args.list:
+        for path in pending_recordings():
+            _, n_samples, channels, rate = wav_layout(path)
+            print(f"{path}  ({n_samples / channels / rate / 60:.1f} мин)")
+    elif args.rss_variant:
+        variant, seconds = args.rss_variant
+        if variant != "none":
+            _simulate(variant, float(seconds))
+        print(_peak_rss_mb())
+    elif args.bench_rss:
+        bench_rss(args.bench_rss)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
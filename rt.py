@@ -5,18 +5,34 @@ Modes:
   --single          одна фраза → в буфер → выход
   --single --lang ru принудительно русский язык
   (без флагов)      непрерывный режим, стоп по слову "exit" / "выход"
+  --sequential      непрерывный режим без конвейера (запись и распознавание по очереди)
+
+Непрерывный режим — конвейер (pipeline.py): микрофон не закрывается,
+следующая фраза пишется, пока распознаётся предыдущая. Поток захвата
+один на всю сессию (session.py), и в --sequential тоже.
+Очередь/политика: MLXW_PIPELINE_QUEUE, MLXW_PIPELINE_POLICY (merge | drop-oldest | block).
+Скопившиеся короткие фразы распознаются одним окном энкодера (packing.py);
+--no-pack или MLXW_PACK=0 — по одной.
+
+Без --lang язык определяется на первой уверенной фразе и закрепляется
+(language.py); --langs ru,en или MLXW_LANGUAGES — только среди этих языков.
 """
 
 import argparse
 import sys
 import os
-import tempfile
-import wave
+import threading
+import time
+
+import startup
 
-import mlx_whisper
-import pyaudio
-import numpy as np
-import pyperclip
+import asr
+from audio_sources import SOURCE, open_source
+from language import LANGUAGES, LanguageTracker, parse_languages
+from packing import PACK, transcribe_packed
+from pipeline import UtterancePipeline
+from session import ListeningSession
+from vad import BACKEND as VAD_BACKEND
 
 # ──────────────────────────────────────────────
 # Конфигурация модели
@@ -40,107 +56,76 @@ MODEL_NAME = os.environ.get(
 )
 
 # ──────────────────────────────────────────────
-# Параметры PyAudio
+# Параметры аудио (audio_sources.py: --source / MLXW_SOURCE)
 # ──────────────────────────────────────────────
-FORMAT = pyaudio.paInt16     # 16-bit
 CHANNELS = 1                 # моно
 RATE = 16000                 # 16 kHz (Whisper ожидает именно это)
 CHUNK = 1024                 # размер буфера
 
 # ──────────────────────────────────────────────
-# Параметры детекции тишины
+# Параметры детекции тишины (vad.py: MLXW_VAD, MLXW_VAD_ON_DB, ...)
 # ──────────────────────────────────────────────
-SILENCE_THRESHOLD = int(os.environ.get("SILENCE_THRESHOLD", "500"))
 SILENCE_DURATION = float(os.environ.get("SILENCE_DURATION", "1.5"))   # секунд тишины = конец фразы
-SILENCE_CHUNKS = int(SILENCE_DURATION * RATE / CHUNK)
 
 # Минимальная длительность записи (секунды) — защита от ложных срабатываний
 MIN_AUDIO_SECONDS = 0.5
 
+STOP_WORDS = ("exit", "выход", "стоп", "stop")
 
-def record_until_silence():
-    """Записывает аудио с микрофона до паузы в речи. Возвращает np.array float32."""
-    audio = pyaudio.PyAudio()
-    stream = audio.open(
-        format=FORMAT, channels=CHANNELS, rate=RATE,
-        input=True, frames_per_buffer=CHUNK
-    )
-
-    print("🎙  Ожидание речи...", file=sys.stderr)
-
-    frames = []
-    silent_chunks = 0
-    speech_started = False
-
-    try:
-        while True:
-            data = stream.read(CHUNK, exception_on_overflow=False)
-            audio_data = np.frombuffer(data, dtype=np.int16)
-            amplitude = np.max(np.abs(audio_data))
-
-            if amplitude >= SILENCE_THRESHOLD:
-                if not speech_started:
-                    speech_started = True
-                    print("🔴  Запись...", file=sys.stderr)
-                silent_chunks = 0
-                frames.append(audio_data.astype(np.float32) / 32768.0)
-            else:
-                if speech_started:
-                    frames.append(audio_data.astype(np.float32) / 32768.0)
-                    silent_chunks += 1
-                    if silent_chunks >= SILENCE_CHUNKS:
-                        break
-    finally:
-        stream.stop_stream()
-        stream.close()
-        audio.terminate()
 
-    if not frames:
-        return None
-
-    audio_array = np.concatenate(frames)
-    duration = len(audio_array) / RATE
-
-    if duration < MIN_AUDIO_SECONDS:
-        print(f"⚠️  Слишком короткая запись ({duration:.1f}s), пропуск.", file=sys.stderr)
-        return None
-
-    print(f"⏹  Записано {duration:.1f}s аудио.", file=sys.stderr)
-    return audio_array
-
-
-def save_wav(audio_array, path):
-    """Сохраняет float32 массив в WAV (нужен для mlx_whisper.transcribe)."""
-    int_data = (audio_array * 32767).astype(np.int16)
-    with wave.open(path, 'wb') as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(2)
-        wf.setframerate(RATE)
-        wf.writeframes(int_data.tobytes())
-
-
-def transcribe(audio_array, language=None):
-    """Распознаёт аудио через mlx-whisper. Возвращает текст."""
-    # mlx_whisper.transcribe принимает путь к файлу или numpy array
-    # Для надёжности сохраняем во временный WAV
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-        tmp_path = tmp.name
-        save_wav(audio_array, tmp_path)
+def run_pipeline(args, tracker):
+    """Непрерывный режим: запись и распознавание в разных потоках."""
+    session = ListeningSession(open_source(args.source), hangover=SILENCE_DURATION,
+                               min_seconds=MIN_AUDIO_SECONDS).open()
+    stopping = threading.Event()
 
+    def on_result(text, lang, utterance):
+        if not text:
+            return False
+        print(text, flush=True)
+        if not args.no_clipboard:
+            import pyperclip
+            pyperclip.copy(text)
+            merged = f", склеено фраз: {utterance.parts}" if utterance.parts > 1 else ""
+            print(f"📋  [{lang}] → буфер{merged}", file=sys.stderr)
+        if not args.lang:
+            print(tracker.last, file=sys.stderr)
+        print(pipeline.status_line(), file=sys.stderr)
+
+        lower = text.lower().strip().rstrip(".")
+        if lower in STOP_WORDS:
+            print("👋  Завершение.", file=sys.stderr)
+            return True
+        print("─" * 40, file=sys.stderr)
+        return False
+
+    def interrupt():
+        stopping.set()
+        session.interrupt()
+
+    def transcribe_batch(audios):
+        # Упакованное окно — с языком сессии, если он уже закреплён
+        return transcribe_packed(audios, language=tracker.language, model_name=MODEL_NAME)
+
+    pipeline = UtterancePipeline(
+        session.utterances(stopping),
+        tracker.transcribe,
+        on_result, interrupt=interrupt,
+        transcribe_batch=transcribe_batch if args.pack else None,
+    )
+    print("🎙  Ожидание речи...", file=sys.stderr)
     try:
-        kwargs = {"path_or_hf_repo": MODEL_NAME}
-        if language:
-            kwargs["language"] = language
-
-        result = mlx_whisper.transcribe(tmp_path, **kwargs)
-        text = result.get("text", "").strip()
-        detected_lang = result.get("language", "?")
-        return text, detected_lang
+        with session:
+            pipeline.run()
     finally:
-        os.unlink(tmp_path)
+        stopping.set()
+        pipeline.report()
+        session.report()
+        tracker.report()
 
 
 def main():
+    startup.mark("импорты")
     parser = argparse.ArgumentParser(
         description="Real-time STT через mlx-whisper на Apple Silicon"
     )
@@ -152,6 +137,10 @@ def main():
         "--lang", type=str, default=None,
         help="Принудительный язык (ru, en, ka, ...); без флага — автодетект"
     )
+    parser.add_argument(
+        "--langs", type=parse_languages, default=LANGUAGES,
+        help="Автодетект только среди этих языков: ru,en (MLXW_LANGUAGES)"
+    )
     parser.add_argument(
         "--output-file", type=str, default=None,
         help="Сохранить транскрипцию в файл (только --single)"
@@ -160,24 +149,51 @@ def main():
         "--no-clipboard", action="store_true",
         help="Не копировать в буфер обмена"
     )
+    parser.add_argument(
+        "--sequential", action="store_true",
+        help="Непрерывный режим без конвейера: распознавание по очереди, звук ждёт в буфере захвата"
+    )
+    parser.add_argument(
+        "--no-pack", dest="pack", action="store_false", default=PACK,
+        help="Не упаковывать скопившиеся фразы в одно окно энкодера"
+    )
+    parser.add_argument(
+        "--source", default=SOURCE or "mic",
+        help="Источник: mic[:ИМЯ], file:PATH, stdin, tone, noise, bursts (audio_sources.py)"
+    )
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Время импортов, открытия устройства и загрузки модели (startup.py)")
     args = parser.parse_args()
 
     print(f"📦  Модель: {MODEL_NAME}", file=sys.stderr)
-    print(f"🔇  Порог тишины: {SILENCE_THRESHOLD}, пауза: {SILENCE_DURATION}s", file=sys.stderr)
+    print(f"🔇  VAD: {VAD_BACKEND}, пауза: {SILENCE_DURATION}s", file=sys.stderr)
     if args.lang:
         print(f"🌐  Язык: {args.lang}", file=sys.stderr)
     else:
-        print(f"🌐  Язык: автодетект", file=sys.stderr)
+        among = f" среди {','.join(args.langs)}" if args.langs else ""
+        print(f"🌐  Язык: автодетект{among}", file=sys.stderr)
     print("─" * 40, file=sys.stderr)
 
+    tracker = LanguageTracker(asr.get_engine(model_name=MODEL_NAME), forced=args.lang,
+                              allowed=args.langs)
+
     if args.single:
         # ── Режим одной фразы ──
-        audio = record_until_silence()
+        # Сначала микрофон, модель грузится в фоне, пока ждём и пишем фразу
+        session = ListeningSession(open_source(args.source), hangover=SILENCE_DURATION,
+                                   min_seconds=MIN_AUDIO_SECONDS).open()
+        recording_started = time.monotonic()
+        loader = asr.BackgroundLoad(MODEL_NAME)
+        print("🎙  Ожидание речи...", file=sys.stderr)
+        with session:
+            audio = session.next_utterance()
+        recording_stopped = time.monotonic()
         if audio is None:
             print("Нет аудио.", file=sys.stderr)
             sys.exit(1)
 
-        text, lang = transcribe(audio, language=args.lang)
+        loader.report(recording_started, recording_stopped)
+        text, lang = tracker.transcribe(audio)
         if not text:
             print("Пустая транскрипция.", file=sys.stderr)
             sys.exit(1)
@@ -187,6 +203,7 @@ def main():
 
         # В буфер обмена
         if not args.no_clipboard:
+            import pyperclip
             pyperclip.copy(text)
             print(f"📋  Скопировано в буфер (язык: {lang})", file=sys.stderr)
 
@@ -196,31 +213,46 @@ def main():
                 f.write(text + "\n")
             print(f"💾  Сохранено в {args.output_file}", file=sys.stderr)
 
-    else:
-        # ── Непрерывный режим ──
+    elif not args.sequential:
+        # ── Непрерывный режим (конвейер) ──
         print("♾️  Непрерывный режим. Скажите 'exit' или 'выход' для остановки.", file=sys.stderr)
-        while True:
-            audio = record_until_silence()
-            if audio is None:
-                continue
-
-            text, lang = transcribe(audio, language=args.lang)
-            if not text:
-                continue
-
-            print(text)
+        run_pipeline(args, tracker)
 
-            if not args.no_clipboard:
-                pyperclip.copy(text)
-                print(f"📋  [{lang}] → буфер", file=sys.stderr)
-
-            # Стоп-слова
-            lower = text.lower().strip().rstrip(".")
-            if lower in ("exit", "выход", "стоп", "stop"):
-                print("👋  Завершение.", file=sys.stderr)
-                break
-
-            print("─" * 40, file=sys.stderr)
+    else:
+        # ── Непрерывный режим без конвейера ──
+        print("♾️  Непрерывный режим. Скажите 'exit' или 'выход' для остановки.", file=sys.stderr)
+        # Поток один на всю сессию: пока идёт распознавание, звук копит буфер захвата
+        session = ListeningSession(open_source(args.source), hangover=SILENCE_DURATION,
+                                   min_seconds=MIN_AUDIO_SECONDS)
+        with session:
+            while True:
+                print("🎙  Ожидание речи...", file=sys.stderr)
+                audio = session.next_utterance()
+                if audio is None:
+                    continue
+
+                text, lang = tracker.transcribe(audio)
+                if not text:
+                    continue
+
+                print(text)
+
+                if not args.no_clipboard:
+                    import pyperclip
+                    pyperclip.copy(text)
+                    print(f"📋  [{lang}] → буфер", file=sys.stderr)
+                if not args.lang:
+                    print(tracker.last, file=sys.stderr)
+
+                # Стоп-слова
+                lower = text.lower().strip().rstrip(".")
+                if lower in STOP_WORDS:
+                    print("👋  Завершение.", file=sys.stderr)
+                    break
+
+                print("─" * 40, file=sys.stderr)
+        session.report()
+        tracker.report()
 
 
 if __name__ == "__main__":
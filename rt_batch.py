@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Пакетное распознавание записей: каталог звонков → тексты.
+
+  python rt_batch.py calls/ -o transcripts/
+  python rt_batch.py calls/ -o transcripts/ --lang ru --workers 4
+  python rt_batch.py a.wav b.flac -o out/ --backend stub
+
+Файлы (WAV, FLAC и др. через soundfile) читаются через FileSource без
+темпа реального времени и приводятся к 16 kHz mono блоками, как живой звук.
+Модель грузится один раз на воркер. На CPU-движках (faster-whisper,
+whisper-cpp) файлы раздаются пулу процессов, потоки CPU делятся между
+воркерами поровну; mlx — один процесс (GPU один, второй процесс только
+удвоит веса в памяти).
+
+Результаты пишутся по мере готовности: OUT/<путь без расширения>.txt (и .json с
+сегментами при --segments), строка в OUT/manifest.jsonl на каждый файл.
+Повторный запуск пропускает файлы, уже успешно записанные в манифест
+с тем же размером и mtime, — прерванный прогон продолжается с места
+остановки. --force распознаёт всё заново.
+
+Пропускная способность — в часах аудио за час работы (audio-h/h).
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import startup
+
+import asr
+from audio_sources import FileSource
+from recording import RecordingBuffer
+from transcript_cache import CACHE
+
+# ──────────────────────────────────────────────
+# Параметры
+# ──────────────────────────────────────────────
+RATE = 16000
+READ_CHUNK = 64 * 1024                     # кадров за read() при декодировании файла
+EXTENSIONS = (".wav", ".flac", ".ogg", ".mp3", ".m4a")
+MANIFEST = "manifest.jsonl"
+WORKERS = int(os.environ.get("MLXW_BATCH_WORKERS", "0"))   # 0 — по движку
+
+
+# ──────────────────────────────────────────────
+# Файлы и манифест
+# ──────────────────────────────────────────────
+def find_audio(paths):
+    """[(абсолютный путь, путь относительно корня)] в стабильном порядке."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(EXTENSIONS):
+                        full = os.path.join(root, name)
+                        found.append((os.path.abspath(full), os.path.relpath(full, path)))
+        elif os.path.isfile(path):
+            found.append((os.path.abspath(path), os.path.basename(path)))
+        else:
+            print(f"⚠️  Нет такого файла: {path}", file=sys.stderr)
+    return found
+
+
+def file_key(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def load_manifest(path):
+    """Последняя запись по каждому файлу. Оборванная последняя строка — пропускается."""
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            entries[entry["path"]] = entry
+    return entries
+
+
+def is_done(entry, key):
+    return (entry is not None and entry.get("status") == "ok"
+            and entry.get("size") == key["size"] and entry.get("mtime_ns") == key["mtime_ns"])
+
+
+def write_atomic(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".part"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+# ──────────────────────────────────────────────
+# Воркер
+# ──────────────────────────────────────────────
+_engine = None
+
+
+def init_worker(backend, model_name, threads):
+    """Один раз на процесс: модель в память и прогрев."""
+    global _engine
+    if threads:
+        asr.CPU_THREADS = threads
+    _engine = asr.get_engine(backend, model_name)
+    _engine.load()
+
+
+def decode_audio(path):
+    """Файл → float32 mono 16 kHz, блоками через FileSource."""
+    source = FileSource(path, realtime=False, chunk=READ_CHUNK).open()
+    recording = RecordingBuffer(RATE, 1)
+    try:
+        while not source.exhausted:
+            recording.append(source.read())
+        recording.append(source.drain())
+    finally:
+        source.close()
+    # Последний блок дополнен тишиной до chunk — отрезаем по длине файла
+    return recording.to_float32()[:round(source.duration * RATE)]
+
+
+def transcribe_file(path, language=None):
+    """Распознаёт один файл в воркере. Возвращает result движка и тайминги."""
+    started = time.perf_counter()
+    audio = decode_audio(path)
+    decoded = time.perf_counter()
+    hits = CACHE.hits
+    result = _engine.transcribe_result(audio, language=language, cache=True)
+    return {
+        "cached": CACHE.hits > hits,
+        "text": result.get("text", "").strip(),
+        "language": result.get("language", "?"),
+        "segments": result.get("segments", []),
+        "duration": len(audio) / RATE,
+        "decode_seconds": decoded - started,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+# ──────────────────────────────────────────────
+# Прогон
+# ──────────────────────────────────────────────
+def default_workers(engine_name):
+    if WORKERS:
+        return WORKERS
+    if engine_name in ("mlx", "stub"):
+        return 1
+    # CTranslate2 / whisper.cpp масштабируются по потокам хуже, чем по процессам
+    return max(1, (os.cpu_count() or 4) // 4)
+
+
+def run_batch(files, out_dir, backend, model_name, language=None, workers=None,
+              segments=False, force=False):
+    """Распознаёт файлы, пишет тексты и манифест по мере готовности. Возвращает сводку."""
+    engine_name = asr.engine_class(backend).name
+    workers = workers or default_workers(engine_name)
+    threads = max(1, (os.cpu_count() or 4) // workers) if workers > 1 else None
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    done = load_manifest(manifest_path)
+
+    todo = []
+    for path, rel in files:
+        key = file_key(path)
+        if not force and is_done(done.get(rel), key):
+            continue
+        todo.append((path, rel, key))
+
+    skipped = len(files) - len(todo)
+    print(f"📂  Файлов: {len(files)}, уже готово: {skipped}, к распознаванию: {len(todo)}",
+          file=sys.stderr)
+    print(f"🧠  {engine_name}: {model_name}, воркеров: {workers}"
+          + (f" × {threads} потоков" if threads else ""), file=sys.stderr)
+
+    stats = {"files": 0, "failed": 0, "audio_seconds": 0.0, "skipped": skipped, "cached": 0}
+    if not todo:
+        stats["wall_seconds"] = 0.0
+        return stats
+
+    started = time.perf_counter()
+    with open(manifest_path, "a", encoding="utf-8") as manifest:
+        def record(rel, key, outcome, error=None):
+            entry = dict(key, path=rel)
+            if error is None:
+                base = os.path.join(out_dir, os.path.splitext(rel)[0])
+                write_atomic(base + ".txt", outcome["text"] + "\n")
+                if segments:
+                    write_atomic(base + ".json", json.dumps(
+                        {"language": outcome["language"], "segments": outcome["segments"]},
+                        ensure_ascii=False, indent=1))
+                entry.update(status="ok", output=os.path.relpath(base + ".txt", out_dir),
+                             language=outcome["language"], duration=round(outcome["duration"], 3),
+                             seconds=round(outcome["seconds"], 3))
+                stats["files"] += 1
+                stats["cached"] += outcome["cached"]
+                stats["audio_seconds"] += outcome["duration"]
+                rtf = outcome["seconds"] / outcome["duration"] if outcome["duration"] else 0.0
+                print(f"✅  [{stats['files'] + stats['failed']}/{len(todo)}] {rel} "
+                      f"{outcome['duration']:.1f}s → {outcome['seconds']:.1f}s "
+                      f"(RTF {rtf:.2f}, {outcome['language']}{', из кэша' if outcome['cached'] else ''})",
+                      file=sys.stderr)
+            else:
+                entry.update(status="error", error=error)
+                stats["failed"] += 1
+                print(f"❌  [{stats['files'] + stats['failed']}/{len(todo)}] {rel}: {error}",
+                      file=sys.stderr)
+            # Строка на файл сразу на диск — прерванный прогон продолжится с неё
+            manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            manifest.flush()
+            os.fsync(manifest.fileno())
+
+        if workers == 1:
+            init_worker(backend, model_name, None)
+            print(f"⏱  Модель загружена за {time.perf_counter() - started:.1f}s", file=sys.stderr)
+            for path, rel, key in todo:
+                try:
+                    outcome = transcribe_file(path, language)
+                except Exception as e:
+                    record(rel, key, None, f"{type(e).__name__}: {e}")
+                else:
+                    record(rel, key, outcome)
+        else:
+            # spawn: fork после импорта numpy/CTranslate2 с живыми потоками ненадёжен
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker,
+                                     initargs=(backend, model_name, threads)) as pool:
+                futures = {pool.submit(transcribe_file, path, language): (path, rel, key)
+                           for path, rel, key in todo}
+                for future in as_completed(futures):
+                    path, rel, key = futures[future]
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        record(rel, key, None, f"{type(e).__name__}: {e}")
+                    else:
+                        record(rel, key, outcome)
+
+    stats["wall_seconds"] = time.perf_counter() - started
+    return stats
+
+
+def report(stats):
+    wall = stats["wall_seconds"]
+    audio_hours = stats["audio_seconds"] / 3600
+    throughput = audio_hours / (wall / 3600) if wall else 0.0
+    print("─" * 40, file=sys.stderr)
+    print(f"📊  Готово: {stats['files']} (из кэша распознаваний: {stats['cached']}), "
+          f"ошибок: {stats['failed']}, пропущено: {stats['skipped']}", file=sys.stderr)
+    print(f"📊  Аудио: {audio_hours:.2f} ч за {wall / 60:.1f} мин — "
+          f"{throughput:.1f} audio-h/h", file=sys.stderr)
+
+
+def main():
+    startup.mark("импорты")
+    parser = argparse.ArgumentParser(description="Пакетное распознавание файлов")
+    parser.add_argument("paths", nargs="+", help="Файлы или каталоги (рекурсивно)")
+    parser.add_argument("-o", "--output", required=True, help="Каталог для текстов и манифеста")
+    parser.add_argument("--lang", default=None, help="Язык (ru, en, ...); без флага — автодетект")
+    parser.add_argument("--backend", default=asr.BACKEND,
+                        help=f"Движок: auto, {', '.join(asr.ENGINES)} (MLXW_ASR)")
+    parser.add_argument("--model", default=asr.MODEL_NAME, help="Модель (WHISPER_MODEL)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Процессов (MLXW_BATCH_WORKERS); по умолчанию 1 для mlx, ядра/4 для CPU")
+    parser.add_argument("--segments", action="store_true",
+                        help="Сохранять сегменты с таймкодами рядом с текстом (.json)")
+    parser.add_argument("--force", action="store_true", help="Игнорировать манифест")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Время импортов, открытия устройства и загрузки модели (startup.py)")
+    args = parser.parse_args()
+
+    files = find_audio(args.paths)
+    if not files:
+        print("❌ Аудиофайлы не найдены", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        stats = run_batch(files, args.output, args.backend, args.model, language=args.lang,
+                          workers=args.workers, segments=args.segments, force=args.force)
+    except KeyboardInterrupt:
+        print("\n⏸  Прервано — повторный запуск продолжит с манифеста", file=sys.stderr)
+        sys.exit(130)
+    report(stats)
+    if stats["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,18 +2,30 @@
 """
 BlackHole Audio Capture - ВСЕГДА записывает с BlackHole.
 Пользователь сам выбирает в macOS что направить в BlackHole.
+
+--stream (или MLXW_STREAM=1): распознавание идёт во время записи
+(streaming.py), после стопа декодируется только хвост.
+Без --stream длинные паузы сжимаются перед распознаванием (vad.compact_silence),
+--no-compact или MLXW_COMPACT=0 — выключить. Запись длиннее MLXW_LONG_SECONDS
+распознаётся кусками по паузам (chunking.py). Модель грузится в фоне
+во время записи (asr.BackgroundLoad).
 """
 
 import sys
 import os
-import tempfile
-import wave
 import time
 
-import mlx_whisper
-import pyaudio
+import startup
+
 import numpy as np
-import pyperclip
+
+import asr
+import chunking
+from audio_sources import SOURCE, MicSource, find_device, open_source
+from control import ControlChannel
+from recording import RecordingBuffer
+from streaming import StreamingTranscriber, mlx_word_transcriber
+from vad import COMPACT, compact_silence
 
 # Model configuration
 MODEL_NAME = os.environ.get(
@@ -22,118 +34,83 @@ MODEL_NAME = os.environ.get(
 )
 
 # Audio parameters for BlackHole
-FORMAT = pyaudio.paInt16
 CHANNELS = 2  # BlackHole 2ch
 RATE = 48000  # BlackHole default rate
 CHUNK = 1024
 
-# Files
-STOP_FILE = "/tmp/mlxw-stop"
-PID_FILE = "/tmp/mlxw-pid"
-
 # Minimum audio duration
 MIN_AUDIO_SECONDS = 0.3
 
 
 def find_blackhole():
     """Найти BlackHole устройство."""
-    p = pyaudio.PyAudio()
-    blackhole_index = None
-
-    for i in range(p.get_device_count()):
-        info = p.get_device_info_by_index(i)
-        if 'blackhole' in info['name'].lower() and info['maxInputChannels'] > 0:
-            blackhole_index = i
-            print(f"✅ BlackHole найден: {info['name']}", file=sys.stderr)
-            print(f"   Каналы: {info['maxInputChannels']}, Частота: {int(info['defaultSampleRate'])}Hz", file=sys.stderr)
-            p.terminate()
-            return blackhole_index, int(info['defaultSampleRate'])
-
-    p.terminate()
+    device_index, info = find_device("blackhole")
+    if device_index is not None:
+        print(f"✅ BlackHole найден: {info['name']}", file=sys.stderr)
+        print(f"   Каналы: {info['maxInputChannels']}, Частота: {int(info['defaultSampleRate'])}Hz", file=sys.stderr)
+        return device_index, int(info['defaultSampleRate'])
+
     print("❌ BlackHole не найден!", file=sys.stderr)
     print("   Установите: brew install --cask blackhole-2ch", file=sys.stderr)
     return None, None
 
 
-def record_until_stop(device_index, sample_rate):
-    """Записывать с BlackHole до стоп-сигнала."""
-    p = pyaudio.PyAudio()
+def open_capture(source):
+    """Открыть источник (48 kHz stereo → 16 kHz mono внутри него). None — не открылся."""
+    try:
+        return source.open()
+    except Exception as e:
+        print(f"❌ Ошибка записи: {e}", file=sys.stderr)
+        MicSource.terminate()
+        return None
+
 
+def record_until_stop(source, control, on_audio=None):
+    """Записывать с открытого источника (BlackHole) до стопа или отмены через control.
+    on_audio(chunk) получает каждый чанк float32 mono 16 kHz — для потокового режима."""
     try:
-        stream = p.open(
-            format=FORMAT,
-            channels=CHANNELS,
-            rate=sample_rate,
-            input=True,
-            input_device_index=device_index,
-            frames_per_buffer=CHUNK
-        )
-
-        print("🔴 REC BlackHole", file=sys.stderr)
-        print("   ⚠️  Убедитесь что звук направлен в BlackHole в настройках macOS!", file=sys.stderr)
+        control.add_waker(source.interrupt)
 
-        frames = []
+        print(f"🔴 REC {source.device_name}", file=sys.stderr)
+        print("   ⚠️  Убедитесь что звук направлен в BlackHole в настройках macOS!", file=sys.stderr)
 
-        # Write PID for external control
-        with open(PID_FILE, 'w') as f:
-            f.write(str(os.getpid()))
+        recording = RecordingBuffer(16000)
 
-        # Record until stop file appears
-        while not os.path.exists(STOP_FILE):
+        # Record until stop signal
+        while not control.stopped:
             try:
-                data = stream.read(CHUNK, exception_on_overflow=False)
-                frames.append(data)
-            except:
+                chunk = source.read()
+                recording.append(chunk)
+                if on_audio is not None:
+                    on_audio(chunk.astype(np.float32) / 32768.0)
+            except Exception:
                 time.sleep(0.01)
 
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-
-        # Convert audio
-        audio_data = b''.join(frames)
-        audio_array = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
+        source.stop()
+        source.warn_if_lossy()
 
-        # Convert stereo to mono
-        if CHANNELS == 2:
-            audio_array = audio_array.reshape(-1, 2).mean(axis=1)
+        # Кадры, пришедшие между последним read и стопом
+        recording.append(source.drain())
 
-        # Resample to 16kHz for Whisper
-        if sample_rate != 16000:
-            # Simple downsampling
-            ratio = sample_rate / 16000
-            indices = np.arange(0, len(audio_array), ratio).astype(int)
-            audio_array = audio_array[indices[:min(len(indices), len(audio_array))]]
+        if control.cancelled:
+            print("🚫 Запись отменена", file=sys.stderr)
+            return None
 
-        duration = len(audio_array) / 16000
+        duration = recording.duration
         print(f"⏹ Записано {duration:.1f}s", file=sys.stderr)
 
         if duration < MIN_AUDIO_SECONDS:
             print(f"⚠️ Слишком короткая запись", file=sys.stderr)
             return None
 
-        return audio_array
+        return recording.to_float32()
 
     except Exception as e:
         print(f"❌ Ошибка записи: {e}", file=sys.stderr)
         return None
     finally:
-        p.terminate()
-        # Cleanup
-        if os.path.exists(STOP_FILE):
-            os.remove(STOP_FILE)
-        if os.path.exists(PID_FILE):
-            os.remove(PID_FILE)
-
-
-def save_wav(audio_array, path):
-    """Сохранить в WAV для Whisper."""
-    wav = wave.open(path, 'wb')
-    wav.setnchannels(1)  # Mono
-    wav.setsampwidth(2)  # 16-bit
-    wav.setframerate(16000)  # 16kHz
-    wav.writeframes((audio_array * 32767).astype(np.int16).tobytes())
-    wav.close()
+        source.close()
+        MicSource.terminate()
 
 
 def transcribe(audio_array, language=None):
@@ -141,61 +118,94 @@ def transcribe(audio_array, language=None):
     if audio_array is None or len(audio_array) == 0:
         return "", "error"
 
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-        tmp_path = tmp.name
-        save_wav(audio_array, tmp_path)
-
     try:
-        kwargs = {"path_or_hf_repo": MODEL_NAME}
-        if language:
-            kwargs["language"] = language
-
-        result = mlx_whisper.transcribe(tmp_path, **kwargs)
-        text = result.get("text", "").strip()
-        detected_lang = result.get("language", "?")
-        return text, detected_lang
+        return chunking.transcribe(audio_array, language=language, model_name=MODEL_NAME)
     except Exception as e:
         print(f"❌ Ошибка транскрипции: {e}", file=sys.stderr)
         return "", "error"
-    finally:
-        os.unlink(tmp_path)
 
 
 def main():
+    startup.mark("импорты")
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--lang", default=None, help="Язык (ru/en/auto)")
+    parser.add_argument("--stream", action="store_true",
+                        default=os.environ.get("MLXW_STREAM") == "1",
+                        help="Распознавать во время записи")
+    parser.add_argument("--no-compact", dest="compact", action="store_false", default=COMPACT,
+                        help="Не сжимать паузы перед распознаванием")
+    parser.add_argument("--source", default=SOURCE,
+                        help="Другой источник вместо BlackHole: file:PATH, stdin:48000:2, tone... (audio_sources.py)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Время импортов, открытия устройства и загрузки модели (startup.py)")
     args = parser.parse_args()
 
     print(f"📦 Модель: {MODEL_NAME}", file=sys.stderr)
-    print("🎯 Режим: BlackHole (системный звук)", file=sys.stderr)
-
-    # Find BlackHole
-    device_index, sample_rate = find_blackhole()
-
-    if device_index is None:
-        print("\n❌ BlackHole не найден!", file=sys.stderr)
-        print("\n⚠️  Установка BlackHole:", file=sys.stderr)
-        print("1. brew install --cask blackhole-2ch", file=sys.stderr)
-        print("2. sudo killall coreaudiod  (для активации без перезагрузки)", file=sys.stderr)
-        print("3. Перезапустите скрипт", file=sys.stderr)
-        sys.exit(1)
-
-    print("\n📌 Как использовать:", file=sys.stderr)
-    print("1. Откройте System Settings → Sound → Output", file=sys.stderr)
-    print("2. Выберите 'BlackHole 2ch' как устройство вывода", file=sys.stderr)
-    print("3. Нажмите горячую клавишу для записи", file=sys.stderr)
+    if args.source:
+        source = open_source(args.source)
+        print(f"🎯 Режим: {source.device_name}", file=sys.stderr)
+    else:
+        print("🎯 Режим: BlackHole (системный звук)", file=sys.stderr)
+
+        # Find BlackHole
+        device_index, sample_rate = find_blackhole()
+
+        if device_index is None:
+            print("\n❌ BlackHole не найден!", file=sys.stderr)
+            print("\n⚠️  Установка BlackHole:", file=sys.stderr)
+            print("1. brew install --cask blackhole-2ch", file=sys.stderr)
+            print("2. sudo killall coreaudiod  (для активации без перезагрузки)", file=sys.stderr)
+            print("3. Перезапустите скрипт", file=sys.stderr)
+            sys.exit(1)
+        source = MicSource(channels=CHANNELS, rate=sample_rate, device_index=device_index)
+
+        print("\n📌 Как использовать:", file=sys.stderr)
+        print("1. Откройте System Settings → Sound → Output", file=sys.stderr)
+        print("2. Выберите 'BlackHole 2ch' как устройство вывода", file=sys.stderr)
+        print("3. Нажмите горячую клавишу для записи", file=sys.stderr)
     print("─" * 40, file=sys.stderr)
 
     # Record
-    audio = record_until_stop(device_index, sample_rate)
+    with ControlChannel() as control:
+        # Сначала захват, потом модель: она грузится и прогревается в фоне, пока идёт запись
+        if open_capture(source) is None:
+            sys.exit(1)
+        recording_started = time.monotonic()
+        loader = asr.BackgroundLoad(MODEL_NAME)
+
+        streamer = None
+        if args.stream:
+            streamer = StreamingTranscriber(mlx_word_transcriber(MODEL_NAME), language=args.lang)
+            streamer.start()
+
+        audio = record_until_stop(source, control, on_audio=streamer.feed if streamer else None)
+        recording_stopped = time.monotonic()
+        if control.cancelled:
+            sys.exit(1)
+        if audio is not None and len(audio) > 0:
+            print("🧠 Распознавание...", file=sys.stderr)
+            if streamer is None and args.compact:
+                audio, timemap = compact_silence(audio)
+                print(timemap.report(), file=sys.stderr)
+            # После ожидания модели: стоп → инференс включает её догрузку
+            loader.report(recording_started, recording_stopped)
+            control.mark_inference()
 
     if audio is not None and len(audio) > 0:
-        print("🧠 Распознавание...", file=sys.stderr)
-        text, lang = transcribe(audio, args.lang)
+        text = None
+        if streamer is not None:
+            try:
+                text, lang = streamer.finish()
+                streamer.report()
+            except Exception as e:
+                print(f"⚠️  Потоковый режим упал ({e}), распознаю целиком", file=sys.stderr)
+        if text is None:
+            text, lang = transcribe(audio, args.lang)
 
         if text:
             print(text)  # To stdout for Hammerspoon
+            import pyperclip
             pyperclip.copy(text)
             print(f"📋 [{lang}] → буфер", file=sys.stderr)
         else:
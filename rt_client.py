@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Тонкий клиент демона rt_daemon.py.
+
+Только стандартная библиотека: процесс стартует за миллисекунды,
+модель и аудио-стек уже загружены в демоне. Если демон не запущен,
+клиент подменяет себя старым скриптом (rt_toggle.py / rt_blackhole.py / rt.py).
+
+  rt_client.py toggle --source blackhole --lang ru   — запись до SIGINT/SIGUSR1 (control.py)
+  rt_client.py listen --lang ru                      — одна фраза до паузы
+  rt_client.py status | stop | cancel | shutdown
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import startup
+from control import ControlChannel
+
+SOCKET_PATH = os.environ.get("MLXW_SOCKET", "/tmp/mlxw.sock")
+
+# Чем заменить клиента, если демон недоступен
+FALLBACK_SCRIPTS = {
+    ("toggle", "mic"): ["rt_toggle.py"],
+    ("toggle", "blackhole"): ["rt_blackhole.py"],
+    ("listen", "mic"): ["rt.py", "--single"],
+}
+
+
+class DaemonUnavailable(Exception):
+    pass
+
+
+def request(cmd, socket_path=SOCKET_PATH, **params):
+    """Отправляет команду демону и возвращает ответ (dict)."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError as e:
+        sock.close()
+        raise DaemonUnavailable(str(e))
+
+    with sock:
+        payload = dict(params, cmd=cmd)
+        sock.sendall((json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8"))
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise DaemonUnavailable("демон закрыл соединение")
+    return json.loads(line)
+
+
+def copy_to_clipboard(text):
+    try:
+        import pyperclip
+        pyperclip.copy(text)
+    except ImportError:
+        try:
+            subprocess.run(["pbcopy"], input=text.encode("utf-8"), check=False)
+        except OSError:
+            pass   # не macOS — Hammerspoon всё равно берёт текст из stdout
+
+
+def fallback(command, source, lang):
+    """Демона нет — запускаем обычный скрипт вместо себя."""
+    script = FALLBACK_SCRIPTS.get((command, source))
+    if script is None:
+        print("❌ Демон не запущен", file=sys.stderr, flush=True)
+        sys.exit(1)
+    here = os.path.dirname(os.path.abspath(__file__))
+    argv = [sys.executable, os.path.join(here, script[0])] + script[1:]
+    if lang:
+        argv += ["--lang", lang]
+    os.execv(sys.executable, argv)
+
+
+def print_result(result, stop_to_inference_ms=None):
+    if not result.get("ok") or not result.get("text"):
+        print(f"❌ {result.get('error', 'Пустая транскрипция')}", file=sys.stderr, flush=True)
+        sys.exit(1)
+
+    text = result["text"]
+    print(text, flush=True)
+    copy_to_clipboard(text)
+    latency = f", стоп → инференс {stop_to_inference_ms:.0f} ms" if stop_to_inference_ms is not None else ""
+    if result.get("removed_seconds"):
+        latency += f", −{result['removed_seconds']}s тишины"
+    print(f"📋 [{result.get('language', '?')}] → буфер "
+          f"({result['audio_seconds']}s аудио, инференс {result['inference_ms']} ms{latency})",
+          file=sys.stderr, flush=True)
+
+
+def run_toggle(source, lang):
+    response = request("start", source=source, lang=lang)
+    if not response.get("ok"):
+        print(f"❌ {response.get('error')}", file=sys.stderr, flush=True)
+        sys.exit(1)
+
+    print(f"🔴 REC ({response.get('device')})", file=sys.stderr, flush=True)
+
+    # Стоп — SIGINT/SIGUSR1, отмена — SIGTERM (Hammerspoon при перезагрузке конфига)
+    with ControlChannel() as control:
+        control.wait()
+        if control.cancelled:
+            try:
+                request("cancel")
+            except DaemonUnavailable:
+                pass
+            print("🚫 Запись отменена", file=sys.stderr, flush=True)
+            sys.exit(1)
+
+        print("⏹  Стоп. Распознавание...", file=sys.stderr, flush=True)
+        sent_ms = (time.perf_counter() - control.stop_requested_at) * 1000
+        try:
+            result = request("stop")
+        except DaemonUnavailable as e:
+            # Запись уже шла в демоне — перезапуск старого скрипта её не вернёт
+            result = {"ok": False, "error": f"демон недоступен: {e}"}
+
+    stop_ms = result.get("stop_ms")
+    print_result(result, sent_ms + stop_ms if stop_ms is not None else None)
+
+
+def main():
+    startup.mark("импорты")
+    parser = argparse.ArgumentParser(description="Клиент демона rt_daemon.py")
+    parser.add_argument("command", choices=["toggle", "listen", "start", "stop", "cancel", "status", "shutdown"])
+    parser.add_argument("--source", default="mic", choices=["mic", "blackhole"])
+    parser.add_argument("--lang", default=None)
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Время импортов, открытия устройства и загрузки модели (startup.py)")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "toggle":
+            run_toggle(args.source, args.lang)
+        elif args.command == "listen":
+            print("🎙  Ожидание речи...", file=sys.stderr, flush=True)
+            print_result(request("listen", source=args.source, lang=args.lang))
+        elif args.command == "start":
+            print(json.dumps(request("start", source=args.source, lang=args.lang), ensure_ascii=False))
+        elif args.command == "stop":
+            print_result(request("stop"))
+        else:
+            print(json.dumps(request(args.command), ensure_ascii=False))
+    except DaemonUnavailable:
+        fallback(args.command, args.source, args.lang)
+
+
+if __name__ == "__main__":
+    main()
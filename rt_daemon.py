@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Долгоживущий демон транскрибации.
+
+Держит модель Whisper и аудио-стек загруженными и принимает команды
+по локальному Unix-сокету. rt_client.py (и через него mlxw / mlxw-toggle)
+становится тонким клиентом: после стопа платим только за инференс,
+без импорта mlx_whisper/pyaudio и загрузки весов.
+
+Протокол: одна JSON-строка запроса → одна JSON-строка ответа.
+  {"cmd": "start", "source": "mic"|"blackhole", "lang": "ru"}
+  {"cmd": "stop"}     → {"ok": true, "text": "...", "language": "ru", "stop_ms": 3, ...}
+  {"cmd": "cancel"}
+  {"cmd": "status"}
+  {"cmd": "listen", "source": "mic", "lang": "ru"}  — запись до паузы (rt.py --single)
+  {"cmd": "shutdown"}
+
+Запуск:
+  python rt_daemon.py                                    — mlx-whisper + PyAudio
+  python rt_daemon.py --stub-model --audio-file a.wav    — без Apple Silicon и микрофона
+  python rt_daemon.py --backend faster-whisper           — другой движок (asr.py, MLXW_ASR)
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+import startup
+
+import asr
+import chunking
+from audio_sources import RATE, MicSource, open_source
+from devices import REGISTRY
+from recording import RecordingBuffer
+from vad import COMPACT, VoiceActivityDetector, compact_silence
+
+# ──────────────────────────────────────────────
+# Конфигурация
+# ──────────────────────────────────────────────
+MODEL_NAME = os.environ.get(
+    "WHISPER_MODEL",
+    "mlx-community/whisper-large-v3-turbo"
+)
+
+SOCKET_PATH = os.environ.get("MLXW_SOCKET", "/tmp/mlxw.sock")
+
+# Детекция тишины для команды listen — тот же VAD, что в rt.py
+SILENCE_DURATION = float(os.environ.get("SILENCE_DURATION", "1.5"))
+
+MIN_AUDIO_SECONDS = 0.3
+
+
+# ──────────────────────────────────────────────
+# Запись
+# ──────────────────────────────────────────────
+class Recording:
+    """Одна запись: чтение источника в фоновом потоке до stop() или паузы."""
+
+    def __init__(self, source, language=None, until_silence=False):
+        self.source = source
+        self.language = language
+        self.until_silence = until_silence
+        self.buffer = RecordingBuffer(RATE)   # mono 16 kHz
+        self.error = None
+        self.started_at = time.monotonic()
+        self.finished = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.source.open()
+        self._thread.start()
+
+    def _run(self):
+        vad = None
+        if self.until_silence:
+            vad = VoiceActivityDetector(RATE, hangover=SILENCE_DURATION, device=self.source.device_name)
+        try:
+            while not self._stop.is_set():
+                audio = self.source.read()   # уже mono 16 kHz
+                if not len(audio):
+                    continue   # read() прерван стопом
+                if vad is None:
+                    self.buffer.append(audio)
+                    continue
+
+                self.buffer.append(vad.process(audio))
+                if vad.ended:
+                    break
+            if vad is None:
+                # Кадры, пришедшие между последним read и стопом
+                self.source.stop()
+                self.buffer.append(self.source.drain())
+        except Exception as e:
+            self.error = e
+        finally:
+            self.source.close()
+            if vad is not None:
+                vad.save_profile()
+            self.finished.set()
+
+    def stop(self):
+        self._stop.set()
+        self.source.interrupt()
+        self._thread.join()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def audio(self):
+        return self.buffer.to_float32()
+
+
+class TranscriptionDaemon:
+    """Состояние демона: загруженная модель, источники и текущая запись."""
+
+    def __init__(self, model, audio_file=None):
+        self.model = model
+        self.audio_file = audio_file
+        self.recording = None
+        self.transcribing = 0
+        self._sources = {}
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock()
+
+    def source(self, kind):
+        if kind not in self._sources:
+            self._sources[kind] = open_source(kind, self.audio_file)
+        return self._sources[kind]
+
+    def handle(self, request):
+        cmd = request.get("cmd")
+        handler = getattr(self, f"cmd_{cmd}", None)
+        if handler is None:
+            return {"ok": False, "error": f"неизвестная команда: {cmd}"}
+        params = {k: v for k, v in request.items() if k != "cmd"}
+        try:
+            return handler(**params)
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def _begin(self, source, lang, until_silence=False):
+        with self._lock:
+            response = {"ok": True}
+            if self.recording is not None:
+                # Предыдущий клиент умер, не сказав stop/cancel
+                self.recording.stop()
+                response["warning"] = "предыдущая запись отменена"
+            if isinstance(self.source(source), MicSource):
+                # Подключённое после старта демона устройство PortAudio увидит только после
+                # перезапуска — пока ничего не пишется, по событию Hammerspoon (devices.py)
+                REGISTRY.poll()
+            recording = Recording(self.source(source), lang, until_silence)
+            recording.start()
+            self.recording = recording
+            response["device"] = recording.source.device_name
+            return recording, response
+
+    def _take(self):
+        with self._lock:
+            recording, self.recording = self.recording, None
+            return recording
+
+    def _finish(self, recording, stop_at=None):
+        if recording.error is not None:
+            return {"ok": False, "error": f"ошибка записи: {recording.error}"}
+
+        audio = recording.audio()
+        duration = len(audio) / RATE
+        if duration < MIN_AUDIO_SECONDS:
+            return {"ok": False, "error": "нет аудио", "audio_seconds": duration}
+
+        removed = 0.0
+        if COMPACT and not recording.until_silence:
+            # Toggle-запись: длинные паузы не гоняем через энкодер
+            audio, timemap = compact_silence(audio)
+            removed = timemap.removed_seconds
+
+        t0 = time.monotonic()
+        stop_ms = round((t0 - stop_at) * 1000) if stop_at is not None else None
+        with self._model_lock:
+            self.transcribing += 1
+            try:
+                text, lang = chunking.transcribe(audio, recording.language, engine=self.model)
+            finally:
+                self.transcribing -= 1
+        return {
+            "ok": True,
+            "text": text,
+            "language": lang,
+            "audio_seconds": round(duration, 2),
+            "removed_seconds": round(removed, 2),
+            "inference_ms": round((time.monotonic() - t0) * 1000),
+            "stop_ms": stop_ms,
+        }
+
+    def cmd_start(self, source="mic", lang=None):
+        _, response = self._begin(source, lang)
+        return response
+
+    def cmd_stop(self):
+        stop_at = time.monotonic()
+        recording = self._take()
+        if recording is None:
+            return {"ok": False, "error": "запись не идёт"}
+        recording.stop()
+        return self._finish(recording, stop_at)
+
+    def cmd_cancel(self):
+        recording = self._take()
+        if recording is not None:
+            recording.stop()
+        return {"ok": True, "cancelled": recording is not None}
+
+    def cmd_listen(self, source="mic", lang=None):
+        recording, _ = self._begin(source, lang, until_silence=True)
+        recording.finished.wait()
+        with self._lock:
+            if self.recording is not recording:
+                return {"ok": False, "error": "запись отменена"}
+            self.recording = None
+        return self._finish(recording)
+
+    def cmd_status(self):
+        recording = self.recording
+        return {
+            "ok": True,
+            "pid": os.getpid(),
+            "model": self.model.describe(),
+            "models": asr.resident(),
+            "devices": REGISTRY.stats,
+            "state": "recording" if recording else ("transcribing" if self.transcribing else "idle"),
+            "elapsed": round(recording.elapsed, 2) if recording else 0.0,
+        }
+
+    def close(self):
+        recording = self._take()
+        if recording is not None:
+            recording.stop()
+        MicSource.terminate()
+
+
+# ──────────────────────────────────────────────
+# Unix-сокет
+# ──────────────────────────────────────────────
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+        except ValueError:
+            response = {"ok": False, "error": "некорректный запрос"}
+        else:
+            if request.get("cmd") == "shutdown":
+                response = {"ok": True}
+            else:
+                response = self.server.transcriber.handle(request)
+        self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+        if response.get("ok") and request.get("cmd") == "shutdown":
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+
+class DaemonServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, transcriber):
+        self.transcriber = transcriber
+        super().__init__(path, _RequestHandler)
+
+
+def claim_socket(path):
+    """Удаляет осиротевший сокет; False — если демон уже запущен."""
+    if not os.path.exists(path):
+        return True
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+        return True
+    finally:
+        probe.close()
+    return False
+
+
+def main():
+    startup.mark("импорты")
+    parser = argparse.ArgumentParser(description="Демон транскрибации с тёплой моделью")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="Путь к Unix-сокету")
+    parser.add_argument("--stub-model", action="store_true",
+                        help="Заглушка вместо модели (тесты без Apple Silicon), то же, что --backend stub")
+    parser.add_argument("--backend", default=asr.BACKEND, choices=["auto", *asr.ENGINES],
+                        help="Движок распознавания (по умолчанию MLXW_ASR или auto)")
+    parser.add_argument("--audio-file", default=None,
+                        help="WAV-файл вместо микрофона/BlackHole")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Время импортов, открытия устройства и загрузки модели (startup.py)")
+    args = parser.parse_args()
+
+    if not claim_socket(args.socket):
+        print(f"❌ Демон уже запущен: {args.socket}", file=sys.stderr)
+        sys.exit(1)
+
+    # Основная модель и всё из MLXW_PRELOAD — резидентны до остановки демона
+    backend = "stub" if args.stub_model else args.backend
+    asr.preload([MODEL_NAME] + [m for m in asr.PRELOAD if m != MODEL_NAME], backend)
+    model = asr.get_engine(backend, MODEL_NAME)
+
+    transcriber = TranscriptionDaemon(model, audio_file=args.audio_file)
+    server = DaemonServer(args.socket, transcriber)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+
+    print(f"🔌 Слушаю {args.socket}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        transcriber.close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        print("👋  Демон остановлен.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,29 @@
 """
 System Audio Capture with automatic device routing.
 Captures system audio through BlackHole with automatic device switching.
+
+Запись по умолчанию пишется на диск (recording.SpillRecordingBuffer):
+многочасовой звонок не держится в RAM, а при сбое распознавания файл
+остаётся в ~/.cache/mlxwhisper/recordings. Повторить распознавание:
+  python rt_system.py --retranscribe          # последняя запись
+  python rt_system.py --retranscribe FILE.wav
+
+Запись длиннее MLXW_LONG_SECONDS распознаётся независимыми кусками по паузам
+(chunking.py), параллельно, если движок умеет.
 """
 
 import sys
 import os
-import tempfile
-import wave
 import time
 import subprocess
-import json
 
-import mlx_whisper
-import pyaudio
-import numpy as np
-import pyperclip
+import startup
+
+import chunking
+from audio_sources import MicSource
+from control import ControlChannel
+from devices import REGISTRY
+from recording import RecordingBuffer, SpillRecordingBuffer, load_recording, pending_recordings
 
 # Model configuration
 MODEL_NAME = os.environ.get(
@@ -24,66 +33,36 @@ MODEL_NAME = os.environ.get(
 )
 
 # Audio parameters
-FORMAT = pyaudio.paInt16
-CHANNELS = 2  # Stereo for system audio
-RATE = 44100  # System audio rate
 CHUNK = 1024
 
-# Files
-STOP_FILE = "/tmp/mlxw-stop"
-PID_FILE = "/tmp/mlxw-pid"
-
 
 class SystemAudioCapture:
     """Manages system audio capture through virtual devices."""
 
     def __init__(self):
-        self.p = pyaudio.PyAudio()
         self.current_output = None
         self.blackhole_index = None
         self.multi_output_index = None
 
-    def find_device(self, name_contains, is_input=True):
-        """Find audio device by name."""
-        for i in range(self.p.get_device_count()):
-            info = self.p.get_device_info_by_index(i)
-            if name_contains.lower() in info['name'].lower():
-                if is_input and info['maxInputChannels'] > 0:
-                    return i, info
-                elif not is_input and info['maxOutputChannels'] > 0:
-                    return i, info
-        return None, None
-
     def get_current_output_device(self):
-        """Get current system output device using macOS tools."""
-        try:
-            # Get current output device
-            result = subprocess.run(
-                ['system_profiler', 'SPAudioDataType', '-json'],
-                capture_output=True, text=True, check=True
-            )
-            data = json.loads(result.stdout)
-
-            # Parse for current output
-            for item in data.get('SPAudioDataType', []):
-                if item.get('_name') == 'Output':
-                    return item.get('coreaudio_default_audio_output_device', '')
-        except:
-            pass
-        return None
+        """Current system output device (из кэша devices.REGISTRY, без system_profiler)."""
+        return REGISTRY.default_output
 
     def setup_blackhole(self):
         """Setup BlackHole for system audio capture."""
         # Find BlackHole device
-        self.blackhole_index, blackhole_info = self.find_device('BlackHole', is_input=True)
+        blackhole = REGISTRY.find('BlackHole')
 
-        if not self.blackhole_index:
+        if blackhole is None:
             print("⚠️  BlackHole не найден. Устанавливаю...", file=sys.stderr)
             self.install_blackhole()
-            self.blackhole_index, blackhole_info = self.find_device('BlackHole', is_input=True)
+            # Новое устройство появится только после перечисления заново
+            REGISTRY.refresh()
+            blackhole = REGISTRY.find('BlackHole')
 
-        if self.blackhole_index:
-            print(f"✅ BlackHole найден: {blackhole_info['name']}", file=sys.stderr)
+        if blackhole is not None:
+            self.blackhole_index = blackhole['index']
+            print(f"✅ BlackHole найден: {blackhole['name']}", file=sys.stderr)
             return True
         else:
             print("❌ BlackHole не удалось настроить", file=sys.stderr)
@@ -127,44 +106,8 @@ class SystemAudioCapture:
 
     def smart_device_selection(self):
         """Intelligently select the best audio capture device."""
-        devices = []
-
-        for i in range(self.p.get_device_count()):
-            info = self.p.get_device_info_by_index(i)
-            if info['maxInputChannels'] > 0:
-                # Priority scoring
-                priority = 0
-                name_lower = info['name'].lower()
-
-                # Highest priority - BlackHole for system audio
-                if 'blackhole' in name_lower:
-                    priority = 100
-                # Multi-output devices
-                elif 'multi' in name_lower or 'aggregate' in name_lower:
-                    priority = 90
-                # Virtual cables
-                elif 'soundflower' in name_lower or 'loopback' in name_lower:
-                    priority = 80
-                # External devices (may have loopback)
-                elif 'usb' in name_lower or 'external' in name_lower:
-                    priority = 50
-                # Headphones/AirPods with possible passthrough
-                elif 'airpods' in name_lower or 'headphones' in name_lower:
-                    priority = 40
-                # Built-in mic (lowest for system audio)
-                elif 'built-in' in name_lower or 'internal' in name_lower:
-                    priority = 10
-
-                devices.append({
-                    'index': i,
-                    'name': info['name'],
-                    'priority': priority,
-                    'channels': info['maxInputChannels'],
-                    'rate': info.get('defaultSampleRate', 44100)
-                })
-
-        # Sort by priority
-        devices.sort(key=lambda x: x['priority'], reverse=True)
+        # Highest priority - BlackHole, then Multi-Output, virtual cables... (devices.system_priority)
+        devices = REGISTRY.ranked("system")
 
         if devices:
             selected = devices[0]
@@ -176,7 +119,7 @@ class SystemAudioCapture:
                 print(f"   Альтернативы: {', '.join(alts)}", file=sys.stderr)
 
             # Warning if not optimal
-            if selected['priority'] < 50:
+            if selected['system_priority'] < 50:
                 print("⚠️  Выбран микрофон, а не системный звук!", file=sys.stderr)
                 print("   Рекомендуется настроить BlackHole", file=sys.stderr)
 
@@ -201,108 +144,107 @@ class SystemAudioCapture:
 
         return device_index
 
-    def record_until_stop(self, device_index):
-        """Record system audio until stop signal."""
+    def record_until_stop(self, device_index, control, spill=True):
+        """Record system audio until stop/cancel via control.
+        Возвращает буфер записи (на диске при spill=True) или None."""
+        recording = None
+        source = None
         try:
             # Adjust parameters based on device
-            device_info = self.p.get_device_info_by_index(device_index)
-            channels = min(2, device_info['maxInputChannels'])
-            rate = int(device_info.get('defaultSampleRate', 44100))
-
-            stream = self.p.open(
-                format=FORMAT,
-                channels=channels,
-                rate=rate,
-                input=True,
-                input_device_index=device_index,
-                frames_per_buffer=CHUNK
-            )
+            device_info = next(d for d in REGISTRY.devices if d['index'] == device_index)
+            channels = min(2, device_info['channels'])
+            rate = device_info['rate']
 
-            print(f"🔴 REC (системный звук, {rate}Hz, {channels}ch)", file=sys.stderr)
+            # Mono 16 kHz для Whisper прямо во время записи, внутри источника
+            source = MicSource(channels=channels, rate=rate, chunk=CHUNK, device_index=device_index).open()
+            control.add_waker(source.interrupt)
 
-            frames = []
+            print(f"🔴 REC (системный звук, {rate}Hz, {channels}ch)", file=sys.stderr)
 
-            # Write PID for external control
-            with open(PID_FILE, 'w') as f:
-                f.write(str(os.getpid()))
+            recording = SpillRecordingBuffer(16000) if spill else RecordingBuffer(16000)
 
-            # Record until stop file appears
-            while not os.path.exists(STOP_FILE):
+            # Record until stop signal
+            while not control.stopped:
                 try:
-                    data = stream.read(CHUNK, exception_on_overflow=False)
-                    frames.append(data)
-                except:
+                    recording.append(source.read())
+                except Exception:
                     time.sleep(0.01)
 
-            stream.stop_stream()
-            stream.close()
-
-            # Convert to mono 16kHz for Whisper
-            audio_data = b''.join(frames)
-            audio_array = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
-
-            # If stereo, convert to mono
-            if channels == 2:
-                audio_array = audio_array.reshape(-1, 2).mean(axis=1)
+            source.stop()
 
-            # Resample to 16kHz if needed
-            if rate != 16000:
-                # Simple downsampling (proper resampling would use scipy)
-                ratio = rate / 16000
-                indices = np.arange(0, len(audio_array), ratio).astype(int)
-                audio_array = audio_array[indices[:min(len(indices), len(audio_array))]]
-
-            return audio_array
+            # Кадры, пришедшие между последним read и стопом
+            recording.append(source.drain())
+            source.close()
+            if spill:
+                recording.close()
+            return recording
 
         except Exception as e:
             print(f"❌ Ошибка записи: {e}", file=sys.stderr)
+            if source is not None:
+                source.close()
+            if spill and recording is not None:
+                # То, что успели записать, остаётся на диске
+                recording.close()
+                print(f"💾 Запись сохранена: {recording.path}", file=sys.stderr)
             return None
-        finally:
-            # Cleanup
-            if os.path.exists(STOP_FILE):
-                os.remove(STOP_FILE)
-            if os.path.exists(PID_FILE):
-                os.remove(PID_FILE)
 
 
-def transcribe(audio_array, language=None):
+def transcribe(audio_array, language=None, cache=False):
     """Transcribe audio using MLX Whisper."""
     if audio_array is None or len(audio_array) == 0:
         return "", "error"
 
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-        # Save as 16kHz mono WAV
-        wav = wave.open(tmp.name, 'wb')
-        wav.setnchannels(1)
-        wav.setsampwidth(2)
-        wav.setframerate(16000)
-        wav.writeframes((audio_array * 32767).astype(np.int16).tobytes())
-        wav.close()
-        tmp_path = tmp.name
-
     try:
-        kwargs = {"path_or_hf_repo": MODEL_NAME}
-        if language:
-            kwargs["language"] = language
-
-        result = mlx_whisper.transcribe(tmp_path, **kwargs)
-        text = result.get("text", "").strip()
-        lang = result.get("language", "?")
-        return text, lang
+        return chunking.transcribe(audio_array, language=language, model_name=MODEL_NAME, cache=cache)
     except Exception as e:
         print(f"❌ Ошибка транскрипции: {e}", file=sys.stderr)
         return "", "error"
-    finally:
-        os.unlink(tmp_path)
+
+
+def retranscribe(path, language=None):
+    """Распознать запись, сохранённую после сбоя, без повторной записи."""
+    if path == "last":
+        pending = pending_recordings()
+        if not pending:
+            print("❌ Сохранённых записей нет", file=sys.stderr)
+            sys.exit(1)
+        path = pending[0]
+
+    audio = load_recording(path)
+    print(f"📂 {path} ({len(audio) / 16000:.1f}s)", file=sys.stderr)
+    print("🧠 Распознавание...", file=sys.stderr)
+    text, lang = transcribe(audio, language, cache=True)
+
+    if not text:
+        print("❌ Не распознано, файл оставлен", file=sys.stderr)
+        sys.exit(1)
+
+    print(text)
+    import pyperclip
+    pyperclip.copy(text)
+    print(f"📋 [{lang}] → буфер", file=sys.stderr)
+    os.unlink(path)
 
 
 def main():
+    startup.mark("импорты")
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--lang", default="ru", help="Language")
     parser.add_argument("--setup", action="store_true", help="Setup BlackHole")
+    parser.add_argument("--in-memory", action="store_true",
+                        help="Держать запись в RAM, не писать на диск")
+    parser.add_argument("--retranscribe", nargs="?", const="last", metavar="FILE",
+                        help="Распознать сохранённую запись (по умолчанию последнюю)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Время импортов, открытия устройства и загрузки модели (startup.py)")
     args = parser.parse_args()
 
+    if args.retranscribe:
+        retranscribe(args.retranscribe, args.lang)
+        return
+
     print(f"📦 Модель: {MODEL_NAME}", file=sys.stderr)
     print("🎯 Режим: Захват системного звука", file=sys.stderr)
 
@@ -324,23 +266,38 @@ def main():
         sys.exit(1)
 
     # Record
-    audio = capture.record_until_stop(device_index)
-
-    if audio is not None and len(audio) > 0:
-        duration = len(audio) / 16000
-        print(f"⏹ Записано {duration:.1f}s", file=sys.stderr)
-
-        print("🧠 Распознавание...", file=sys.stderr)
+    with ControlChannel() as control:
+        recording = capture.record_until_stop(device_index, control, spill=not args.in_memory)
+        if control.cancelled:
+            print("🚫 Запись отменена", file=sys.stderr)
+            if recording is not None and not args.in_memory:
+                recording.discard()
+            sys.exit(1)
+        if recording is not None and len(recording) > 0:
+            print(f"⏹ Записано {recording.duration:.1f}s", file=sys.stderr)
+            print("🧠 Распознавание...", file=sys.stderr)
+            audio = recording.to_float32()
+            control.mark_inference()
+
+    if recording is not None and len(recording) > 0:
         text, lang = transcribe(audio, args.lang)
 
         if text:
             print(text)  # To stdout for Hammerspoon
+            import pyperclip
             pyperclip.copy(text)
             print(f"📋 [{lang}] → буфер", file=sys.stderr)
+            if not args.in_memory:
+                recording.discard()
         else:
             print("❌ Не распознано", file=sys.stderr)
+            if not args.in_memory:
+                print(f"💾 Запись сохранена: {recording.path}", file=sys.stderr)
+                print(f"   Повторить: python rt_system.py --retranscribe {recording.path}", file=sys.stderr)
     else:
         print("❌ Нет аудио", file=sys.stderr)
+        if recording is not None and not args.in_memory:
+            recording.discard()
 
 
 if __name__ == "__main__":
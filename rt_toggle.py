@@ -2,20 +2,33 @@
 """
 Toggle-mode Speech-to-Text with mlx-whisper.
 Starts recording immediately.
-Stops when /tmp/mlxw-stop file appears.
+Stops on SIGINT/SIGUSR1, cancels on SIGTERM (control.py).
 Transcribes, copies to clipboard, prints to stdout.
+
+--stream (или MLXW_STREAM=1): распознавание идёт во время записи
+(streaming.py), после стопа декодируется только хвост.
+Без --stream длинные паузы сжимаются перед распознаванием (vad.compact_silence),
+--no-compact или MLXW_COMPACT=0 — выключить.
+
+Микрофон открывается сразу после разбора аргументов, модель грузится
+и прогревается в фоне во время записи (asr.BackgroundLoad); после стопа
+печатается, сколько загрузки спряталось за записью.
 """
 
 import sys
 import os
-import tempfile
-import wave
 import time
 
-import mlx_whisper
-import pyaudio
+import startup
+
 import numpy as np
-import pyperclip
+
+import asr
+from audio_sources import SOURCE, MicSource, open_source
+from control import ControlChannel
+from recording import RecordingBuffer
+from streaming import StreamingTranscriber, mlx_word_transcriber
+from vad import COMPACT, compact_silence
 
 # ──────────────────────────────────────────────
 # Конфигурация модели
@@ -25,142 +38,122 @@ MODEL_NAME = os.environ.get(
     "mlx-community/whisper-large-v3-turbo"
 )
 
-# PyAudio
-FORMAT = pyaudio.paInt16
+# Аудио (источник отдаёт mono 16 kHz)
 CHANNELS = 1
 RATE = 16000
 CHUNK = 1024
 
-# Предпочтительный микрофон (поиск по подстроке в имени)
-# Если найден — используется он, если нет — системный default
-PREFERRED_MIC = os.environ.get("WHISPER_MIC", "MacBook Pro Microphone")
-
-# Сигнальный файл для остановки
-STOP_FILE = "/tmp/mlxw-stop"
-PID_FILE = "/tmp/mlxw-pid"
-
 # Минимальная длительность
 MIN_AUDIO_SECONDS = 0.3
 
 
-def find_mic(p):
-    """Найти микрофон по имени. Возвращает (device_index, device_info) или (None, default)."""
-    for i in range(p.get_device_count()):
-        info = p.get_device_info_by_index(i)
-        if info['maxInputChannels'] > 0 and PREFERRED_MIC.lower() in info['name'].lower():
-            return i, info
-    # Fallback на default
-    default_info = p.get_default_input_device_info()
-    return None, default_info
-
-
-def save_wav(audio_array, path):
-    int_data = (audio_array * 32767).astype(np.int16)
-    with wave.open(path, 'wb') as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(2)
-        wf.setframerate(RATE)
-        wf.writeframes(int_data.tobytes())
-
-
-def record_until_stop():
-    """Записывает аудио до появления STOP_FILE."""
-    if os.path.exists(STOP_FILE):
-        os.unlink(STOP_FILE)
-
-    with open(PID_FILE, 'w') as f:
-        f.write(str(os.getpid()))
-
-    p = pyaudio.PyAudio()
-    mic_index, mic_info = find_mic(p)
-
-    print(f"🎙 Микрофон: {mic_info['name']}", file=sys.stderr, flush=True)
-
-    stream_kwargs = dict(
-        format=FORMAT, channels=CHANNELS, rate=RATE,
-        input=True, frames_per_buffer=CHUNK
-    )
-    if mic_index is not None:
-        stream_kwargs['input_device_index'] = mic_index
-
-    stream = p.open(**stream_kwargs)
+def record_until_stop(source, control, on_audio=None):
+    """Записывает аудио из открытого источника до стопа или отмены через control.
+    on_audio(chunk) получает каждый чанк float32 — для потокового режима.
+    Источник — микрофон (по умолчанию, WHISPER_MIC) или любой из audio_sources."""
+    print(f"🎙 Микрофон: {source.device_name}", file=sys.stderr, flush=True)
+    control.add_waker(source.interrupt)
 
     print("🔴 REC", file=sys.stderr, flush=True)
-    frames = []
+    recording = RecordingBuffer(RATE, CHANNELS)
     start_time = time.time()
 
     try:
-        while True:
-            data = stream.read(CHUNK, exception_on_overflow=False)
-            audio_data = np.frombuffer(data, dtype=np.int16)
-            frames.append(audio_data.astype(np.float32) / 32768.0)
-
-            if os.path.exists(STOP_FILE):
-                break
+        while not control.stopped:
+            audio_data = source.read()
+            recording.append(audio_data)
+            if on_audio is not None:
+                on_audio(audio_data.astype(np.float32) / 32768.0)
+
+        source.stop()
+        # Кадры, пришедшие между последним read и стопом
+        recording.append(source.drain())
     finally:
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-        if os.path.exists(STOP_FILE):
-            os.unlink(STOP_FILE)
-        if os.path.exists(PID_FILE):
-            os.unlink(PID_FILE)
+        source.close()
+        source.warn_if_lossy()
+        MicSource.terminate()
+
+    if control.cancelled:
+        print("🚫 Запись отменена", file=sys.stderr, flush=True)
+        return None
 
     duration = time.time() - start_time
     print(f"⏹  Стоп. Записано {duration:.1f}s", file=sys.stderr, flush=True)
 
-    if not frames or duration < MIN_AUDIO_SECONDS:
+    if not len(recording) or duration < MIN_AUDIO_SECONDS:
         return None
 
-    return np.concatenate(frames)
+    return recording.to_float32()
 
 
 def transcribe(audio_array, language=None):
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-        tmp_path = tmp.name
-        save_wav(audio_array, tmp_path)
-
+    # Модель уже резидентна (BackgroundLoad), иначе грузится здесь
     try:
-        kwargs = {"path_or_hf_repo": MODEL_NAME}
-        if language:
-            kwargs["language"] = language
-
-        # Загружаем модель при первом вызове (кэшируется автоматически)
-        try:
-            result = mlx_whisper.transcribe(tmp_path, **kwargs)
-        except Exception as e:
-            print(f"❌ Ошибка: {e}", file=sys.stderr)
-            print(f"   Попробуйте загрузить модель вручную:", file=sys.stderr)
-            print(f"   python -c \"import mlx_whisper; mlx_whisper.transcribe('test.wav', path_or_hf_repo='{MODEL_NAME}')\"", file=sys.stderr)
-            return "", "error"
-
-        text = result.get("text", "").strip()
-        detected_lang = result.get("language", "?")
-        return text, detected_lang
-    finally:
-        os.unlink(tmp_path)
+        return asr.transcribe(audio_array, language=language, model_name=MODEL_NAME)
+    except Exception as e:
+        print(f"❌ Ошибка: {e}", file=sys.stderr)
+        print(f"   Проверьте движок распознавания: python asr.py --engines", file=sys.stderr)
+        return "", "error"
 
 
 def main():
+    startup.mark("импорты")
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--lang", type=str, default=None)
+    parser.add_argument("--stream", action="store_true",
+                        default=os.environ.get("MLXW_STREAM") == "1",
+                        help="Распознавать во время записи")
+    parser.add_argument("--no-compact", dest="compact", action="store_false", default=COMPACT,
+                        help="Не сжимать паузы перед распознаванием")
+    parser.add_argument("--source", default=SOURCE or "mic",
+                        help="Источник: mic[:ИМЯ], file:PATH, stdin, tone, noise, bursts (audio_sources.py)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Время импортов, открытия устройства и загрузки модели (startup.py)")
     args = parser.parse_args()
 
-    print(f"📦 Модель: {MODEL_NAME}", file=sys.stderr, flush=True)
-
-    audio = record_until_stop()
-    if audio is None:
-        print("❌ Нет аудио", file=sys.stderr, flush=True)
-        sys.exit(1)
-
-    print("🧠 Распознавание...", file=sys.stderr, flush=True)
-    text, lang = transcribe(audio, language=args.lang)
+    with ControlChannel() as control:
+        # Сначала микрофон: callback-режим, PortAudio пишет в кольцевой буфер сам,
+        # так что речь сразу после горячей клавиши не теряется, пока грузится остальное
+        source = open_source(args.source).open()
+        recording_started = time.monotonic()
+        loader = asr.BackgroundLoad(MODEL_NAME)
+        print(f"📦 Модель: {MODEL_NAME} (загрузка в фоне)", file=sys.stderr, flush=True)
+
+        streamer = None
+        if args.stream:
+            streamer = StreamingTranscriber(mlx_word_transcriber(MODEL_NAME), language=args.lang)
+            streamer.start()
+
+        audio = record_until_stop(source, control, on_audio=streamer.feed if streamer else None)
+        recording_stopped = time.monotonic()
+        if audio is None:
+            if not control.cancelled:
+                print("❌ Нет аудио", file=sys.stderr, flush=True)
+            sys.exit(1)
+        print("🧠 Распознавание...", file=sys.stderr, flush=True)
+        if streamer is None and args.compact:
+            audio, timemap = compact_silence(audio, RATE)
+            print(timemap.report(), file=sys.stderr, flush=True)
+        # После ожидания модели: стоп → инференс включает её догрузку
+        loader.report(recording_started, recording_stopped)
+        control.mark_inference()
+
+    text = None
+    if streamer is not None:
+        try:
+            text, lang = streamer.finish()
+            streamer.report()
+        except Exception as e:
+            print(f"⚠️  Потоковый режим упал ({e}), распознаю целиком", file=sys.stderr, flush=True)
+    if text is None:
+        text, lang = transcribe(audio, language=args.lang)
 
     if not text:
         print("❌ Пустая транскрипция", file=sys.stderr, flush=True)
         sys.exit(1)
 
+    import pyperclip
     pyperclip.copy(text)
     print(text)
     print(f"📋 [{lang}] → буфер", file=sys.stderr, flush=True)
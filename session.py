@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Сессия непрерывного режима: один поток захвата на всю сессию, фразы — итератором.
+
+Раньше rt.py --sequential и rt_auto.py открывали устройство на каждую
+фразу и закрывали после неё: открытие потока стоит десятки–сотни ms,
+а пока поток закрыт (распознавание, переоткрытие) — сказанное пропадает.
+ListeningSession открывает источник один раз; пока потребитель занят,
+кадры копит кольцевой буфер захвата (capture.py, MLXW_CAPTURE_BUFFER),
+и следующая фраза читается из него без разрыва. VAD тоже один на сессию:
+хвост блока после конца фразы достаётся следующей (next_utterance()).
+
+Источник переоткрывается только явно — replace() (например, сменилось
+лучшее устройство, devices.py) — или при keep_open=False, как раньше
+(для сравнения в --simulate).
+
+Метрики (stats): сколько раз открывался поток, разрывы захвата
+(от закрытия до первого сэмпла после открытия — этот звук потерян),
+паузы потребителя между фразами (их покрывает буфер) и потерянные кадры.
+
+  python session.py --simulate                    — без микрофона: один поток против
+  python session.py --simulate --infer-seconds 2     переоткрытия на каждую фразу
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from audio_sources import SyntheticSource
+from recording import RecordingBuffer
+from vad import VoiceActivityDetector
+
+RATE = 16000
+SILENCE_DURATION = float(os.environ.get("SILENCE_DURATION", "1.5"))
+MIN_AUDIO_SECONDS = 0.5
+
+
+class ListeningSession:
+    """Фразы (float32 mono 16 kHz) с одного открытого источника.
+
+    vad — готовый детектор (по умолчанию — с профилем шума устройства);
+    clock — часы для метрик (подменяются в симуляции).
+    """
+
+    def __init__(self, source, hangover=SILENCE_DURATION, min_seconds=MIN_AUDIO_SECONDS,
+                 vad=None, keep_open=True, clock=time.monotonic):
+        self.source = source
+        self.hangover = hangover
+        self.min_seconds = min_seconds
+        self.keep_open = keep_open
+        self.vad = vad
+        self._own_vad = vad is None
+        self._clock = clock
+        self.opens = 0
+        self.utterances_count = 0
+        self.gaps = []              # s без захвата между фразами
+        self.waits = []             # s между фразой и следующим read() — в буфере
+        self._is_open = False
+        self._closed_at = None
+        self._returned_at = None
+        self._first_read = False
+        self._carry = np.zeros(0, dtype=np.int16)
+
+    # ── поток ──
+    def open(self):
+        if self._is_open:
+            return self
+        self.source.open()
+        self._is_open = True
+        self._first_read = True
+        self.opens += 1
+        if self.vad is None:
+            # Пороги — от уровня шума этого устройства (профиль в ~/.cache/mlxwhisper/noise)
+            self.vad = VoiceActivityDetector(RATE, hangover=self.hangover, device=self.source.device_name)
+        return self
+
+    def close(self):
+        if not self._is_open:
+            return
+        self.source.close()
+        self._is_open = False
+        self._closed_at = self._clock()
+
+    def replace(self, source):
+        """Перейти на другой источник (смена устройства) — единственный плановый разрыв."""
+        self.close()
+        if self._own_vad and self.vad is not None:
+            self.vad.save_profile()
+            self.vad = None
+        self.source = source
+        self._carry = np.zeros(0, dtype=np.int16)
+        return self.open()
+
+    def interrupt(self):
+        """Будит ожидающий read() (стоп из другого потока)."""
+        self.source.interrupt()
+
+    def _read(self):
+        block = self.source.read()
+        if self._first_read:
+            self._first_read = False
+            if self._closed_at is not None:
+                self.gaps.append(self._clock() - self._closed_at)
+                self._closed_at = None
+        return block
+
+    # ── фразы ──
+    def next_utterance(self, stopping=None):
+        """Следующая фраза: float32, None — слишком короткая. Прерывается stopping."""
+        self.open()
+        if self._returned_at is not None:
+            self.waits.append(self._clock() - self._returned_at)
+            self._returned_at = None
+        vad = self.vad
+        recording = RecordingBuffer(RATE, 1)
+        chunk, self._carry = self._carry, np.zeros(0, dtype=np.int16)
+        while not vad.ended:
+            if stopping is not None and stopping.is_set():
+                return None
+            speech_started = vad.triggered
+            # Начало фразы приходит вместе с pre-roll — до пересечения порога
+            recording.append(chunk if len(chunk) else vad.process(self._read()))
+            chunk = np.zeros(0, dtype=np.int16)
+            if vad.triggered and not speech_started:
+                print(f"🔴  Запись... ({vad.describe()})", file=sys.stderr)
+
+        if self.keep_open:
+            # Кадры после конца фразы — начало следующей
+            self._carry = vad.next_utterance()
+        else:
+            self.close()
+            vad.reset()
+        self._returned_at = self._clock()
+
+        duration = recording.duration
+        if duration < self.min_seconds:
+            print(f"⚠️  Слишком короткая запись ({duration:.1f}s), пропуск.", file=sys.stderr)
+            return None
+        self.utterances_count += 1
+        print(f"⏹  Записано {duration:.1f}s аудио.", file=sys.stderr)
+        return recording.to_float32()
+
+    def utterances(self, stopping=None):
+        """Фразы подряд, пока не stopping (короткие пропускаются)."""
+        while stopping is None or not stopping.is_set():
+            audio = self.next_utterance(stopping)
+            if audio is not None:
+                yield audio
+
+    # ── метрики ──
+    @property
+    def stats(self):
+        ms = lambda values, fn: round(fn(values) * 1000) if values else 0
+        return {
+            "opens": self.opens,
+            "utterances": self.utterances_count,
+            "gap_ms_total": ms(self.gaps, sum),
+            "gap_ms_max": ms(self.gaps, max),
+            "wait_ms_max": ms(self.waits, max),
+            "dropped_frames": self.source.dropped_frames,
+        }
+
+    def report(self):
+        s = self.stats
+        print(f"🎧 Поток открывался {s['opens']} раз, фраз {s['utterances']}, "
+              f"без захвата {s['gap_ms_total']} ms (макс {s['gap_ms_max']}), "
+              f"паузы чтения до {s['wait_ms_max']} ms, потеряно кадров {s['dropped_frames']}",
+              file=sys.stderr, flush=True)
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+        if self._own_vad and self.vad is not None:
+            self.vad.save_profile()
+
+
+# ──────────────────────────────────────────────
+# Симуляция
+# ──────────────────────────────────────────────
+class SimulatedMic(SyntheticSource):
+    """Говорящий: count «фраз» вспышками тона, дальше тишина — на виртуальных часах.
+
+    Открытие стоит open_seconds; говорящий не ждёт: пока поток закрыт,
+    его речь идёт мимо (missed_speech). Пока открыт — копится в буфере,
+    как у CaptureStream.
+    """
+
+    def __init__(self, count=10, on=1.0, off=1.0, open_seconds=0.15, chunk=1024):
+        super().__init__("bursts", on=on, off=off, realtime=False, chunk=chunk)
+        self.total = count * (on + off)
+        self.open_seconds = open_seconds
+        self.now = 0.0
+        self.missed_speech = 0.0
+        self._started = False
+
+    def _speech_seconds(self, start, end):
+        """Сколько речи в сценарии между start и end (s)."""
+        t = np.arange(int(start * self.native_rate), int(min(end, self.total) * self.native_rate))
+        return np.count_nonzero((t / self.native_rate) % (self.on + self.off) < self.on) / self.native_rate
+
+    def _open(self):
+        heard = self.heard_until
+        super()._open()
+        if self._started:
+            self.now = max(self.now, heard) + self.open_seconds
+            self.missed_speech += self._speech_seconds(heard, self.now)
+        self._started = True    # сценарий начинается с первым открытием
+        self._pos = int(self.now * self.native_rate)   # сказанное до открытия не услышано
+
+    def _read(self):
+        block = super()._read()
+        if self.heard_until > self.total:
+            block[:] = 0
+        self.now = max(self.now, self.heard_until)
+        return block
+
+    @property
+    def heard_until(self):
+        """До какой секунды сценария дочитан звук."""
+        return self._pos / self.native_rate
+
+    def advance(self, seconds):
+        """Потребитель занят seconds (распознавание)."""
+        self.now += seconds
+
+
+class _ScenarioOver:
+    """stopping для next_utterance(): сценарий дочитан (плюс секунда на хвост фразы)."""
+
+    def __init__(self, mic):
+        self.mic = mic
+
+    def is_set(self):
+        return self.mic.heard_until >= self.mic.total + 1.0
+
+
+def simulate(count, on, off, open_seconds, infer_seconds, hangover=0.5):
+    """Один поток на сессию против переоткрытия на каждую фразу на одном сценарии."""
+    print(f"🧪 {count} фраз по {on}s, пауза {off}s, открытие потока {open_seconds * 1000:.0f} ms, "
+          f"распознавание {infer_seconds}s", file=sys.stderr)
+    results = {}
+    for keep_open in (True, False):
+        mic = SimulatedMic(count, on, off, open_seconds)
+        vad = VoiceActivityDetector(RATE, hangover=hangover, adaptive=False)
+        session = ListeningSession(mic, vad=vad, keep_open=keep_open, clock=lambda: mic.now)
+        over = _ScenarioOver(mic)
+        with session:
+            for _ in session.utterances(over):
+                mic.advance(infer_seconds)
+        s = dict(session.stats, missed_speech=round(mic.missed_speech, 2))
+        results["session" if keep_open else "reopen"] = s
+        label = "один поток     " if keep_open else "поток на фразу "
+        print(f"   {label} открытий {s['opens']:>3}, фраз {s['utterances']:>3}/{count}, "
+              f"без захвата {s['gap_ms_total'] / 1000:5.2f}s (макс {s['gap_ms_max']} ms), "
+              f"пропущено речи {s['missed_speech']:.1f}/{count * on:.0f}s", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сессия непрерывного режима на одном потоке")
+    parser.add_argument("--simulate", action="store_true", help="Прогон на синтетике")
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--speak-seconds", type=float, default=1.0)
+    parser.add_argument("--pause-seconds", type=float, default=1.0)
+    parser.add_argument("--open-ms", type=float, default=150, help="Цена открытия потока")
+    parser.add_argument("--infer-seconds", type=float, default=1.2, help="Распознавание фразы")
+    args = parser.parse_args()
+
+    if not args.simulate:
+        parser.print_help()
+        return
+    simulate(args.count, args.speak_seconds, args.pause_seconds, args.open_ms / 1000, args.infer_seconds)
+
+
+if __name__ == "__main__":
+    main()
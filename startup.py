@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Профиль холодного старта: импорты → открытие устройства → первый сэмпл → модель.
+
+Время импорта этого модуля — точка отсчёта, поэтому в каждой точке входа
+(rt*.py) `import startup` стоит первым среди импортов проекта, до numpy и
+модулей, которые его тянут: всё импортированное раньше в профиль не попадёт.
+Вехи отмечают audio_sources (open, первый read) и asr (загрузка модели,
+первое распознавание); каждая веха пишется один раз.
+
+  python rt.py --single --profile-startup     (или MLXW_PROFILE_STARTUP=1)
+      при выходе — таблица фаз и какие тяжёлые модули успели импортироваться
+
+Проверка бюджета: время от запуска процесса до первого сэмпла для каждого
+скрипта с --source (синтетический тон, движок-заглушка, без микрофона):
+
+  python startup.py --check [--budget-ms 400] [--scripts rt,rt_toggle,rt_blackhole]
+
+Выход с кодом 1, если какой-то скрипт не уложился — годится для CI/pre-commit;
+то же гоняет tests/test_startup.py вместе с остальными тестами.
+"""
+
+import atexit
+import json
+import os
+import sys
+import time
+
+STARTED = time.perf_counter()
+ENABLED = "--profile-startup" in sys.argv or os.environ.get("MLXW_PROFILE_STARTUP") == "1"
+EXIT_AT_FIRST_SAMPLE = os.environ.get("MLXW_STARTUP_EXIT") == "1"     # для --check
+BUDGET_MS = float(os.environ.get("MLXW_STARTUP_BUDGET_MS", "400"))
+HEAVY_MODULES = ("mlx_whisper", "mlx", "faster_whisper", "pywhispercpp", "torch",
+                 "pyaudio", "sounddevice", "pyperclip", "soundfile", "webrtcvad")
+CHECK_ARGS = {
+    "rt": ["--single", "--no-clipboard", "--source", "tone"],
+    "rt_toggle": ["--source", "tone"],
+    "rt_blackhole": ["--source", "tone"],
+}
+
+_marks = []
+
+
+def mark(phase):
+    """Веха старта (только первая с таким именем)."""
+    if any(name == phase for name, _ in _marks):
+        return
+    _marks.append((phase, time.perf_counter()))
+    if phase == "первый сэмпл" and EXIT_AT_FIRST_SAMPLE:
+        # Для --check: время по стенным часам — родитель считает от запуска процесса
+        print("startup:" + json.dumps({"first_sample": time.time(), "phases": phases()}),
+              file=sys.stderr, flush=True)
+        raise SystemExit(0)
+
+
+def phases():
+    """[(фаза, ms с прошлой вехи, ms от старта)]."""
+    rows, previous = [], STARTED
+    for name, t in _marks:
+        rows.append((name, round((t - previous) * 1000), round((t - STARTED) * 1000)))
+        previous = t
+    return rows
+
+
+def report():
+    print("⏱  Старт:", file=sys.stderr)
+    for name, delta, total in phases():
+        print(f"   {name:<22} +{delta:>6} ms  {total:>7} ms", file=sys.stderr)
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+    print(f"   тяжёлые модули: {', '.join(loaded) or 'нет'}", file=sys.stderr)
+
+
+if ENABLED:
+    atexit.register(report)
+
+
+# ──────────────────────────────────────────────
+# Проверка бюджета
+# ──────────────────────────────────────────────
+def measure(script, extra_args=()):
+    """Запуск скрипта до первого сэмпла. Возвращает (ms от запуска, фазы) или (None, ошибка)."""
+    import subprocess
+    import tempfile
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as cache:
+        env = dict(os.environ, MLXW_STARTUP_EXIT="1", MLXW_ASR="stub", MLXW_CACHE_DIR=cache)
+        started = time.time()
+        proc = subprocess.run([sys.executable, os.path.join(here, script + ".py"), *CHECK_ARGS[script],
+                               *extra_args],
+                              env=env, stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=60)
+    for line in proc.stderr.splitlines():
+        if line.startswith("startup:"):
+            data = json.loads(line[len("startup:"):])
+            return (data["first_sample"] - started) * 1000, data["phases"]
+    return None, proc.stderr.strip().splitlines()[-1:] or [f"код выхода {proc.returncode}"]
+
+
+def check(scripts, budget_ms, runs=3):
+    """Лучшее из runs запусков каждого скрипта против бюджета. True — все уложились."""
+    ok = True
+    for script in scripts:
+        best, phases_ = None, None
+        for _ in range(runs):
+            elapsed, detail = measure(script)
+            if elapsed is None:
+                print(f"❌ {script}: не дошёл до первого сэмпла: {detail[0]}")
+                ok = False
+                break
+            if best is None or elapsed < best:
+                best, phases_ = elapsed, detail
+        if best is None:
+            continue
+        within = best <= budget_ms
+        ok &= within
+        breakdown = ", ".join(f"{name} {total} ms" for name, _, total in phases_)
+        print(f"{'✅' if within else '❌'} {script:<13} {best:6.0f} ms (бюджет {budget_ms:.0f})  [{breakdown}]")
+    return ok
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Время холодного старта скриптов")
+    parser.add_argument("--check", action="store_true", help="Проверить время до первого сэмпла")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS,
+                        help="Бюджет от запуска процесса до первого сэмпла (MLXW_STARTUP_BUDGET_MS)")
+    parser.add_argument("--scripts", default=",".join(CHECK_ARGS), help="Скрипты через запятую")
+    parser.add_argument("--runs", type=int, default=3, help="Запусков на скрипт (берётся лучший)")
+    args = parser.parse_args()
+
+    if not args.check:
+        parser.print_help()
+        return
+    scripts = [s for s in args.scripts.split(",") if s]
+    unknown = [s for s in scripts if s not in CHECK_ARGS]
+    if unknown:
+        parser.error(f"нет --source у: {', '.join(unknown)}")
+    sys.exit(0 if check(scripts, args.budget_ms, args.runs) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Потоковая транскрибация во время toggle-записи.
+
+Пока идёт запись, фоновый поток каждые STEP_SECONDS распознаёт текущее
+окно и фиксирует слова по политике LocalAgreement-2: слово окончательное,
+когда два последовательных прогона по перекрывающимся окнам дали один
+и тот же префикс. Окно обрезается по последнему зафиксированному слову,
+так что его длина ограничена MAX_WINDOW_SECONDS.
+
+После стопа остаётся распознать только незафиксированный хвост —
+время от стопа до текста не растёт с длиной записи.
+
+    streamer = StreamingTranscriber(mlx_word_transcriber(MODEL_NAME), language="ru")
+    streamer.start()
+    ... streamer.feed(chunk_float32_16k) из цикла записи ...
+    text, lang = streamer.finish()
+"""
+
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+RATE = 16000
+
+STEP_SECONDS = float(os.environ.get("MLXW_STREAM_STEP", "2.0"))
+MAX_WINDOW_SECONDS = float(os.environ.get("MLXW_STREAM_WINDOW", "15.0"))
+
+# Хвост короче этого не распознаём — Whisper на нём галлюцинирует
+MIN_TAIL_SECONDS = 0.3
+# Контекст для initial_prompt — последние символы зафиксированного текста
+PROMPT_CHARS = 200
+# Допуск по времени при отбрасывании уже зафиксированных слов
+TIME_TOLERANCE = 0.1
+# Максимальная длина n-граммы на стыке зафиксированного и нового текста
+MAX_OVERLAP_WORDS = 5
+
+
+def mlx_word_transcriber(model_name, **decode_options):
+    """Функция (audio, language, prompt) → (слова, язык) поверх mlx-whisper.
+    Слова — кортежи (start, end, text) в секундах от начала audio."""
+    import asr
+
+    def transcribe_words(audio_array, language=None, prompt=None):
+        kwargs = dict(decode_options, word_timestamps=True, condition_on_previous_text=False)
+        if prompt:
+            kwargs["initial_prompt"] = prompt
+        result = asr.transcribe_result(audio_array, language, model_name, **kwargs)
+        words = [
+            (w["start"], w["end"], w["word"])
+            for segment in result.get("segments", [])
+            for w in segment.get("words", [])
+        ]
+        return words, result.get("language")
+
+    return transcribe_words
+
+
+def _norm(word):
+    return word.strip().lower()
+
+
+class StreamingTranscriber:
+    """LocalAgreement-2 поверх растущего буфера записи."""
+
+    def __init__(self, transcribe_words, language=None,
+                 step_seconds=STEP_SECONDS, max_window_seconds=MAX_WINDOW_SECONDS):
+        self._transcribe_words = transcribe_words
+        self.language = language
+        self.step_seconds = step_seconds
+        self.max_window_seconds = max_window_seconds
+
+        self._pending = []
+        self._pending_samples = 0
+        self._lock = threading.Lock()
+
+        self._window = np.zeros(0, dtype=np.float32)
+        self._window_start = 0.0           # секунды от начала записи
+
+        self.committed = []                # [(start, end, text)], абсолютное время
+        self._hypothesis = []
+        self._last_committed_end = 0.0
+
+        self.detected_language = language
+        self.error = None
+        self.stats = {"iterations": 0, "decoded_seconds": 0.0, "tail_seconds": 0.0, "finish_ms": 0}
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    # ── поток записи ──
+    def feed(self, chunk):
+        """Добавляет float32 mono 16 kHz. Вызывается из цикла записи."""
+        with self._lock:
+            self._pending.append(chunk)
+            self._pending_samples += len(chunk)
+
+    # ── фоновый поток ──
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.wait(0.05):
+                if self._pending_samples >= self.step_seconds * RATE:
+                    self._process_iter()
+        except Exception as e:
+            self.error = e
+
+    def _absorb_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._pending_samples = 0
+        if pending:
+            self._window = np.concatenate([self._window] + pending)
+
+    def _prompt(self):
+        text = "".join(w for _, _, w in self.committed)
+        return text[-PROMPT_CHARS:].strip() or None
+
+    def _decode(self, audio_array, offset):
+        words, lang = self._transcribe_words(audio_array, self.detected_language, self._prompt())
+        if self.detected_language is None and lang:
+            # Язык определяем один раз — дальше окна не гоняют language ID
+            self.detected_language = lang
+        self.stats["decoded_seconds"] += len(audio_array) / RATE
+        words = [(s + offset, e + offset, w) for s, e, w in words]
+        return self._drop_committed(words)
+
+    def _drop_committed(self, words):
+        """Убирает слова, уже попавшие в committed (перекрытие окон)."""
+        words = [w for w in words if w[0] > self._last_committed_end - TIME_TOLERANCE]
+        if words and self.committed:
+            for n in range(min(MAX_OVERLAP_WORDS, len(words), len(self.committed)), 0, -1):
+                tail = [_norm(w[2]) for w in self.committed[-n:]]
+                head = [_norm(w[2]) for w in words[:n]]
+                if tail == head:
+                    return words[n:]
+        return words
+
+    def _process_iter(self):
+        self._absorb_pending()
+        words = self._decode(self._window, self._window_start)
+        self.stats["iterations"] += 1
+
+        agreed = 0
+        for prev, cur in zip(self._hypothesis, words):
+            if _norm(prev[2]) != _norm(cur[2]):
+                break
+            agreed += 1
+        if agreed:
+            self.committed.extend(words[:agreed])
+            self._last_committed_end = words[agreed - 1][1]
+        self._hypothesis = words[agreed:]
+
+        window_end = self._window_start + len(self._window) / RATE
+        if window_end - self._window_start > self.max_window_seconds:
+            # Режем по зафиксированному слову; если фиксировать нечего
+            # (долгая тишина) — просто держим последние max_window секунд
+            cut = max(self._last_committed_end, window_end - self.max_window_seconds)
+            dropped = [w for w in self._hypothesis if w[1] <= cut]
+            if dropped:
+                self.committed.extend(dropped)
+                self._last_committed_end = dropped[-1][1]
+                self._hypothesis = self._hypothesis[len(dropped):]
+            self._trim(cut)
+
+    def _trim(self, cut_time):
+        cut = int((cut_time - self._window_start) * RATE)
+        if cut > 0:
+            self._window = self._window[cut:]
+            self._window_start += cut / RATE
+
+    # ── стоп ──
+    def finish(self):
+        """Останавливает фоновый поток и распознаёт незафиксированный хвост.
+        Возвращает (text, language)."""
+        t0 = time.monotonic()
+        self._stop.set()
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+        self._absorb_pending()
+        self._trim(self._last_committed_end)
+        tail_seconds = len(self._window) / RATE
+        self.stats["tail_seconds"] = round(tail_seconds, 2)
+        if tail_seconds >= MIN_TAIL_SECONDS:
+            self.committed.extend(self._decode(self._window, self._window_start))
+        self._hypothesis = []
+        self.stats["finish_ms"] = round((time.monotonic() - t0) * 1000)
+
+        text = "".join(w for _, _, w in self.committed).strip()
+        return text, self.detected_language or "?"
+
+    def report(self):
+        s = self.stats
+        print(f"⚡ Потоковый режим: {s['iterations']} окон, "
+              f"хвост {s['tail_seconds']}s, стоп→текст {s['finish_ms']} ms",
+              file=sys.stderr, flush=True)
@@ -0,0 +1,46 @@
+"""ListeningSession на SimulatedMic: один поток на сессию против потока на фразу."""
+
+import pytest
+
+from session import ListeningSession, SimulatedMic, _ScenarioOver
+from vad import VoiceActivityDetector
+
+COUNT = 5
+RATE = 16000
+
+
+def run_session(keep_open, infer_seconds=1.0):
+    mic = SimulatedMic(count=COUNT, on=1.0, off=1.0, open_seconds=0.15)
+    vad = VoiceActivityDetector(RATE, hangover=0.5, adaptive=False)
+    session = ListeningSession(mic, vad=vad, keep_open=keep_open, clock=lambda: mic.now)
+    utterances = []
+    with session:
+        for audio in session.utterances(_ScenarioOver(mic)):
+            utterances.append(audio)
+            mic.advance(infer_seconds)      # распознавание: поток либо копит, либо закрыт
+    return session.stats, mic, utterances
+
+
+def test_keep_open_uses_one_stream_without_gaps():
+    stats, mic, utterances = run_session(keep_open=True)
+    assert stats["opens"] == 1
+    assert stats["gap_ms_total"] == 0
+    assert mic.missed_speech == 0
+    assert len(utterances) == stats["utterances"] == COUNT
+
+
+def test_reopen_per_utterance_loses_speech():
+    stats, mic, _ = run_session(keep_open=False)
+    # Поток на фразу плюс последнее открытие, дождавшееся конца сценария
+    assert stats["opens"] == stats["utterances"] + 1
+    assert stats["utterances"] >= 1
+    assert stats["gap_ms_total"] > 0
+    assert mic.missed_speech > 0
+
+
+@pytest.mark.parametrize("infer_seconds", [0.0, 2.5])
+def test_keep_open_does_not_depend_on_consumer_speed(infer_seconds):
+    stats, mic, _ = run_session(keep_open=True, infer_seconds=infer_seconds)
+    assert stats["opens"] == 1
+    assert stats["utterances"] == COUNT
+    assert mic.missed_speech == 0
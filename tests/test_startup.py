@@ -0,0 +1,23 @@
+"""Бюджет холодного старта: от запуска скрипта до первого сэмпла (startup.py --check)."""
+
+import pytest
+
+import startup
+
+
+@pytest.mark.parametrize("script", list(startup.CHECK_ARGS))
+def test_time_to_first_sample_within_budget(script):
+    # Лучший из трёх запусков, как в --check: один медленный запуск — шум, не регрессия
+    timings = []
+    for _ in range(3):
+        elapsed, detail = startup.measure(script)
+        assert elapsed is not None, f"{script} не дошёл до первого сэмпла: {detail}"
+        timings.append(elapsed)
+    assert min(timings) <= startup.BUDGET_MS, (
+        f"{script}: {min(timings):.0f} ms до первого сэмпла, бюджет {startup.BUDGET_MS:.0f} ms "
+        f"(MLXW_STARTUP_BUDGET_MS); фазы: {detail}")
+
+
+def test_check_reports_failure_over_budget(capsys):
+    assert not startup.check(["rt_toggle"], budget_ms=0, runs=1)
+    assert "❌ rt_toggle" in capsys.readouterr().out
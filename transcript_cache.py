@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Кэш распознаваний на диске, ключ — содержимое аудио.
+
+Перезапуск rt_batch.py и повторное распознавание сохранённой записи
+(rt_system.py --retranscribe) декодировали тот же звук заново. Теперь
+ASREngine.transcribe_result(..., cache=True) сначала ищет результат здесь.
+Живые фразы и окна стриминга не кэшируются: они не повторяются.
+
+Ключ: blake2b от PCM float32 + движок, модель, язык и опции декодирования
+(verbose не влияет на результат и в ключ не входит). Один result — один
+JSON в ~/.cache/mlxwhisper/transcripts/<2 символа>/<ключ>.json.
+Объём ограничен MLXW_TRANSCRIPT_CACHE_MB (64): при переполнении удаляются
+давно не использованные записи (LRU по mtime, попадание его обновляет).
+MLXW_TRANSCRIPT_CACHE=0 — выключить.
+
+Счётчики попаданий/промахов — на процесс (TranscriptCache.stats),
+rt_batch.py выводит их в сводке.
+
+  python transcript_cache.py            — объём и число записей
+  python transcript_cache.py --clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+
+CACHE_DIR = os.path.expanduser(os.environ.get("MLXW_CACHE_DIR", "~/.cache/mlxwhisper"))
+TRANSCRIPTS_DIR = os.path.join(CACHE_DIR, "transcripts")
+ENABLED = os.environ.get("MLXW_TRANSCRIPT_CACHE", "1") != "0"
+MAX_MB = float(os.environ.get("MLXW_TRANSCRIPT_CACHE_MB", "64"))
+IGNORED_OPTIONS = ("verbose",)
+
+
+def cache_key(audio_array, engine, model_name, language, options):
+    """Хэш PCM и всего, от чего зависит результат."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(np.ascontiguousarray(audio_array, dtype=np.float32).tobytes())
+    params = {k: v for k, v in options.items() if k not in IGNORED_OPTIONS}
+    digest.update(json.dumps([engine, model_name, language, params],
+                             sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _plain(value):
+    """numpy-скаляры и массивы в result → обычные числа и списки."""
+    return value.tolist() if hasattr(value, "tolist") else str(value)
+
+
+class TranscriptCache:
+    """Каталог JSON-файлов с вытеснением давно не использованных по объёму."""
+
+    def __init__(self, directory=TRANSCRIPTS_DIR, max_bytes=MAX_MB * 1024 * 1024, enabled=ENABLED):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = None          # считается при первой записи
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(path)         # LRU: свежее использование
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key, result):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        data = json.dumps(result, ensure_ascii=False, default=_plain).encode()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            try:
+                replaced = os.path.getsize(path)     # та же запись от другого потока/процесса
+            except OSError:
+                replaced = 0
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️  Кэш распознаваний: {e}", file=sys.stderr)
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self.entries())
+            else:
+                self._size += len(data) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def entries(self):
+        """[(path, size, mtime)] всех записей."""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        # До 90% лимита, чтобы не сканировать каталог на каждой записи
+        target = self.max_bytes * 0.9
+        for path, size, _ in sorted(self.entries(), key=lambda e: e[2]):
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+            self.evictions += 1
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            os.remove(path)
+        self._size = 0
+
+    @property
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+    def describe(self):
+        stats = self.stats
+        return (f"кэш: попаданий {stats['hits']}, промахов {stats['misses']}"
+                + (f", вытеснено {stats['evictions']}" if stats["evictions"] else ""))
+
+
+CACHE = TranscriptCache()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Кэш распознаваний")
+    parser.add_argument("--clear", action="store_true", help="Удалить все записи")
+    args = parser.parse_args()
+
+    if args.clear:
+        CACHE.clear()
+        print(f"🗑  Кэш очищен: {CACHE.directory}", file=sys.stderr)
+        return
+    entries = CACHE.entries()
+    size = sum(size for _, size, _ in entries)
+    print(f"{CACHE.directory}: {len(entries)} записей, {size / 1024 / 1024:.1f} / {MAX_MB:.0f} MB"
+          + ("" if ENABLED else " (выключен: MLXW_TRANSCRIPT_CACHE=0)"))
+
+
+if __name__ == "__main__":
+    main()
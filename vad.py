@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""
+Детектор речи (VAD) с гистерезисом, pre-roll и hangover.
+
+Раньше rt.py решал «речь/тишина» по максимуму модуля чанка
+(np.max(np.abs(chunk)) >= 500), rt_auto.py — по среднему (> 1000):
+начало фразы до пересечения порога терялось, а один щелчок в паузе
+обнулял счётчик тишины.
+
+VoiceActivityDetector режет поток на кадры по FRAME_MS, признаки
+считает векторно сразу для всех кадров блока и ведёт конечный автомат:
+  - старт речи — ONSET_SECONDS подряд выше порога «on» (щелчок не проходит);
+  - в речи кадр считается речью, пока выше более низкого порога «off»;
+  - к началу фразы добавляется PRE_ROLL_SECONDS аудио до срабатывания;
+  - конец фразы — HANGOVER_SECONDS подряд ниже «off»; одиночный
+    громкий кадр в паузе счётчик не сбрасывает.
+
+Пороги по умолчанию адаптивные (noise_floor.py): уровень шума
+калибруется по началу записи, отслеживается непрерывно и запоминается
+для устройства. MLXW_VAD_ADAPTIVE=0 (или явный MLXW_VAD_ON_DB /
+SILENCE_THRESHOLD) — фиксированные пороги.
+
+Бэкенды (MLXW_VAD):
+  energy   — RMS кадра в dBFS (по умолчанию)
+  flux     — сглаженный спектральный поток по логарифмическим полосам:
+             устойчив к стационарному шуму (вентилятор, гул)
+  webrtc   — GMM-модель webrtcvad (pip install webrtcvad), если установлена
+
+compact_silence() сжимает длинные паузы до COMPACT_GAP_SECONDS перед
+распознаванием: меньше 30-секундных окон энкодера и меньше галлюцинаций
+на тишине. TimeMap переводит время сжатой записи обратно в исходное.
+
+Точность на размеченном WAV (метки Audacity: start<TAB>end<TAB>label)
+и стоимость кадра:
+  python vad.py --bench                       # синтетика с шумом и щелчками
+  python vad.py --bench --wav a.wav --labels a.txt
+Сжатие тишины на записи (с --transcribe — сегменты в исходном времени):
+  python vad.py --compact rec.wav [--transcribe]
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from audio_sources import to_int16
+from noise_floor import NoiseFloor
+
+RATE = 16000
+FRAME_MS = 30                  # 10/20/30 ms — кратно требованиям webrtcvad
+
+BACKEND = os.environ.get("MLXW_VAD", "energy")
+PRE_ROLL_SECONDS = float(os.environ.get("MLXW_VAD_PREROLL", "0.3"))
+HANGOVER_SECONDS = float(os.environ.get("SILENCE_DURATION", "1.5"))
+ONSET_SECONDS = float(os.environ.get("MLXW_VAD_ONSET", "0.09"))
+
+# Сжатие тишины: MLXW_COMPACT=0 — выключить
+COMPACT = os.environ.get("MLXW_COMPACT", "1") == "1"
+COMPACT_HANGOVER_SECONDS = 0.6   # пауза короче — не трогаем
+COMPACT_GAP_SECONDS = 0.5        # во что сжимается длинная пауза
+ENCODER_WINDOW_SECONDS = 30
+
+# Пороги energy (dBFS): вход в речь выше ON, выход ниже OFF.
+# Старый SILENCE_THRESHOLD (пик в единицах int16) пересчитывается в RMS синуса
+_LEGACY_THRESHOLD = int(os.environ.get("SILENCE_THRESHOLD", "500"))
+ENERGY_ON_DB = float(os.environ.get("MLXW_VAD_ON_DB", 20 * np.log10(_LEGACY_THRESHOLD / 32768) - 3))
+ENERGY_OFF_DB = float(os.environ.get("MLXW_VAD_OFF_DB", ENERGY_ON_DB - 5))
+_EXPLICIT = "MLXW_VAD_ON_DB" in os.environ or "SILENCE_THRESHOLD" in os.environ
+ADAPTIVE = os.environ.get("MLXW_VAD_ADAPTIVE", "0" if _EXPLICIT else "1") == "1"
+
+# Пороги flux (dB на полосу, среднее за FLUX_SMOOTH_FRAMES кадров)
+FLUX_ON = 3.0
+FLUX_OFF = 2.2
+FLUX_SMOOTH_FRAMES = 4
+FLUX_BANDS = 16
+FLUX_CLIP = 8.0                # щелчок не должен «раздуть» скользящее среднее
+FLUX_GATE_MARGIN_DB = 0.0
+
+
+def frame_rms_db(frames):
+    """RMS каждого кадра (n, frame) в dBFS — одним векторным проходом."""
+    x = frames.astype(np.float32)
+    power = np.einsum('ij,ij->i', x, x) / frames.shape[1]
+    return 10 * np.log10(power / 32768 ** 2 + 1e-12)
+
+
+# ──────────────────────────────────────────────
+# Бэкенды: scores(frames) → оценка на кадр; on/off — пороги гистерезиса,
+# adapt(noise) — подстройка под уровень шума
+# ──────────────────────────────────────────────
+class EnergyBackend:
+    name = "energy"
+
+    def __init__(self, on_db=ENERGY_ON_DB, off_db=ENERGY_OFF_DB):
+        self.on = on_db
+        self.off = off_db
+
+    def scores(self, frames):
+        return frame_rms_db(frames)
+
+    def adapt(self, noise):
+        self.on, self.off = noise.thresholds()
+
+    def reset(self):
+        pass
+
+
+class SpectralFluxBackend:
+    """Положительный прирост log-энергии в FLUX_BANDS полосах 100–4000 Hz,
+    усреднённый по FLUX_SMOOTH_FRAMES кадрам. Речь всё время меняет спектр
+    (слоги, форманты), стационарный шум — нет."""
+
+    name = "flux"
+
+    def __init__(self, rate=RATE, frame=None, on=FLUX_ON, off=FLUX_OFF, gate_db=ENERGY_OFF_DB):
+        self.on = on
+        self.off = off
+        self.gate_db = gate_db         # тише — заведомо не речь, поток не считаем
+        self.frame = frame or rate * FRAME_MS // 1000
+        self._window = np.hanning(self.frame).astype(np.float32)
+        freqs = np.fft.rfftfreq(self.frame, 1 / rate)
+        self._edges = np.searchsorted(freqs, np.geomspace(100, 4000, FLUX_BANDS + 1))[:-1]
+        self.reset()
+
+    def reset(self):
+        self._prev_bands = None
+        self._history = np.zeros(FLUX_SMOOTH_FRAMES - 1, dtype=np.float32)
+
+    def scores(self, frames):
+        spectrum = np.abs(np.fft.rfft(frames.astype(np.float32) * self._window, axis=1)) ** 2
+        bands = 10 * np.log10(np.add.reduceat(spectrum, self._edges, axis=1)[:, :FLUX_BANDS] + 1e-3)
+
+        prev = bands[:1] if self._prev_bands is None else self._prev_bands[None]
+        flux = np.maximum(np.diff(np.vstack([prev, bands]), axis=0), 0).mean(axis=1)
+        np.minimum(flux, FLUX_CLIP, out=flux)
+        flux[frame_rms_db(frames) < self.gate_db] = 0
+        self._prev_bands = bands[-1]
+
+        # Скользящее среднее с хвостом прошлого блока
+        padded = np.concatenate([self._history, flux])
+        csum = np.cumsum(np.concatenate([[0], padded]))
+        smoothed = (csum[FLUX_SMOOTH_FRAMES:] - csum[:-FLUX_SMOOTH_FRAMES]) / FLUX_SMOOTH_FRAMES
+        self._history = padded[-(FLUX_SMOOTH_FRAMES - 1):]
+        return smoothed
+
+    def adapt(self, noise):
+        # Шум от речи отличает сам поток; гейт отсекает только кадры на уровне шума
+        self.gate_db = noise.floor_db + FLUX_GATE_MARGIN_DB
+
+
+class WebRTCBackend:
+    """webrtcvad: решение 0/1 на кадр, aggressiveness 0..3."""
+
+    name = "webrtc"
+
+    def __init__(self, rate=RATE, aggressiveness=2):
+        import webrtcvad
+        self.rate = rate
+        self._vad = webrtcvad.Vad(aggressiveness)
+        self.on = self.off = 0.5
+
+    def scores(self, frames):
+        return np.array([self._vad.is_speech(f.tobytes(), self.rate) for f in frames], dtype=np.float32)
+
+    def adapt(self, noise):
+        pass
+
+    def reset(self):
+        pass
+
+
+BACKENDS = {"energy": EnergyBackend, "flux": SpectralFluxBackend, "webrtc": WebRTCBackend}
+
+
+def make_backend(name=BACKEND, rate=RATE):
+    if name not in BACKENDS:
+        raise ValueError(f"неизвестный VAD: {name} (есть: {', '.join(BACKENDS)})")
+    if name == "energy":
+        return EnergyBackend()
+    return BACKENDS[name](rate=rate)
+
+
+# ──────────────────────────────────────────────
+# Детектор
+# ──────────────────────────────────────────────
+class VoiceActivityDetector:
+    """Конечный автомат «ожидание → речь → конец» поверх оценок бэкенда.
+
+    process(block) возвращает int16-аудио текущей фразы из этого блока
+    (в момент срабатывания — вместе с pre-roll). После конца фразы
+    ended == True, до reset() новые блоки игнорируются; next_utterance()
+    начинает следующую фразу с хвоста блока, не теряя кадров.
+
+    device — имя устройства для профиля шума; save_profile() его сохраняет.
+    """
+
+    def __init__(self, rate=RATE, backend=None, pre_roll=PRE_ROLL_SECONDS,
+                 hangover=HANGOVER_SECONDS, onset=ONSET_SECONDS, device=None, adaptive=ADAPTIVE):
+        self.rate = rate
+        self.frame = rate * FRAME_MS // 1000
+        self.backend = backend if backend is not None else make_backend(rate=rate)
+        self.noise = NoiseFloor(device) if adaptive else None
+        if self.noise is not None and self.noise.calibrated:
+            self.backend.adapt(self.noise)
+        self.pre_roll_frames = int(round(pre_roll * 1000 / FRAME_MS))
+        self.hangover_frames = max(1, int(round(hangover * 1000 / FRAME_MS)))
+        self.onset_frames = max(1, int(round(onset * 1000 / FRAME_MS)))
+        self.frames_processed = 0
+        self.reset()
+
+    def reset(self):
+        """Готовность к следующей фразе (поток кадров продолжается)."""
+        self.triggered = False
+        self.ended = False
+        self.segment_start = None    # в отсчётах от начала потока
+        self.segment_end = None
+        self._rest = np.zeros(0, dtype=np.int16)
+        self._tail = np.zeros(0, dtype=np.int16)
+        self._pre_roll = deque(maxlen=self.pre_roll_frames + self.onset_frames)
+        self._loud_run = 0
+        self._silent_run = 0
+
+    def process(self, block):
+        if self.ended:
+            return np.zeros(0, dtype=np.int16)
+        data = np.concatenate([self._rest, to_int16(block)])
+        n = len(data) // self.frame
+        self._rest = data[n * self.frame:]
+        if not n:
+            return np.zeros(0, dtype=np.int16)
+        frames = data[:n * self.frame].reshape(n, self.frame)
+        scores = self._scores(frames)
+
+        out = []
+        for i in range(n):
+            self._step(frames[i], scores[i], out)
+            self.frames_processed += 1
+            if self.ended:
+                self._tail = np.concatenate([frames[i + 1:].ravel(), self._rest])
+                break
+        return np.concatenate(out) if out else np.zeros(0, dtype=np.int16)
+
+    def next_utterance(self):
+        """reset() для непрерывного режима: кадры блока после конца фразы
+        достаются следующей. Возвращает её аудио из этих кадров."""
+        tail = self._tail
+        self.reset()
+        return self.process(tail)
+
+    def _scores(self, frames):
+        scores = self.backend.scores(frames)
+        if self.noise is not None:
+            levels = scores if isinstance(self.backend, EnergyBackend) else frame_rms_db(frames)
+            if self.noise.update(levels) is not None:
+                self.backend.adapt(self.noise)
+        return scores
+
+    def save_profile(self):
+        if self.noise is not None:
+            self.noise.save()
+
+    def _step(self, frame, score, out):
+        backend = self.backend
+        if not self.triggered:
+            self._pre_roll.append(frame)
+            self._loud_run = self._loud_run + 1 if score >= backend.on else 0
+            if self._loud_run >= self.onset_frames:
+                self.triggered = True
+                self.segment_start = (self.frames_processed + 1 - len(self._pre_roll)) * self.frame
+                out.extend(self._pre_roll)
+                self._pre_roll.clear()
+                self._loud_run = 0
+            return
+
+        out.append(frame)
+        if score >= backend.off:
+            # Тишину прерывает только устойчивая речь, не одиночный щелчок
+            self._loud_run += 1
+            if self._loud_run >= self.onset_frames or not self._silent_run:
+                self._silent_run = 0
+            else:
+                self._silent_run += 1
+        else:
+            self._loud_run = 0
+            self._silent_run += 1
+        if self._silent_run >= self.hangover_frames:
+            self.ended = True
+            self.segment_end = (self.frames_processed + 1) * self.frame
+
+    def describe(self):
+        noise = f", {self.noise.describe()}" if self.noise is not None else ""
+        return (f"VAD {self.backend.name}: on {self.backend.on:.1f}, off {self.backend.off:.1f}, "
+                f"pre-roll {self.pre_roll_frames * FRAME_MS} ms, "
+                f"hangover {self.hangover_frames * FRAME_MS / 1000:.1f}s{noise}")
+
+
+def detect_segments(audio, rate=RATE, backend=None, block_frames=32, **kwargs):
+    """Все фразы в записи: [(start, end)] в отсчётах. Детектор перезапускается
+    после каждой фразы; незакрытая в конце фраза закрывается концом записи."""
+    vad = VoiceActivityDetector(rate, backend, **kwargs)
+    samples = to_int16(audio)
+    n = len(samples) // vad.frame
+    frames = samples[:n * vad.frame].reshape(n, vad.frame)
+    segments = []
+    for first in range(0, n, block_frames):
+        block = frames[first:first + block_frames]
+        scores = vad._scores(block)
+        for i in range(len(block)):
+            vad._step(block[i], scores[i], [])
+            vad.frames_processed += 1
+            if vad.ended:
+                segments.append((vad.segment_start, vad.segment_end))
+                vad.reset()
+    if vad.triggered:
+        segments.append((vad.segment_start, len(samples)))
+    return segments
+
+
+# ──────────────────────────────────────────────
+# Сжатие тишины
+# ──────────────────────────────────────────────
+class TimeMap:
+    """Куски исходной записи в сжатой: [(orig_start, comp_start, length)] в отсчётах."""
+
+    def __init__(self, rate=RATE):
+        self.rate = rate
+        self.pieces = []
+        self.original_samples = 0
+        self.compact_samples = 0
+
+    def add(self, orig_start, length):
+        self.pieces.append((orig_start, self.compact_samples, length))
+        self.compact_samples += length
+
+    @property
+    def removed_seconds(self):
+        return (self.original_samples - self.compact_samples) / self.rate
+
+    def to_original(self, t):
+        """Секунды сжатой записи → секунды исходной."""
+        if not self.pieces:
+            return t
+        pos = t * self.rate
+        comp_starts = [comp for _, comp, _ in self.pieces]
+        i = max(0, int(np.searchsorted(comp_starts, pos, side='right')) - 1)
+        orig, comp, length = self.pieces[i]
+        return (orig + min(max(pos - comp, 0), length)) / self.rate
+
+    def remap_result(self, result):
+        """Переводит start/end сегментов и слов результата mlx_whisper в исходное время."""
+        for segment in result.get("segments", []):
+            for item in [segment] + segment.get("words", []):
+                item["start"] = round(self.to_original(item["start"]), 3)
+                item["end"] = round(self.to_original(item["end"]), 3)
+        return result
+
+    def report(self):
+        before = self.original_samples / self.rate
+        after = self.compact_samples / self.rate
+        windows = lambda sec: int(np.ceil(sec / ENCODER_WINDOW_SECONDS)) if sec else 0
+        return (f"✂️  Тишина: −{self.removed_seconds:.1f}s из {before:.1f}s "
+                f"({self.removed_seconds / before if before else 0:.0%}), "
+                f"окон энкодера {windows(before)} → {windows(after)}")
+
+
+def compact_silence(audio, rate=RATE, gap=COMPACT_GAP_SECONDS, backend=None):
+    """Сжимает паузы длиннее gap до gap секунд (по gap/2 от каждого края,
+    живой фон вместо нулей). Возвращает (float32 аудио, TimeMap).
+    Если речь не найдена, запись возвращается как есть."""
+    audio = np.asarray(audio)
+    timemap = TimeMap(rate)
+    timemap.original_samples = len(audio)
+    segments = detect_segments(audio, rate, backend, hangover=COMPACT_HANGOVER_SECONDS)
+    if not segments:
+        timemap.add(0, len(audio))
+        return audio, timemap
+
+    half = int(gap * rate / 2)
+    # Речь с полями: сливаем куски, между которыми тишины меньше gap
+    spans = []
+    for start, end in segments:
+        start, end = max(0, start - half), min(len(audio), end + half)
+        if spans and start <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+
+    for start, end in spans:
+        timemap.add(start, end - start)
+    compacted = np.concatenate([audio[start:end] for start, end in spans])
+    return compacted, timemap
+
+
+# ──────────────────────────────────────────────
+# Бенчмарк
+# ──────────────────────────────────────────────
+def synthetic_labeled(seconds=60, noise_level=300, seed=0, rate=RATE):
+    """Гармонические «слоги» с плавающим тоном на фоне шума и щелчков.
+    Возвращает (int16 аудио, [(start_s, end_s)] речевых участков)."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * rate)
+    audio = np.convolve(rng.standard_normal(n), np.ones(4) / 4, 'same') * noise_level
+    labels = []
+    t = 1.0
+    while t < seconds - 4:
+        length = rng.uniform(0.8, 3.0)
+        start, end = int(t * rate), int((t + length) * rate)
+        tt = np.arange(end - start) / rate
+        f0 = rng.uniform(110, 220) + 30 * np.sin(2 * np.pi * 0.7 * tt)
+        phase = 2 * np.pi * np.cumsum(f0) / rate
+        syllable_rate = rng.uniform(3, 5)
+        # Каждый слог — свой «гласный»: веса гармоник меняются от слога к слогу
+        steps = np.arange(int(length * syllable_rate) + 2) / syllable_rate
+        vowels = rng.lognormal(0, 1, (len(steps), 14))
+        voice = sum(np.interp(tt, steps, vowels[:, k - 1]) * np.sin(k * phase) / k for k in range(1, 15))
+        syllables = np.clip(np.sin(2 * np.pi * syllable_rate * tt + rng.uniform(0, np.pi)) + 0.3, 0, None)
+        attack = np.minimum(1, tt / 0.15)   # мягкое начало — именно его теряет пороговый детектор
+        audio[start:end] += voice * syllables * attack * rng.uniform(1500, 4000)
+        labels.append((t, t + length))
+        t += length + rng.uniform(1.0, 3.0)
+        # Щелчок в паузе
+        click = int((t - 0.5) * rate)
+        audio[click:click + 40] += rng.choice([-1, 1]) * 12000
+    return np.clip(audio, -32768, 32767).astype(np.int16), labels
+
+
+def read_labels(path):
+    labels = []
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2:
+                labels.append((float(parts[0]), float(parts[1])))
+    return labels
+
+
+def legacy_segments(audio, rate=RATE, chunk=1024, threshold=500, hangover=HANGOVER_SECONDS):
+    """Старое правило rt.py: max|chunk| >= порога, конец — N тихих чанков подряд."""
+    limit = int(hangover * rate / chunk)
+    segments, start, silent = [], None, 0
+    for pos in range(0, len(audio) - chunk + 1, chunk):
+        loud = np.max(np.abs(audio[pos:pos + chunk].astype(np.int32))) >= threshold
+        if start is None:
+            if loud:
+                start, silent = pos, 0
+        elif loud:
+            silent = 0
+        else:
+            silent += 1
+            if silent >= limit:
+                segments.append((start, pos + chunk))
+                start = None
+    if start is not None:
+        segments.append((start, len(audio)))
+    return segments
+
+
+def score_segments(segments, labels, n_samples, rate=RATE):
+    frame = rate * FRAME_MS // 1000
+    n = n_samples // frame
+    truth = np.zeros(n, dtype=bool)
+    for start, end in labels:
+        truth[int(start * rate) // frame:int(end * rate) // frame] = True
+    predicted = np.zeros(n, dtype=bool)
+    for start, end in segments:
+        predicted[start // frame:end // frame] = True
+
+    # Потерянное начало: сколько речи до начала покрывающего сегмента
+    clipped = []
+    for start, end in labels:
+        s = int(start * rate)
+        covering = [seg for seg in segments if seg[0] < int(end * rate) and seg[1] > s]
+        clipped.append(max(0, covering[0][0] - s) / rate if covering else end - start)
+    return {
+        "accuracy": float((truth == predicted).mean()),
+        "recall": float(predicted[truth].mean()) if truth.any() else 1.0,
+        "false_alarm": float(predicted[~truth].mean()) if (~truth).any() else 0.0,
+        "onset_clip_ms": 1000 * float(np.mean(clipped)) if clipped else 0.0,
+        "segments": len(segments),
+    }
+
+
+def bench(audio, labels, hangover):
+    print(f"🧪 {len(audio) / RATE:.0f}s аудио, {len(labels)} фраз, кадр {FRAME_MS} ms, hangover {hangover}s")
+    print(f"   {'детектор':<10} {'точн.':>6} {'полнота':>8} {'ложн.':>6} {'потеря начала':>14} {'фраз':>5} {'µs/кадр':>8}")
+    n_frames = len(audio) // (RATE * FRAME_MS // 1000)
+
+    candidates = [("legacy", None, False)]
+    for name in BACKENDS:
+        for adaptive in (False, True):
+            try:
+                backend = make_backend(name)
+            except ImportError:
+                print(f"   {name:<10} — не установлен", file=sys.stderr)
+                break
+            candidates.append((name + ("+шум" if adaptive else ""), backend, adaptive))
+
+    for name, backend, adaptive in candidates:
+        t0 = time.perf_counter()
+        if backend is None:
+            segments = legacy_segments(audio, hangover=hangover)
+        else:
+            segments = detect_segments(audio, backend=backend, hangover=hangover, adaptive=adaptive)
+        cost_us = (time.perf_counter() - t0) / n_frames * 1e6
+        s = score_segments(segments, labels, len(audio))
+        print(f"   {name:<10} {s['accuracy']:6.1%} {s['recall']:8.1%} {s['false_alarm']:6.1%} "
+              f"{s['onset_clip_ms']:11.0f} ms {s['segments']:5d} {cost_us:8.1f}")
+
+
+def compact_report(path, transcribe=False):
+    from recording import load_recording
+
+    audio = load_recording(path)
+    t0 = time.perf_counter()
+    compacted, timemap = compact_silence(audio)
+    print(f"{timemap.report()} за {(time.perf_counter() - t0) * 1000:.0f} ms")
+    if transcribe:
+        import asr
+        result = timemap.remap_result(asr.transcribe_result(compacted))
+        for segment in result.get("segments", []):
+            print(f"[{segment['start']:8.2f} → {segment['end']:8.2f}] {segment['text'].strip()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Детектор речи: бенчмарк точности и стоимости")
+    parser.add_argument("--bench", action="store_true", help="Сравнить бэкенды и старое правило rt.py")
+    parser.add_argument("--wav", help="Размеченный WAV 16 kHz mono (иначе синтетика)")
+    parser.add_argument("--labels", help="Метки речи в формате Audacity")
+    parser.add_argument("--seconds", type=float, default=120, help="Длина синтетики")
+    parser.add_argument("--noise", type=float, default=300, help="Уровень шума синтетики")
+    parser.add_argument("--hangover", type=float, default=0.3,
+                        help="Hangover для оценки точности по кадрам")
+    parser.add_argument("--compact", metavar="WAV", help="Сжать тишину в записи и показать отчёт")
+    parser.add_argument("--transcribe", action="store_true",
+                        help="С --compact: распознать и вывести сегменты в исходном времени")
+    args = parser.parse_args()
+
+    if args.compact:
+        compact_report(args.compact, args.transcribe)
+        return
+    if not args.bench:
+        parser.print_help()
+        return
+
+    if args.wav:
+        import wave
+        with wave.open(args.wav, 'rb') as wf:
+            if wf.getframerate() != RATE or wf.getnchannels() != 1:
+                sys.exit(f"❌ {args.wav}: нужен 16 kHz mono")
+            audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        labels = read_labels(args.labels) if args.labels else []
+    else:
+        audio, labels = synthetic_labeled(args.seconds, args.noise)
+    bench(audio, labels, args.hangover)
+
+
+if __name__ == "__main__":
+    main()